@@ -1,16 +1,40 @@
 # LiveConfig.py
 # Entry point for the EdJ Configurator
 import adsk.core, adsk.fusion, adsk.cam, traceback
+import contextlib
 import json
 import os
 import importlib 
+import time
 from pathlib import Path
 
 # Import our logic module
-from . import config_logic
+from . import config
+from . import diagnostics
+from . import scheduler
+from .lib import fusionAddInUtils as futil
 
-# --- FORCE RELOAD ---
-importlib.reload(config_logic)
+# --- LAZY MODULES ---
+# config_logic, sweep and design_table are imported on first use so Fusion's
+# startup doesn't pay for them. With config.DEBUG they are reloaded on that
+# first import, picking up edits without restarting Fusion. With
+# config.API_TRACE, config_logic's API calls are traced (see api_trace).
+_modules = {}
+
+def lazy_module(name):
+    module = _modules.get(name)
+    if module is None:
+        module = importlib.import_module('.' + name, __package__)
+        if config.DEBUG:
+            module = importlib.reload(module)
+        if config.API_TRACE and name == 'config_logic':
+            from . import api_trace
+            api_trace.install(module, report_path=config.API_TRACE_FILE or None)
+        _modules[name] = module
+    return module
+
+def logic():
+    return lazy_module('config_logic')
 
 # Global variables
 app = None
@@ -19,6 +43,86 @@ handlers = []
 palette_id = 'EdJ_Config_Palette'
 command_id = 'EdJConfigCmd'
 
+# When the palette command was run, for the time-to-first-render measurement.
+palette_opened_at = None
+
+# State of the batch being routed (see route_batch), None outside a batch.
+_batch = None
+
+# Actions that manage their own compute windows or dialogs and must arrive on their own.
+STANDALONE_ACTIONS = {'run_sweep', 'apply_all_in_order', 'measure_configs', 'import_table', 'export_table', 'batch'}
+
+# Actions run straight from the HTML event; everything else goes through the scheduler.
+IMMEDIATE_ACTIONS = {'update_param', 'first_render', 'set_diagnostics', 'cancel_job', 'get_snapshot', 'query_configs'}
+
+# Seconds without a new parameter edit before queued edits are written.
+EDIT_QUIET_PERIOD = 0.4
+
+# Seconds after a document switch before a cached scan that looked current is checked with a rescan.
+CACHED_SCAN_CHECK_DELAY = 1.0
+
+def send_state(state=None, force_full=False):
+    """Sends the model state to the palette as a full update or a delta patch.
+
+    During a batch the send is only noted; route_batch sends one state at the end.
+    """
+    if _batch is not None:
+        _batch["send"] = True
+        _batch["force_full"] = _batch["force_full"] or force_full
+        return
+    palette = ui.palettes.itemById(palette_id)
+    if not palette: return
+    if state is None:
+        state = logic().scan_model()
+    html_action, payload = logic().build_ui_message(palette_id, state, force_full)
+    with diagnostics.phase("send"):
+        palette.sendInfoToHTML(html_action, payload)
+
+def schedule_edit_flush():
+    """(Re)schedules the flush of queued edits for when the quiet period has passed."""
+    scheduler.submit('flush_edits', flush_edits, key='flush_edits', delay=EDIT_QUIET_PERIOD, quiet=True)
+
+def flush_edits():
+    """Writes queued parameter edits and reports rejected expressions to the palette."""
+    scheduler.cancel(key='flush_edits')  # Flushing now: drop the debounced flush
+    if 'config_logic' not in _modules or not logic().has_pending_edits(): return
+    result = logic().flush_parameter_edits()
+    if result["dropped"]:
+        futil.log('LiveConfig: dropped edits queued in another document: {}'.format(
+            ', '.join('{} = {}'.format(e["name"], e["expression"]) for e in result["dropped"])))
+    if result["failed"]:
+        palette = ui.palettes.itemById(palette_id)
+        if palette: palette.sendInfoToHTML('param_errors', json.dumps(result["failed"]))
+    if result["changed"]:
+        # Only the edited parameters and their dependents moved: patch them in without a rescan.
+        state = logic().state_with_param_updates(palette_id, result["changed"])
+        if state: send_state(state)
+
+# --- PALETTE ---
+
+def create_palette(visible):
+    """Creates the palette and hooks up its events; a hidden palette still loads its page."""
+    cmd_path = Path(__file__).resolve().parent
+    html_file = cmd_path / 'resources' / 'html' / 'index.html'
+    url = html_file.as_uri()
+    
+    palette = ui.palettes.add(palette_id, 'LiveConfig', url, visible, True, True, 350, 500)
+    palette.dockingState = adsk.core.PaletteDockingStates.PaletteDockStateRight
+    
+    onHtmlEvent = MyHTMLEventHandler()
+    palette.incomingFromHTML.add(onHtmlEvent)
+    handlers.append(onHtmlEvent)
+    
+    onClose = MyPaletteCloseHandler()
+    palette.closed.add(onClose)
+    handlers.append(onClose)
+    return palette
+
+def record_startup(phase_name, seconds):
+    """Keeps a startup timing in the diagnostics summary and writes it to the log."""
+    diagnostics.record('startup', phase_name, seconds)
+    futil.log('LiveConfig startup: {} {:.1f} ms'.format(phase_name, seconds * 1000))
+
 class MyCommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
     def __init__(self):
         super().__init__()
@@ -37,31 +141,299 @@ class MyCommandExecuteHandler(adsk.core.CommandEventHandler):
         super().__init__()
     def notify(self, args):
         try:
-            # --- PALETTE CREATION LOGIC ---
+            global palette_opened_at
+            palette_opened_at = time.perf_counter()
             palette = ui.palettes.itemById(palette_id)
-            
             if not palette:
-                cmd_path = Path(__file__).resolve().parent
-                html_file = cmd_path / 'resources' / 'html' / 'index.html'
-                url = html_file.as_uri()
-                
-                palette = ui.palettes.add(palette_id, 'LiveConfig', url, True, True, True, 350, 500)
-                palette.dockingState = adsk.core.PaletteDockingStates.PaletteDockStateRight
-                
-                onHtmlEvent = MyHTMLEventHandler()
-                palette.incomingFromHTML.add(onHtmlEvent)
-                handlers.append(onHtmlEvent)
-                
-                onClose = MyPaletteCloseHandler()
-                palette.closed.add(onClose)
-                handlers.append(onClose)
-            
-            palette.isVisible = True
+                palette = create_palette(True)
+            elif not palette.isVisible:
+                # Preloaded (or closed) palette: its page is loaded, it only needs the current state.
+                palette.isVisible = True
+                send_state(force_full=True)
 
         except:
             if ui:
                 ui.messageBox('Command Execution Failed:\n{}'.format(traceback.format_exc()))
 
+def route_action(action, data):
+    """Runs one palette action. Returns its result for batch responses (or None)."""
+
+    if action == 'first_render':
+        if palette_opened_at is not None:
+            record_startup('first render', time.perf_counter() - palette_opened_at)
+        return
+
+    # Queued parameter edits must land before anything reads the model.
+    if action not in IMMEDIATE_ACTIONS:
+        flush_edits()
+    
+    if action == 'refresh_data':
+        palette = ui.palettes.itemById(palette_id)
+        if palette and not palette.isVisible:
+            return  # Preloaded page: the state is sent when the palette is opened
+
+        logic().invalidate_feature_index()
+        send_state(force_full=True)
+
+    elif action == 'update_param':
+        logic().queue_parameter_edit(data.get('name'), data.get('value'))
+        schedule_edit_flush()
+
+    elif action == 'apply_params':
+        pass  # Explicit apply: the queue was flushed above.
+    
+    elif action == 'toggle_favorite':
+        # In a batch the state is scanned once at the end, not per toggle.
+        send_state(logic().toggle_favorite(data.get('name'), rescan=_batch is None))
+        
+    elif action == 'toggle_feature':
+        send_state(logic().toggle_feature(data.get('name'), data.get('is_suppressed'), rescan=_batch is None))
+
+    elif action == 'save_snapshot':
+        success = logic().save_snapshot(data.get('config_name'))
+        if success:
+            send_state()
+        return success
+
+    elif action == 'delete_snapshot':
+        success = logic().delete_snapshot(data.get('config_name'))
+        if success:
+            send_state()
+        return success
+            
+    elif action == 'load_snapshot':
+        report = logic().apply_snapshot(data.get('config_name'))
+        if report and (report["cycles"] or report["invalid"]):
+            errors = [{"name": name, "error": "Circular reference"} for name in report["cycles"]]
+            errors += [{"name": name, "error": "Unknown: " + ", ".join(refs)} for name, refs in report["invalid"].items()]
+            palette = ui.palettes.itemById(palette_id)
+            if palette: palette.sendInfoToHTML('param_errors', json.dumps(errors))
+        send_state()
+        return report
+
+    elif action == 'get_snapshot':
+        # Snapshot bodies aren't part of update_ui; the palette asks for one when it's expanded.
+        name = data.get('config_name')
+        body = logic().get_snapshot(name)
+        palette = ui.palettes.itemById(palette_id)
+        if palette:
+            palette.sendInfoToHTML('snapshot_body', json.dumps(body or {"name": name, "missing": True}))
+        return body
+
+    elif action == 'query_configs':
+        # Filter box: the snapshots matching the query, answered on their own message.
+        result = logic().query_configs(data.get('query', ''))
+        palette = ui.palettes.itemById(palette_id)
+        if palette: palette.sendInfoToHTML('config_query', json.dumps(result))
+        return result
+
+    elif action == 'config_report':
+        report = logic().config_report()
+        palette = ui.palettes.itemById(palette_id)
+        if palette and report: palette.sendInfoToHTML('config_report', json.dumps(report))
+        return report
+
+    elif action == 'export_table':
+        export_design_table()
+
+    elif action == 'import_table':
+        import_design_table()
+
+    elif action == 'apply_all_in_order':
+        return apply_all_in_order()
+
+    elif action == 'run_sweep':
+        return run_sweep(data)
+
+    elif action == 'measure_configs':
+        return measure_configs(data.get('names'))
+
+    elif action == 'clear_metrics':
+        design = adsk.fusion.Design.cast(app.activeProduct)
+        if design:
+            logic().clear_metrics(design)
+            send_state()
+
+    elif action == 'cancel_job':
+        scheduler.cancel(data.get('id'))
+
+    elif action == 'set_diagnostics':
+        diagnostics.set_enabled(data.get('enabled'))
+        if data.get('reset'):
+            diagnostics.reset()
+
+def supersede_key(action, data):
+    """Scheduler key under which a newer request replaces an older one (None: never)."""
+    if action in ('load_snapshot', 'refresh_data', 'apply_all_in_order', 'measure_configs'):
+        return action
+    if action == 'toggle_feature':
+        return 'toggle_feature:' + str(data.get('name'))
+    return None
+
+def report_job(status):
+    """Scheduler callback: forwards job progress to the palette."""
+    palette = ui.palettes.itemById(palette_id)
+    if palette:
+        palette.sendInfoToHTML('job_status', json.dumps(status, default=str))
+    if status["state"] in ('done', 'error', 'cancelled'):
+        send_diagnostics()
+
+def route_batch(actions):
+    """Runs several palette actions in order inside one deferred-compute window.
+
+    State sends requested by the actions are merged into a single scan that is
+    returned with the per-action results in one 'batch_result' message.
+    """
+    global _batch
+    results = []
+    design = adsk.fusion.Design.cast(app.activeProduct)
+    _batch = {"send": False, "force_full": False}
+    try:
+        with (logic().deferred_compute(design) if design else contextlib.nullcontext()):
+            for data in actions:
+                action = data.get('action')
+                if action in STANDALONE_ACTIONS:
+                    results.append({"action": action, "ok": False, "error": "must be sent on its own"})
+                    continue
+                try:
+                    with diagnostics.action(action):
+                        results.append({"action": action, "ok": True, "result": route_action(action, data)})
+                except Exception as e:
+                    results.append({"action": action, "ok": False, "error": str(e)})
+            flush_edits()
+        batch = _batch
+    finally:
+        _batch = None
+
+    update = 'null'
+    if batch["send"]:
+        html_action, payload = logic().build_ui_message(palette_id, logic().scan_model(), batch["force_full"])
+        update = '{{"action": {}, "data": {}}}'.format(json.dumps(html_action), payload)
+    palette = ui.palettes.itemById(palette_id)
+    if palette:
+        with diagnostics.phase("send"):
+            palette.sendInfoToHTML('batch_result', '{{"results": {}, "update": {}}}'.format(
+                json.dumps(results, default=str), update))
+
+def send_table_status(status):
+    """Shows a message (and errors) on the status line under the snapshot list."""
+    palette = ui.palettes.itemById(palette_id)
+    if palette: palette.sendInfoToHTML('table_status', json.dumps(status))
+
+def _design_table_dialog(title):
+    dialog = ui.createFileDialog()
+    dialog.title = title
+    dialog.filter = 'CSV (*.csv);;JSON Lines (*.jsonl)'
+    return dialog
+
+def export_design_table():
+    """Asks for a file and writes every snapshot to it as a design table."""
+    dialog = _design_table_dialog('Export Snapshots')
+    if dialog.showSave() != adsk.core.DialogResults.DialogOK: return
+    count = lazy_module('design_table').export_table(dialog.filename)
+    send_table_status({"message": "Exported {} snapshots to {}.".format(count, os.path.basename(dialog.filename))})
+
+def import_design_table():
+    """Asks for a design table and imports its rows as snapshots."""
+    dialog = _design_table_dialog('Import Snapshots')
+    if dialog.showOpen() != adsk.core.DialogResults.DialogOK: return
+    result = lazy_module('design_table').import_table(dialog.filename)
+    send_table_status({"message": "Imported {} snapshots.".format(len(result["imported"])),
+                       "errors": result["errors"]})
+    send_state()
+
+def apply_all_in_order():
+    """Scheduler job: steps through every snapshot in change-minimizing order, one per step.
+
+    Fusion redraws between steps, so each snapshot is shown before the next one.
+    """
+    plan = logic().plan_snapshot_order()
+    total = len(plan["order"])
+    applied = 0
+    try:
+        for name in plan["order"]:
+            yield applied, total, name
+            logic().apply_snapshot(name)
+            send_state()
+            applied += 1
+    finally:
+        palette = ui.palettes.itemById(palette_id)
+        if palette:
+            palette.sendInfoToHTML('sweep_status', json.dumps({"message":
+                "Applied {} of {} snapshots in planned order (change cost {} vs {} in list order).".format(
+                    applied, total, plan["cost"], plan["list_cost"])}))
+
+def measure_configs(names=None):
+    """Scheduler job: measures snapshots without cached metrics, one per step, then restores the model."""
+    summary = {}
+    try:
+        yield from lazy_module('sweep').iter_measure_snapshots(names, summary=summary)
+    finally:
+        send_table_status({
+            "message": "Measured {} snapshots ({} already cached).".format(summary.get("measured", 0), summary.get("cached", 0)),
+            "errors": ["Could not apply " + name for name in summary.get("failed", [])]})
+        send_state()
+    return summary
+
+def run_sweep(data):
+    """Scheduler job: asks for a results file, then runs one sweep variant per step.
+
+    Picking an existing results file resumes the sweep recorded in it.
+    """
+    sweep = lazy_module('sweep')
+    palette = ui.palettes.itemById(palette_id)
+    def report(status):
+        if palette: palette.sendInfoToHTML('sweep_status', json.dumps(status))
+
+    design = adsk.fusion.Design.cast(app.activeProduct)
+    if not design: return
+    try:
+        if data.get('source') == 'snapshots':
+            variants = list(sweep.snapshot_variants(design.rootComponent))
+        else:
+            params, features = sweep.parse_grid(data.get('grid', ''))
+            variants = list(sweep.grid_variants(params, features))
+    except ValueError as e:
+        report({"error": str(e)})
+        return
+    if not variants:
+        report({"error": "Nothing to sweep."})
+        return
+
+    dialog = ui.createFileDialog()
+    dialog.title = 'Sweep Results ({} variants)'.format(len(variants))
+    dialog.filter = 'CSV (*.csv);;JSON Lines (*.jsonl)'
+    if dialog.showSave() != adsk.core.DialogResults.DialogOK:
+        report({"message": "Sweep cancelled."})
+        return
+
+    summary = {}
+    try:
+        yield from sweep.iter_sweep(variants, dialog.filename, data.get('metrics', []),
+                                    export_formats=data.get('exports', []), summary=summary)
+    except ValueError as e:
+        summary = {"error": str(e)}
+    except GeneratorExit:
+        summary["cancelled"] = True
+        raise
+    finally:
+        report(summary)
+        send_state()
+    return summary
+
+def send_diagnostics():
+    """Pushes the latency summary to the palette."""
+    if not diagnostics.enabled: return
+    palette = ui.palettes.itemById(palette_id)
+    if palette:
+        palette.sendInfoToHTML('diagnostics', json.dumps(diagnostics.summary()))
+
+def log_diagnostics():
+    """Recurring scheduler job: writes the latency summary to the log every DIAGNOSTICS_LOG_INTERVAL seconds."""
+    diagnostics.maybe_log_summary(futil.log, config.DIAGNOSTICS_LOG_INTERVAL)
+    scheduler.submit('log_diagnostics', log_diagnostics, key='log_diagnostics',
+                     delay=config.DIAGNOSTICS_LOG_INTERVAL, quiet=True)
+
 class MyHTMLEventHandler(adsk.core.HTMLEventHandler):
     def __init__(self):
         super().__init__()
@@ -70,52 +442,34 @@ class MyHTMLEventHandler(adsk.core.HTMLEventHandler):
             html_args = adsk.core.HTMLEventArgs.cast(args)
             data = json.loads(html_args.data)
             action = data.get('action')
-            
-            # --- ROUTING LOGIC ---
-            
-            if action == 'refresh_data':
-                payload = config_logic.scan_model()
-                palette = ui.palettes.itemById(palette_id)
-                if palette: palette.sendInfoToHTML('update_ui', payload)
 
-            elif action == 'update_param':
-                config_logic.update_parameter(data.get('name'), data.get('value'))
-            
-            elif action == 'toggle_favorite':
-                payload = config_logic.toggle_favorite(data.get('name'))
-                palette = ui.palettes.itemById(palette_id)
-                if palette: palette.sendInfoToHTML('update_ui', payload)
-                
-            elif action == 'toggle_feature':
-                payload = config_logic.toggle_feature(data.get('name'), data.get('is_suppressed'))
-                palette = ui.palettes.itemById(palette_id)
-                if palette: palette.sendInfoToHTML('update_ui', payload)
-
-            elif action == 'save_snapshot':
-                success = config_logic.save_snapshot(data.get('config_name'))
-                if success:
-                    payload = config_logic.scan_model()
-                    palette = ui.palettes.itemById(palette_id)
-                    palette.sendInfoToHTML('update_ui', payload)
-
-            elif action == 'delete_snapshot':
-                success = config_logic.delete_snapshot(data.get('config_name'))
-                if success:
-                    payload = config_logic.scan_model()
-                    palette = ui.palettes.itemById(palette_id)
-                    palette.sendInfoToHTML('update_ui', payload)
-                    
-            elif action == 'load_snapshot':
-                config_logic.apply_snapshot(data.get('config_name'))
-                payload = config_logic.scan_model()
-                palette = ui.palettes.itemById(palette_id)
-                palette.sendInfoToHTML('update_ui', payload)
+            # --- ROUTING LOGIC ---
+            if action in IMMEDIATE_ACTIONS:
+                with diagnostics.action(action):
+                    route_action(action, data)
+                send_diagnostics()
+            elif action == 'batch':
+                scheduler.submit(action, lambda: route_batch(data.get('actions', [])))
+            else:
+                # Runs from the scheduler's custom event once Fusion is idle; a newer
+                # request with the same key (e.g. another snapshot load) replaces it.
+                scheduler.submit(action, lambda: route_action(action, data), key=supersede_key(action, data))
 
         except:
             if ui:
                 ui.messageBox('HTML Event Failed:\n{}'.format(traceback.format_exc()))
 
 # --- DOCUMENT SWITCH LISTENER ---
+class MyDocDeactivatingHandler(adsk.core.DocumentEventHandler):
+    def __init__(self):
+        super().__init__()
+    def notify(self, args):
+        try:
+            # Queued edits belong to the document being left: write them while it is still active.
+            flush_edits()
+        except:
+            pass
+
 class MyDocActivatedHandler(adsk.core.DocumentEventHandler):
     def __init__(self):
         super().__init__()
@@ -123,11 +477,30 @@ class MyDocActivatedHandler(adsk.core.DocumentEventHandler):
         try:
             palette = ui.palettes.itemById(palette_id)
             if palette and palette.isVisible:
-                payload = config_logic.scan_model()
-                palette.sendInfoToHTML('update_ui', payload)
+                # Show the cached scan for this document at once, then rescan: right away if the
+                # design marker moved, otherwise a little later, since the marker doesn't see
+                # suppressions or expression edits made outside the palette.
+                with diagnostics.action('document_activated'):
+                    state, is_stale = logic().get_cached_scan()
+                    if state:
+                        send_state(state)
+                scheduler.submit('background_refresh', background_refresh, key='refresh_data', quiet=True,
+                                 delay=0 if is_stale else CACHED_SCAN_CHECK_DELAY)
+                send_diagnostics()
         except:
             pass 
 
+def background_refresh():
+    """Scheduler job: rescans after a document switch; only what changed since the cached scan is sent."""
+    palette = ui.palettes.itemById(palette_id)
+    if palette and palette.isVisible:
+        send_state()
+
+def preload_palette():
+    """Scheduler job: creates the palette hidden so opening it later is instant."""
+    if not ui.palettes.itemById(palette_id):
+        create_palette(False)
+
 class MyPaletteCloseHandler(adsk.core.UserInterfaceGeneralEventHandler):
     def __init__(self):
         super().__init__()
@@ -136,9 +509,11 @@ class MyPaletteCloseHandler(adsk.core.UserInterfaceGeneralEventHandler):
 
 def run(context):
     global ui, app
+    run_started = time.perf_counter()
     try:
         app = adsk.core.Application.get()
         ui = app.userInterface
+        diagnostics.set_enabled(config.DIAGNOSTICS_ENABLED)
         
         cmdDefs = ui.commandDefinitions
         oldCmd = cmdDefs.itemById(command_id)
@@ -167,9 +542,23 @@ def run(context):
             control = modify_panel.controls.addCommand(cmdDef)
             control.isPromoted = False 
         
+        onDocDeactivating = MyDocDeactivatingHandler()
+        app.documentDeactivating.add(onDocDeactivating)
+        handlers.append(onDocDeactivating)
+
         onDocActivated = MyDocActivatedHandler()
         app.documentActivated.add(onDocActivated)
         handlers.append(onDocActivated)
+
+        scheduler.start(app, report_job)
+        if config.DIAGNOSTICS_LOG_INTERVAL:
+            scheduler.submit('log_diagnostics', log_diagnostics, key='log_diagnostics',
+                             delay=config.DIAGNOSTICS_LOG_INTERVAL, quiet=True)
+        if config.PRELOAD_PALETTE:
+            # Scheduler jobs run from a custom event once Fusion is idle; the delay keeps it off the startup path.
+            scheduler.submit('preload_palette', preload_palette, delay=config.PRELOAD_DELAY, quiet=True)
+
+        record_startup('run()', time.perf_counter() - run_started)
         
     except:
         if ui:
@@ -177,8 +566,11 @@ def run(context):
 
 def stop(context):
     try:
+        scheduler.stop()
+
         palette = ui.palettes.itemById(palette_id)
         if palette: palette.deleteMe()
+        if 'config_logic' in _modules: logic().reset_ui_sync()
 
         modify_panel = ui.allToolbarPanels.itemById('SolidModifyPanel')
         if modify_panel:
@@ -0,0 +1,229 @@
+# api_trace.py
+# Opt-in accounting of Fusion API crossings (config.API_TRACE), to find the
+# loops worth fixing and catch changes that add API calls.
+#
+# install(module) swaps the module's `adsk` for a stand-in whose
+# Application.get() returns a proxy. Every object reached from that proxy is
+# proxied too, and each property read, property write, method call and
+# collection step is counted and timed as "Type.member" under the traced
+# top-level function (scan_model, apply_snapshot, ...) that was running. After
+# each top-level call a ranked text report and a JSON copy for diffing are
+# written. Timing only covers the API call itself, not the proxy around it.
+
+import functools
+import json
+import os
+import time
+
+TRACED_FUNCTIONS = ("scan_model", "apply_snapshot", "toggle_feature", "save_snapshot",
+                    "delete_snapshot", "toggle_favorite", "flush_parameter_edits")
+
+# (action, member) -> [count, seconds]
+_members = {}
+
+# action -> completed top-level runs
+_runs = {}
+
+# Traced functions currently running, outermost first.
+_stack = []
+
+# (module, original adsk, {name: original function}) per installed module
+_installed = []
+
+_report_path = None
+
+def _record(member, seconds):
+    entry = _members.get((_stack[0] if _stack else "-", member))
+    if entry is None:
+        entry = _members[(_stack[0] if _stack else "-", member)] = [0, 0.0]
+    entry[0] += 1
+    entry[1] += seconds
+
+def _wrap(value):
+    if isinstance(value, (list, tuple)):
+        return type(value)(_wrap(v) for v in value)
+    if type(value).__module__.startswith("adsk"):
+        return _Proxy(value)
+    return value
+
+def _unwrap(value):
+    return value._obj if isinstance(value, _Proxy) else value
+
+class _Method:
+    __slots__ = ("member", "method")
+
+    def __init__(self, member, method):
+        self.member = member
+        self.method = method
+
+    def __call__(self, *args, **kwargs):
+        args = [_unwrap(a) for a in args]
+        kwargs = {k: _unwrap(v) for k, v in kwargs.items()}
+        start = time.perf_counter()
+        try:
+            return _wrap(self.method(*args, **kwargs))
+        finally:
+            _record(self.member, time.perf_counter() - start)
+
+class _Proxy:
+    """Stands in for one adsk object and accounts for every access to it."""
+    __slots__ = ("_obj", "_type")
+
+    def __init__(self, obj):
+        object.__setattr__(self, "_obj", obj)
+        object.__setattr__(self, "_type", type(obj).__name__)
+
+    def __getattr__(self, name):
+        start = time.perf_counter()
+        value = getattr(self._obj, name)
+        elapsed = time.perf_counter() - start
+        if callable(value) and not isinstance(value, type):
+            return _Method(self._type + "." + name, value)  # Counted when called
+        _record(self._type + "." + name, elapsed)
+        return _wrap(value)
+
+    def __setattr__(self, name, value):
+        start = time.perf_counter()
+        try:
+            setattr(self._obj, name, _unwrap(value))
+        finally:
+            _record(self._type + "." + name + "=", time.perf_counter() - start)
+
+    def __iter__(self):
+        start = time.perf_counter()
+        items = iter(self._obj)
+        _record(self._type + ".__iter__", time.perf_counter() - start)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                _record(self._type + ".next", time.perf_counter() - start)
+            yield _wrap(item)
+
+    def __getitem__(self, key):
+        start = time.perf_counter()
+        try:
+            return _wrap(self._obj[key])
+        finally:
+            _record(self._type + ".__getitem__", time.perf_counter() - start)
+
+    def __len__(self):
+        return len(self._obj)
+
+    def __bool__(self):
+        return bool(self._obj)
+
+    def __eq__(self, other):
+        return self._obj == _unwrap(other)
+
+    def __ne__(self, other):
+        return self._obj != _unwrap(other)
+
+    def __hash__(self):
+        return hash(self._obj)
+
+class _Namespace:
+    """A module stand-in: `overrides` first, then the real module's attributes."""
+
+    def __init__(self, real, **overrides):
+        self._real = real
+        self.__dict__.update(overrides)
+
+    def __getattr__(self, name):
+        return getattr(self._real, name)
+
+def _traced_adsk(adsk):
+    def get_application():
+        start = time.perf_counter()
+        app = adsk.core.Application.get()
+        _record("Application.get", time.perf_counter() - start)
+        return _wrap(app)
+    application = _Namespace(adsk.core.Application, get=get_application)
+    return _Namespace(adsk, core=_Namespace(adsk.core, Application=application))
+
+def _traced_function(name, fn):
+    @functools.wraps(fn)
+    def traced(*args, **kwargs):
+        _stack.append(name)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _stack.pop()
+            if not _stack:
+                _runs[name] = _runs.get(name, 0) + 1
+                write_report()
+    return traced
+
+def install(module, functions=TRACED_FUNCTIONS, report_path=None):
+    """Traces `module`'s API use and its top-level `functions` until uninstall()."""
+    global _report_path
+    _report_path = report_path or os.path.join(os.path.dirname(os.path.abspath(__file__)), "api_trace.txt")
+    originals = {name: getattr(module, name) for name in functions if hasattr(module, name)}
+    _installed.append((module, module.adsk, originals))
+    module.adsk = _traced_adsk(module.adsk)
+    for name, fn in originals.items():
+        setattr(module, name, _traced_function(name, fn))
+
+def uninstall():
+    while _installed:
+        module, adsk, originals = _installed.pop()
+        module.adsk = adsk
+        for name, fn in originals.items():
+            setattr(module, name, fn)
+
+def reset():
+    _members.clear()
+    _runs.clear()
+
+def report():
+    """Returns [{"action", "runs", "calls", "ms", "members": [{"member", "count", "per_run", "ms"}]}].
+
+    Actions and their members are ranked by time spent in the API, then by count.
+    """
+    actions = {}
+    for (action_name, member), (count, seconds) in _members.items():
+        actions.setdefault(action_name, []).append((member, count, seconds))
+    rows = []
+    for action_name, members in actions.items():
+        runs = _runs.get(action_name, 0)
+        members.sort(key=lambda m: (-m[2], -m[1], m[0]))
+        rows.append({
+            "action": action_name,
+            "runs": runs,
+            "calls": sum(m[1] for m in members),
+            "ms": round(sum(m[2] for m in members) * 1000, 3),
+            "members": [{"member": member, "count": count, "per_run": round(count / max(runs, 1), 1),
+                         "ms": round(seconds * 1000, 3)} for member, count, seconds in members]
+        })
+    rows.sort(key=lambda r: (-r["ms"], -r["calls"], r["action"]))
+    return rows
+
+def format_report(rows=None):
+    rows = report() if rows is None else rows
+    lines = ["LiveConfig API trace: {} API calls, {:.1f} ms in the API".format(
+        sum(r["calls"] for r in rows), sum(r["ms"] for r in rows))]
+    for r in rows:
+        lines.append("")
+        lines.append("{}  runs={}  calls/run={:.0f}  API ms/run={:.2f}".format(
+            r["action"], r["runs"], r["calls"] / max(r["runs"], 1), r["ms"] / max(r["runs"], 1)))
+        lines.append("  {:>8} {:>9} {:>10}  {}".format("count", "per run", "total ms", "member"))
+        for m in r["members"]:
+            lines.append("  {:>8} {:>9} {:>10.3f}  {}".format(m["count"], m["per_run"], m["ms"], m["member"]))
+    return "\n".join(lines) + "\n"
+
+def write_report(path=None):
+    """Writes the ranked report to `path` (default: the install() path) and its JSON next to it."""
+    path = path or _report_path
+    if not path: return None
+    rows = report()
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(format_report(rows))
+        with open(os.path.splitext(path)[0] + ".json", "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=1)
+    except OSError:
+        return None
+    return path
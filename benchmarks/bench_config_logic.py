@@ -0,0 +1,151 @@
+# bench_config_logic.py
+# Times the config_logic hot paths against the simulated adsk API in
+# benchmarks/fake_adsk and counts the API calls each operation makes.
+#
+#   python benchmarks/bench_config_logic.py --params 50 200 800 --snapshots 10 100 \
+#       --call-latency-us 5 --recompute-ms 2 --out bench_results.json
+#
+# Every (params, groups, snapshots) combination gets a fresh design seeded
+# with that many saved snapshots. Results are printed as a table and, with
+# --out, written as JSON: one record per size and operation with the median
+# time, API-call totals, recompute count and the most frequent API members.
+
+import argparse
+import importlib
+import importlib.machinery
+import importlib.util
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ADDIN_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, "fake_adsk"))
+
+import adsk.core
+import adsk.fusion
+
+def load_addin_module(name, package="liveconfig"):
+    """Imports an add-in module with the repo root as package `package`."""
+    if package not in sys.modules:
+        spec = importlib.machinery.ModuleSpec(package, None, is_package=True)
+        spec.submodule_search_locations = [ADDIN_DIR]
+        sys.modules[package] = importlib.util.module_from_spec(spec)
+    return importlib.import_module(package + "." + name)
+
+def reset_module_state(config_logic):
+    """Drops the add-in's per-process caches between designs."""
+    for attr in dir(config_logic):
+        value = getattr(config_logic, attr)
+        if attr.startswith("_") and isinstance(value, dict) and not attr.startswith("__"):
+            value.clear()
+
+def seed_design(config_logic, params, groups, snapshots, rng, components=0):
+    design = adsk.fusion.build_design(params=params, groups=groups, cfg_groups=groups, components=components)
+    reset_module_state(config_logic)
+    names = ["param_%d" % i for i in range(params)]
+    for s in range(snapshots):
+        for name in rng.sample(names, max(1, params // 20)):
+            design.userParameters.itemByName(name).expression = "%d mm" % rng.randint(10, 99)
+        config_logic.save_snapshot("Config_%d" % s)
+    return design
+
+def measure(fn, setup=None, repeat=5):
+    """Runs setup() then fn() `repeat` times; returns timings and the API calls of the last run."""
+    times = []
+    for _ in range(repeat):
+        if setup: setup()
+        adsk.core.reset_calls()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    calls = dict(adsk.core.calls)
+    return {
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "api_calls": sum(n for member, n in calls.items() if not member.startswith("<")),
+        "recomputes": calls.get("<recompute>", 0),
+        "top_members": sorted(calls.items(), key=lambda kv: -kv[1])[:8]
+    }
+
+def run_size(config_logic, params, groups, snapshots, repeat, rng, components=0):
+    design = seed_design(config_logic, params, groups, snapshots, rng, components)
+    root = design.rootComponent
+    target = "Config_%d" % (snapshots // 2) if snapshots else None
+    other = "Config_0" if snapshots else None
+    toggle_state = {"value": True}
+
+    def toggle():
+        config_logic.toggle_feature("CFG_Group_0", toggle_state["value"])
+        toggle_state["value"] = not toggle_state["value"]
+
+    ops = {
+        "scan_model": (config_logic.scan_model, None),
+        "save_snapshot": (lambda: config_logic.save_snapshot("Bench_Save"), None),
+        "delete_snapshot": (lambda: config_logic.delete_snapshot("Bench_Delete"),
+                            lambda: config_logic.save_snapshot("Bench_Delete")),
+        "toggle_feature": (toggle, None),
+    }
+    if components:
+        sub_state = {"value": True}
+        def toggle_sub():
+            config_logic.toggle_feature("Part_%d/CFG_Feature_0" % (components - 1), sub_state["value"])
+            sub_state["value"] = not sub_state["value"]
+        ops["toggle_sub_feature"] = (toggle_sub, None)
+    if target:
+        ops["apply_snapshot"] = (lambda: config_logic.apply_snapshot(target),
+                                 lambda: config_logic.apply_snapshot(other))
+
+    results = []
+    for op, (fn, setup) in ops.items():
+        record = measure(fn, setup, repeat)
+        record.update({"op": op, "params": params, "groups": groups, "snapshots": snapshots, "components": components})
+        results.append(record)
+    record = {"op": "storage", "params": params, "groups": groups, "snapshots": snapshots,
+              "attribute_bytes": root.attributes.total_size()}
+    results.append(record)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark config_logic against a simulated Fusion API.")
+    parser.add_argument("--params", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--groups", type=int, nargs="+", default=[5, 40])
+    parser.add_argument("--snapshots", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--components", type=int, default=0, help="sub-components, each with its own CFG_ features")
+    parser.add_argument("--call-latency-us", type=float, default=0.0, help="simulated cost of each API call")
+    parser.add_argument("--recompute-ms", type=float, default=0.0, help="simulated cost of each recompute")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write machine-readable results (JSON) to this file")
+    args = parser.parse_args()
+
+    adsk.core.latency["call"] = args.call_latency_us / 1e6
+    adsk.core.latency["recompute"] = args.recompute_ms / 1e3
+    config_logic = load_addin_module("config_logic")
+    rng = random.Random(args.seed)
+
+    results = []
+    print("%-18s %7s %6s %6s %11s %10s %10s" % ("op", "params", "groups", "snaps", "median ms", "api calls", "recomputes"))
+    for params in args.params:
+        for groups in args.groups:
+            for snapshots in args.snapshots:
+                for r in run_size(config_logic, params, groups, snapshots, args.repeat, rng, args.components):
+                    results.append(r)
+                    if r["op"] == "storage":
+                        continue
+                    print("%-18s %7d %6d %6d %11.3f %10d %10d" % (
+                        r["op"], params, groups, snapshots, r["median_s"] * 1000, r["api_calls"], r["recomputes"]))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({
+                "settings": {"call_latency_us": args.call_latency_us, "recompute_ms": args.recompute_ms,
+                             "repeat": args.repeat, "seed": args.seed},
+                "results": results
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# bench_config_matrix.py
+# Cross-snapshot queries on config_matrix.ConfigMatrix against answering them
+# straight from the parsed snapshot bodies, one body at a time.
+#
+#   python benchmarks/bench_config_matrix.py [--configs 500] [--params 200] [--features 20]
+#
+# Both sides start from the same bodies (the matrix from a loaded
+# SnapshotStore) and must return the same snapshots before timings are shown.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_config_logic import load_addin_module
+from bench_snapshot_codec import make_configs
+
+def timed(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def scan_filter(bodies, expressions, feature, param, limit):
+    """"feature off, param > limit" by walking every body."""
+    return [name for name, body in bodies.items()
+            if body["features"].get(feature) and (expressions.evaluate(body["params"][param], "mm") or 0) > limit]
+
+def scan_duplicates(bodies):
+    groups = {}
+    for name, body in bodies.items():
+        groups.setdefault(json.dumps(body, sort_keys=True), []).append(name)
+    return [names for names in groups.values() if len(names) > 1]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cross-snapshot queries.")
+    parser.add_argument("--configs", type=int, default=500)
+    parser.add_argument("--params", type=int, default=200)
+    parser.add_argument("--features", type=int, default=20)
+    args = parser.parse_args()
+
+    config_matrix = load_addin_module("config_matrix")
+    expressions = load_addin_module("expressions")
+    snapshot_store = load_addin_module("snapshot_store")
+
+    configs = make_configs(args.configs, args.params, args.features)
+    names = list(configs)
+    configs[names[-1]] = json.loads(json.dumps(configs[names[0]]))  # One known duplicate
+    raws = {name: json.dumps(body) for name, body in configs.items()}
+    store = snapshot_store.SnapshotStore()
+    for name, raw in raws.items():
+        store.put(name, json.loads(raw), dirty=False)
+    units = {"param_%d" % i: "mm" for i in range(args.params)}
+
+    feature, param = "CFG_Feature_3", "param_7"
+    query = "%s off, %s > 80" % (feature, param)
+    matrix, build_s = timed(lambda: config_matrix.build(store, names, units), repeat=3)
+    bodies = {name: json.loads(raw) for name, raw in raws.items()}
+
+    scan_rows, scan_s = timed(lambda: scan_filter({n: json.loads(r) for n, r in raws.items()}, expressions, feature, param, 80))
+    matrix_rows, matrix_s = timed(lambda: matrix.rows(matrix.query(query)))
+    assert scan_rows == matrix_rows, (scan_rows, matrix_rows)
+    scan_dups, scan_dup_s = timed(lambda: scan_duplicates({n: json.loads(r) for n, r in raws.items()}))
+    matrix_dups, matrix_dup_s = timed(matrix.duplicates)
+    assert sorted(map(sorted, scan_dups)) == sorted(map(sorted, matrix_dups)), (scan_dups, matrix_dups)
+    _, variation_s = timed(matrix.variation)
+    current = config_matrix.state_values(units, bodies[names[1]]["params"])
+    _, nearest_s = timed(lambda: matrix.nearest(current, bodies[names[1]]["features"]))
+
+    print("%d snapshots x %d params + %d features, %d matches" % (len(names), args.params, args.features, len(matrix_rows)))
+    print("%-22s %12.3fms" % ("build matrix", build_s * 1000))
+    print("%-22s %12s %12s" % ("", "parse bodies", "matrix"))
+    print("%-22s %10.3fms %10.3fms" % ("filter", scan_s * 1000, matrix_s * 1000))
+    print("%-22s %10.3fms %10.3fms" % ("duplicates", scan_dup_s * 1000, matrix_dup_s * 1000))
+    print("%-22s %12s %10.3fms" % ("variation", "-", variation_s * 1000))
+    print("%-22s %12s %10.3fms" % ("nearest", "-", nearest_s * 1000))
+
+if __name__ == "__main__":
+    main()
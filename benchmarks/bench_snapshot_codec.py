@@ -0,0 +1,93 @@
+# bench_snapshot_codec.py
+# Size and speed comparison of the compact snapshot format (snapshot_codec)
+# against the original single json.dumps(current_data) blob.
+#
+#   python benchmarks/bench_snapshot_codec.py [--configs 200] [--params 400] [--features 20]
+#
+# Every snapshot is round-tripped through encode/decode and checked against
+# its source before any numbers are reported.
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import snapshot_codec
+
+def make_configs(config_count, param_count, feature_count, seed=1):
+    """Synthetic snapshots: mostly shared values with a few per-config overrides."""
+    rng = random.Random(seed)
+    base_params = {"param_%d" % i: "%d mm" % rng.randint(1, 200) for i in range(param_count)}
+    base_feats = {"CFG_Feature_%d" % i: False for i in range(feature_count)}
+    configs = {}
+    for c in range(config_count):
+        params = dict(base_params)
+        for name in rng.sample(sorted(params), max(1, param_count // 20)):
+            params[name] = "%d mm" % rng.randint(1, 200)
+        feats = {name: rng.random() < 0.3 for name in base_feats}
+        configs["Config_%d" % c] = {"params": params, "features": feats}
+    return configs
+
+def timed(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def encode_all(configs, compress):
+    base = snapshot_codec.build_base(configs.values())
+    shards = {name: snapshot_codec.encode_snapshot(body, base, compress)[0] for name, body in configs.items()}
+    return base, shards
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare snapshot storage formats.")
+    parser.add_argument("--configs", type=int, default=200)
+    parser.add_argument("--params", type=int, default=400)
+    parser.add_argument("--features", type=int, default=20)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    configs = make_configs(args.configs, args.params, args.features)
+    results = {"configs": args.configs, "params": args.params, "features": args.features}
+
+    blob, t = timed(lambda: json.dumps(configs))
+    _, t_parse = timed(lambda: json.loads(blob))
+    results["legacy_blob"] = {"bytes": len(blob), "encode_s": t, "decode_s": t_parse}
+
+    for label, compress in (("compact", False), ("compact_zlib", True)):
+        (base, shards), t = timed(lambda: encode_all(configs, compress))
+        packed_base = snapshot_codec.pack(base, compress)
+
+        decoded, t_decode = timed(lambda: {n: snapshot_codec.decode_snapshot(raw, base) for n, raw in shards.items()})
+        for name, body in configs.items():
+            assert decoded[name] == body, "round-trip mismatch for %s (%s)" % (name, label)
+
+        one = next(iter(shards))
+        _, t_one = timed(lambda: snapshot_codec.decode_snapshot(shards[one], base), repeat=50)
+        results[label] = {
+            "bytes": len(packed_base) + sum(len(raw) for raw in shards.values()),
+            "base_bytes": len(packed_base),
+            "encode_s": t,
+            "decode_s": t_decode,
+            "decode_one_s": t_one
+        }
+
+    legacy = results["legacy_blob"]["bytes"]
+    print("%-14s %12s %8s %12s %12s" % ("format", "bytes", "ratio", "encode ms", "decode ms"))
+    for label in ("legacy_blob", "compact", "compact_zlib"):
+        r = results[label]
+        print("%-14s %12d %7.1f%% %12.2f %12.2f" % (
+            label, r["bytes"], 100.0 * r["bytes"] / legacy, r["encode_s"] * 1000, r["decode_s"] * 1000))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
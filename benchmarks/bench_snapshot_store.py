@@ -0,0 +1,83 @@
+# bench_snapshot_store.py
+# Memory and speed of the in-memory snapshot model (snapshot_store) against
+# the dict-of-dicts config_logic used to cache, one parsed body per snapshot.
+#
+#   python benchmarks/bench_snapshot_store.py [--configs 500] [--params 400] [--features 20]
+#
+# Both sides start from the same JSON text per snapshot, as read from its
+# attribute. Every body is checked to round-trip before numbers are reported.
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import snapshot_store
+from bench_snapshot_codec import make_configs
+
+def load_dicts(raws):
+    return {name: json.loads(raw) for name, raw in raws.items()}
+
+def load_store(raws):
+    store = snapshot_store.SnapshotStore()
+    for name, raw in raws.items():
+        store.put(name, json.loads(raw), dirty=False)
+    return store
+
+def allocated(fn):
+    """Returns (result, bytes still allocated by it)."""
+    tracemalloc.start()
+    result = fn()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+def timed(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare in-memory snapshot representations.")
+    parser.add_argument("--configs", type=int, default=500)
+    parser.add_argument("--params", type=int, default=400)
+    parser.add_argument("--features", type=int, default=20)
+    args = parser.parse_args()
+
+    configs = make_configs(args.configs, args.params, args.features)
+    raws = {name: json.dumps(body) for name, body in configs.items()}
+
+    dicts, dict_bytes = allocated(lambda: load_dicts(raws))
+    store, store_bytes = allocated(lambda: load_store(raws))
+    for name, body in configs.items():
+        assert dicts[name] == body, name
+        assert store.body(name) == body, name
+
+    names = list(configs)
+    param = "param_%d" % (args.params // 2)
+    param_index = store.param_keys.index[param]
+    rows = [
+        ("load all", timed(lambda: load_dicts(raws)), timed(lambda: load_store(raws))),
+        # A copy on the dict side: callers get a body they may modify.
+        ("copy of one body", timed(lambda: [{"params": dict(dicts[n]["params"]), "features": dict(dicts[n]["features"])}
+                                            for n in names]) / len(names),
+                             timed(lambda: [store.body(n) for n in names]) / len(names)),
+        ("one param, all snapshots", timed(lambda: [dicts[n]["params"].get(param) for n in names]),
+                                     timed(lambda: [store.snapshots[n].params[param_index] for n in names])),
+    ]
+
+    print("%d snapshots x %d params + %d features" % (args.configs, args.params, args.features))
+    print("%-26s %14s %14s" % ("", "dict-of-dicts", "SnapshotStore"))
+    print("%-26s %14d %14d" % ("bytes per snapshot", dict_bytes // args.configs, store_bytes // args.configs))
+    for label, dict_s, store_s in rows:
+        print("%-26s %12.3fms %12.3fms" % (label, dict_s * 1000, store_s * 1000))
+
+if __name__ == "__main__":
+    main()
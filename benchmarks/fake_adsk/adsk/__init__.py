@@ -0,0 +1,9 @@
+# Simulated subset of the Fusion 360 `adsk` API for running config_logic
+# outside Fusion. Put benchmarks/fake_adsk on sys.path before importing the
+# add-in; configure sizes and latencies through fusion.build_design().
+
+from . import core, fusion
+
+def doEvents():
+    core.record_call("adsk.doEvents")
+    return True
@@ -0,0 +1,132 @@
+# Simulated adsk.core: Application, viewport, documents, logging, events,
+# plus the API-call accounting and latency model shared with fusion.py.
+
+import time
+from collections import Counter
+
+# --- API ACCOUNTING & LATENCY ---
+
+calls = Counter()
+latency = {"call": 0.0, "recompute": 0.0}
+
+def reset_calls():
+    calls.clear()
+
+def _spin(seconds):
+    # time.sleep() is too coarse for microsecond latencies.
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+def record_call(member):
+    calls[member] += 1
+    if latency["call"]:
+        _spin(latency["call"])
+
+def record_recompute():
+    calls["<recompute>"] += 1
+    if latency["recompute"]:
+        _spin(latency["recompute"])
+
+# --- EVENTS & HANDLERS ---
+
+class Event:
+    def __init__(self):
+        self.handlers = []
+    def add(self, handler):
+        self.handlers.append(handler)
+        return True
+    def remove(self, handler):
+        if handler in self.handlers: self.handlers.remove(handler)
+        return True
+
+class _Handler:
+    def __init__(self):
+        pass
+
+class CustomEventHandler(_Handler): pass
+class HTMLEventHandler(_Handler): pass
+class CommandCreatedEventHandler(_Handler): pass
+class CommandEventHandler(_Handler): pass
+class DocumentEventHandler(_Handler): pass
+class UserInterfaceGeneralEventHandler(_Handler): pass
+
+class LogLevels:
+    InfoLogLevel = 0
+    WarningLogLevel = 1
+    ErrorLogLevel = 2
+
+class LogTypes:
+    FileLogType = 0
+    ConsoleLogType = 1
+
+class CustomEventArgs:
+    def __init__(self, additionalInfo=""):
+        self.additionalInfo = additionalInfo
+
+# --- APPLICATION ---
+
+class Viewport:
+    def refresh(self):
+        record_call("Viewport.refresh")
+        return True
+
+class Document:
+    def __init__(self, design, name, creation_id):
+        self._design = design
+        self._name = name
+        self.creationId = creation_id
+        self.isModified = False
+        self.dataFile = None
+
+    @property
+    def name(self):
+        record_call("Document.name")
+        return self._name
+
+class Application:
+    _instance = None
+
+    def __init__(self):
+        self.activeProduct = None
+        self.activeDocument = None
+        self.activeViewport = Viewport()
+        self.userInterface = None
+        self.documentActivated = Event()
+        self.documentDeactivating = Event()
+        self.customEvents = {}
+        self.fired = []
+        self.logged = []
+
+    @staticmethod
+    def get():
+        if Application._instance is None:
+            Application._instance = Application()
+        return Application._instance
+
+    def open_design(self, design, name="Benchmark v1", creation_id="bench-doc"):
+        self.activeProduct = design
+        self.activeDocument = Document(design, name, creation_id)
+        return self.activeDocument
+
+    def registerCustomEvent(self, event_id):
+        event = Event()
+        self.customEvents[event_id] = event
+        return event
+
+    def unregisterCustomEvent(self, event_id):
+        return self.customEvents.pop(event_id, None) is not None
+
+    def fireCustomEvent(self, event_id, additionalInfo=""):
+        # Queued, not dispatched: call run_custom_events() to deliver them.
+        self.fired.append((event_id, additionalInfo))
+        return event_id in self.customEvents
+
+    def run_custom_events(self):
+        while self.fired:
+            event_id, info = self.fired.pop(0)
+            for handler in list(self.customEvents.get(event_id, Event()).handlers):
+                handler.notify(CustomEventArgs(info))
+
+    def log(self, message, level=0, log_type=0):
+        self.logged.append(message)
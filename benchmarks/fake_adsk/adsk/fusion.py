@@ -0,0 +1,336 @@
+# Simulated adsk.fusion: a parametric design with user parameters, root and
+# sub-component features, timeline groups and attributes. Every property read,
+# write and method call goes through core.record_call for accounting.
+
+import itertools
+import re
+
+from .core import Application, record_call, record_recompute
+
+_KNOWN_WORDS = {"mm", "cm", "m", "in", "ft", "deg", "rad", "true", "false",
+                "sqrt", "abs", "sin", "cos", "tan", "min", "max", "floor", "ceil", "round", "PI", "E"}
+_tokens = itertools.count(1)
+_documents = itertools.count(1)
+
+class _Collection:
+    _member = "Collection"
+
+    def __init__(self, items=None):
+        self._items = list(items or [])
+
+    def __iter__(self):
+        record_call(self._member + ".__iter__")
+        for item in list(self._items):
+            record_call(self._member + ".next")
+            yield item
+
+    @property
+    def count(self):
+        record_call(self._member + ".count")
+        return len(self._items)
+
+    def item(self, index):
+        record_call(self._member + ".item")
+        return self._items[index] if 0 <= index < len(self._items) else None
+
+    def itemByName(self, name):
+        record_call(self._member + ".itemByName")
+        for item in self._items:
+            if item._name == name:
+                return item
+        return None
+
+# --- PARAMETERS ---
+
+class UserParameter:
+    def __init__(self, design, name, expression, unit):
+        self._design = design
+        self._name = name
+        self._expression = expression
+        self._unit = unit
+        self._favorite = False
+
+    @property
+    def name(self):
+        record_call("UserParameter.name")
+        return self._name
+
+    @property
+    def unit(self):
+        record_call("UserParameter.unit")
+        return self._unit
+
+    @property
+    def isFavorite(self):
+        record_call("UserParameter.isFavorite")
+        return self._favorite
+
+    @isFavorite.setter
+    def isFavorite(self, value):
+        record_call("UserParameter.isFavorite=")
+        self._favorite = bool(value)
+
+    @property
+    def expression(self):
+        record_call("UserParameter.expression")
+        return self._expression
+
+    @expression.setter
+    def expression(self, value):
+        record_call("UserParameter.expression=")
+        stripped = re.sub(r"'[^']*'|\"[^\"]*\"", "", value)
+        for ident in re.findall(r"[A-Za-z_][A-Za-z0-9_]*", stripped):
+            if ident not in _KNOWN_WORDS and ident not in self._design._params_by_name:
+                raise RuntimeError("3 : Unknown identifier '%s' in expression '%s'" % (ident, value))
+        self._expression = value
+        self._design._model_changed()
+
+    @property
+    def value(self):
+        record_call("UserParameter.value")
+        match = re.match(r"\s*(-?\d+(?:\.\d+)?)", self._expression)
+        return float(match.group(1)) / 10.0 if match else 0.0
+
+class UserParameters(_Collection):
+    _member = "UserParameters"
+
+    def __init__(self, design):
+        super().__init__()
+        self._design = design
+
+    def add(self, name, expression, unit="mm"):
+        param = UserParameter(self._design, name, expression, unit)
+        self._items.append(param)
+        self._design._params_by_name[name] = param
+        return param
+
+    def itemByName(self, name):
+        record_call(self._member + ".itemByName")
+        return self._design._params_by_name.get(name)
+
+# --- FEATURES & TIMELINE ---
+
+class _TimelineEntity:
+    _member = "Feature"
+
+    def __init__(self, design, name):
+        self._design = design
+        self._name = name
+        self._suppressed = False
+        self._token = "token-%d" % next(_tokens)
+        design._entities[self._token] = self
+
+    @property
+    def name(self):
+        record_call(self._member + ".name")
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        record_call(self._member + ".name=")
+        self._name = value
+
+    @property
+    def entityToken(self):
+        record_call(self._member + ".entityToken")
+        return self._token
+
+    @property
+    def isValid(self):
+        record_call(self._member + ".isValid")
+        return self._token in self._design._entities
+
+    @property
+    def timelineObject(self):
+        record_call(self._member + ".timelineObject")
+        return self
+
+    @property
+    def index(self):
+        record_call("TimelineObject.index")
+        items = self._design.timeline._items
+        return items.index(self) if self in items else len(items)
+
+    @property
+    def isSuppressed(self):
+        record_call(self._member + ".isSuppressed")
+        return self._suppressed
+
+    @isSuppressed.setter
+    def isSuppressed(self, value):
+        record_call(self._member + ".isSuppressed=")
+        self._suppressed = bool(value)
+        self._design._model_changed()
+
+class Feature(_TimelineEntity):
+    _member = "Feature"
+
+class TimelineGroup(_TimelineEntity):
+    _member = "TimelineGroup"
+
+class Features(_Collection):
+    _member = "Features"
+
+class TimelineGroups(_Collection):
+    _member = "TimelineGroups"
+
+class Timeline(_Collection):
+    _member = "Timeline"
+
+    def __init__(self):
+        super().__init__()
+        self.timelineGroups = TimelineGroups()
+
+    @property
+    def markerPosition(self):
+        record_call("Timeline.markerPosition")
+        return len(self._items)
+
+# --- ATTRIBUTES ---
+
+class Attribute:
+    def __init__(self, owner, group, name, value):
+        self._owner = owner
+        self.groupName = group
+        self.name = name
+        self._value = value
+
+    @property
+    def value(self):
+        record_call("Attribute.value")
+        return self._value
+
+    def deleteMe(self):
+        record_call("Attribute.deleteMe")
+        self._owner._items.pop((self.groupName, self.name), None)
+        return True
+
+class Attributes:
+    def __init__(self):
+        self._items = {}
+
+    def itemByName(self, group, name):
+        record_call("Attributes.itemByName")
+        return self._items.get((group, name))
+
+    def add(self, group, name, value):
+        record_call("Attributes.add")
+        attr = Attribute(self, group, name, value)
+        self._items[(group, name)] = attr
+        return attr
+
+    def itemsByGroup(self, group):
+        record_call("Attributes.itemsByGroup")
+        return [a for (g, _), a in self._items.items() if g == group]
+
+    @property
+    def count(self):
+        record_call("Attributes.count")
+        return len(self._items)
+
+    def total_size(self):
+        return sum(len(a._value) for a in self._items.values())
+
+# --- COMPONENTS & DESIGN ---
+
+class Component:
+    def __init__(self, design, name):
+        self._design = design
+        self._name = name
+        self.features = Features()
+        self.attributes = Attributes()
+        self.entityToken = "component-" + name
+
+    @property
+    def name(self):
+        record_call("Component.name")
+        return self._name
+
+    def add_feature(self, name):
+        feature = Feature(self._design, name)
+        self.features._items.append(feature)
+        self._design.timeline._items.append(feature)
+        return feature
+
+class Components(_Collection):
+    _member = "Components"
+
+class Design:
+    def __init__(self):
+        self._params_by_name = {}
+        self._entities = {}
+        self._deferred = False
+        self._dirty = False
+        self.userParameters = UserParameters(self)
+        self.timeline = Timeline()
+        self.rootComponent = Component(self, "Root")
+        self.allComponents = Components([self.rootComponent])
+
+    @staticmethod
+    def cast(obj):
+        return obj if isinstance(obj, Design) else None
+
+    @property
+    def allParameters(self):
+        record_call("Design.allParameters")
+        return self.userParameters  # No model parameters are simulated
+
+    @property
+    def isComputeDeferred(self):
+        record_call("Design.isComputeDeferred")
+        return self._deferred
+
+    @isComputeDeferred.setter
+    def isComputeDeferred(self, value):
+        record_call("Design.isComputeDeferred=")
+        self._deferred = bool(value)
+        if not self._deferred and self._dirty:
+            self._dirty = False
+            record_recompute()
+
+    def _model_changed(self):
+        if self._deferred:
+            self._dirty = True
+        else:
+            record_recompute()
+
+    def findEntityByToken(self, token):
+        record_call("Design.findEntityByToken")
+        entity = self._entities.get(token)
+        return [entity] if entity else []
+
+    def add_component(self, name):
+        component = Component(self, name)
+        self.allComponents._items.append(component)
+        return component
+
+    def add_group(self, name):
+        group = TimelineGroup(self, name)
+        self.timeline.timelineGroups._items.append(group)
+        return group
+
+def build_design(params=100, features=20, cfg_features=5, groups=5, cfg_groups=5, components=0,
+                 name="Benchmark v1"):
+    """Creates a design, makes it the active product and returns it.
+
+    `features` plain root features are interleaved with `cfg_features` CFG_
+    features; `groups` timeline groups include `cfg_groups` CFG_ groups.
+    Each of `components` sub-components gets the same mix of features.
+    """
+    design = Design()
+    for i in range(params):
+        design.userParameters.add("param_%d" % i, "%d mm" % (10 + i % 90))
+    for i in range(max(features, cfg_features)):
+        design.rootComponent.add_feature("Extrude%d" % i)
+        if i < cfg_features:
+            design.rootComponent.add_feature("CFG_Feature_%d" % i)
+    for c in range(components):
+        component = design.add_component("Part_%d" % c)
+        for i in range(max(features, cfg_features)):
+            component.add_feature("Extrude%d" % i)
+            if i < cfg_features:
+                component.add_feature("CFG_Feature_%d" % i)
+    for i in range(max(groups, cfg_groups)):
+        design.add_group("CFG_Group_%d" % i if i < cfg_groups else "Group_%d" % i)
+    Application.get().open_design(design, name, "bench-doc-%d" % next(_documents))
+    return design
@@ -0,0 +1,27 @@
+# config.py
+# Add-in settings. fusionAddInUtils.general_utils reads DEBUG from here.
+
+# Write all log messages to the Text Command window, not just errors. Also
+# reloads config_logic and friends on first use, so edits apply without
+# restarting Fusion (development only: production skips the reload).
+DEBUG = False
+
+# Create the palette hidden shortly after startup so opening it is instant.
+PRELOAD_PALETTE = True
+
+# Seconds after run() before the hidden palette is created (once Fusion is idle).
+PRELOAD_DELAY = 3.0
+
+# Collect per-action latency metrics from startup (the palette can toggle this).
+DIAGNOSTICS_ENABLED = False
+
+# Seconds between diagnostics summaries written through futil.log (0 = never).
+DIAGNOSTICS_LOG_INTERVAL = 300
+
+# Count and time every Fusion API call config_logic makes, per action, and
+# write a ranked report after each one (development only: it slows calls down).
+API_TRACE = False
+
+# Where the API trace report goes ("" = api_trace.txt in the add-in folder,
+# with a JSON copy next to it for diffing between runs).
+API_TRACE_FILE = ""
@@ -1,93 +1,1110 @@
 import adsk.core, adsk.fusion, traceback
+import hashlib
 import json
 import re
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from . import config_matrix
+from . import diagnostics
+from . import expressions
+from . import snapshot_codec
+from . import snapshot_order
+from . import snapshot_store
 
 ATTRIBUTE_GROUP = "EdJ_Data"
-ATTRIBUTE_NAME = "Config_Snapshots"
+ATTRIBUTE_NAME = "Config_Snapshots"  # Legacy single-blob storage, migrated on first read
+MANIFEST_ATTR = "Config_Manifest"
+BASE_ATTR = "Config_Base"
+SNAPSHOT_ATTR_PREFIX = "Config_Snapshot_"
 ACTIVE_CONFIG_ATTR = "Last_Active_Config"
+METRICS_ATTR = "Config_Metrics"
+MANIFEST_VERSION = 3
+METRICS_CACHE_LIMIT = 1000  # measured states kept per document, oldest dropped first
+
+# Last state sent to each palette, used to build delta updates.
+_ui_sync = {}
+
+# Per-document index of CFG_ features (per component) and timeline groups (see get_feature_index).
+_feature_indexes = {}
+
+# User-parameter dependency graph per document, rebuilt only when expressions change.
+_dependency_graphs = {}
+
+# Most recent scan_model() result per document, least recently used first.
+_scan_cache = OrderedDict()
+SCAN_CACHE_BUDGET = 4 * 1024 * 1024  # bytes of serialized state across all documents
+# Rough serialized size of one scanned parameter, feature and snapshot summary (see _scan_size).
+_SCAN_ITEM_BYTES = {"parameters": 128, "features": 64, "configs": 128}
+
+# Loaded snapshot_store.SnapshotStore per document (see get_store).
+_stores = {}
+
+# Decoded snapshot base per document as (base revision, base); only the current revision is kept.
+_base_cache = {}
+
+# config_matrix.ConfigMatrix per document and what it was built from (see get_matrix).
+_matrices = {}
+
+# Geometry metrics store per document (see load_metrics).
+_metrics_stores = {}
+
+# Last timeline_signature() per document with the cheap marker it was computed at.
+_timeline_signatures = {}
+
+# Fingerprint of each snapshot applied over the current model, keyed by
+# (document, shard attribute, revision, fingerprint of the keys it leaves alone).
+_overlay_fingerprints = {}
+
+# Parameter edits from the palette waiting to be flushed, in arrival order,
+# and the _document_key() of the document they were typed into.
+_pending_edits = {}
+_pending_edits_doc = None
+
+# Nesting depth of deferred_compute() windows.
+_compute_defer_depth = 0
+
+@contextmanager
+def deferred_compute(design):
+    """Defers recompute until the outermost window closes, then refreshes the viewport."""
+    global _compute_defer_depth
+    if _compute_defer_depth == 0:
+        design.isComputeDeferred = True
+    _compute_defer_depth += 1
+    try:
+        yield
+    finally:
+        _compute_defer_depth -= 1
+        if _compute_defer_depth == 0:
+            with diagnostics.phase("recompute"):
+                design.isComputeDeferred = False
+                adsk.core.Application.get().activeViewport.refresh()
+
+# --- CFG_ FEATURE INDEX ---
+
+def _document_key(app):
+    doc = app.activeDocument
+    return getattr(doc, "creationId", None) or doc.name
+
+# Features of sub-components are keyed "Component/CFG_Name"; root features and
+# timeline groups keep their bare name, so older snapshots still apply.
+
+def split_feature_key(key):
+    """Returns (component name, feature name); the component is "" for the root and groups."""
+    component, _, name = key.rpartition("/")
+    return component, name
+
+def is_feature_key(key):
+    return split_feature_key(key)[1].startswith("CFG_")
+
+def _component_prefix(component, root):
+    return "" if component == root else component.name + "/"
+
+def _index_component(component, prefix):
+    entries = {}
+    for feature in component.features:
+        if feature.name.startswith("CFG_"):
+            entries[prefix + feature.name] = ("feature", feature.entityToken)
+    return entries
+
+def _index_groups(design):
+    entries = {}
+    for i, group in enumerate(design.timeline.timelineGroups):
+        if group.name.startswith("CFG_"):
+            entries[group.name] = ("group", i)
+    return entries
+
+def _refresh_feature_index(design, index, rebuild):
+    """Re-walks the components whose feature count moved, plus those in `rebuild` (True: all)."""
+    root = design.rootComponent
+    components = {}
+    for component in design.allComponents:
+        prefix = _component_prefix(component, root)
+        marker = component.features.count
+        cached = index["components"].get(prefix)
+        if cached and cached["marker"] == marker and rebuild is not True and prefix not in rebuild:
+            components[prefix] = cached
+        else:
+            components[prefix] = {"marker": marker, "entries": _index_component(component, prefix)}
+    index["components"] = components
+
+    # Root features first, then sub-components in design order, then groups.
+    entries = dict(components.get("", {}).get("entries", {}))
+    for prefix, component in components.items():
+        if prefix: entries.update(component["entries"])
+    entries.update(_index_groups(design))
+    index["entries"] = entries
+
+def get_feature_index(design, rebuild=False):
+    """Returns {key: (kind, ref)} for every CFG_ feature in any component and every CFG_ timeline group.
+
+    Features are referenced by entity token and groups by timeline group index.
+    Nothing is walked while the timeline length and group count stay the same.
+    When they change, each component is re-walked only if its feature count
+    changed (groups are always re-read).
+    Renames keep both counts: pass rebuild=True (or a set of component
+    prefixes such as {"", "Bracket/"}) to re-walk anyway.
+    """
+    app = adsk.core.Application.get()
+    doc_key = _document_key(app)
+    marker = (design.timeline.count, design.timeline.timelineGroups.count)
+    index = _feature_indexes.get(doc_key)
+    if not index:
+        index = _feature_indexes[doc_key] = {"marker": None, "components": {}, "entries": {}}
+    elif not rebuild and index["marker"] == marker:
+        return index["entries"]
+    with diagnostics.phase("index features"):
+        _refresh_feature_index(design, index, rebuild or ())
+    index["marker"] = marker
+    return index["entries"]
+
+def invalidate_feature_index():
+    """Forgets the active document's index so the next lookup re-walks every component."""
+    _feature_indexes.pop(_document_key(adsk.core.Application.get()), None)
+
+def _key_prefix(key):
+    component, _ = split_feature_key(key)
+    return component + "/" if component else ""
+
+def _resolve_index_entry(design, name, entry):
+    kind, ref = entry
+    if kind == "feature":
+        found = design.findEntityByToken(ref)
+        item = found[0] if found else None
+    else:
+        item = design.timeline.timelineGroups.item(ref)
+    if item and item.name == split_feature_key(name)[1]:
+        return item
+    return None
+
+def _find_by_key(design, key):
+    """Direct lookup of a key the index doesn't have: a component's feature, else (for bare keys) a timeline group."""
+    component_name, name = split_feature_key(key)
+    component = design.allComponents.itemByName(component_name) if component_name else design.rootComponent
+    item = component.features.itemByName(name) if component else None
+    if item or component_name: return item
+    for group in design.timeline.timelineGroups:
+        if group.name == name:
+            return group
+    return None
+
+def find_cfg_item(design, name):
+    """Looks up a CFG_ feature ("Component/CFG_Name" outside the root) or timeline group through the index."""
+    entry = get_feature_index(design).get(name)
+    if not entry:
+        # Not indexed (e.g. renamed since the last rescan): one direct lookup.
+        return _find_by_key(design, name)
+    item = _resolve_index_entry(design, name, entry)
+    if item is None:
+        # Entry went stale (renamed or deleted): re-walk its component and retry.
+        entry = get_feature_index(design, rebuild={_key_prefix(name)}).get(name)
+        if entry:
+            item = _resolve_index_entry(design, name, entry)
+    return item
+
+def get_cfg_items(design):
+    """Returns [(key, item)] for every CFG_ feature and timeline group, in index order."""
+    entries = get_feature_index(design)
+    items = [(name, _resolve_index_entry(design, name, entry)) for name, entry in entries.items()]
+    stale = {_key_prefix(name) for name, item in items if item is None}
+    if stale:
+        # Something went stale: re-walk only the components it belongs to.
+        entries = get_feature_index(design, rebuild=stale)
+        items = [(name, _resolve_index_entry(design, name, entry)) for name, entry in entries.items()]
+    return [(name, item) for name, item in items if item is not None]
+
+# --- PARAMETER DEPENDENCIES ---
+
+def safe_value(param):
+    """param.value, or 0 for Text/Boolean parameters that raise on .value."""
+    try:
+        return param.value
+    except:
+        return 0
+
+def get_dependency_graph(design, expression_map=None):
+    """Returns the user-parameter dependency graph (see expressions.build_dependency_graph).
+
+    Pass `expression_map` when the expressions were just read (scan_model does)
+    so they aren't read again; the graph is only rebuilt when they differ from
+    the ones it was built from.
+    """
+    doc_key = _document_key(adsk.core.Application.get())
+    cached = _dependency_graphs.get(doc_key)
+    if expression_map is None:
+        if cached: return cached["graph"]
+        expression_map = {p.name: p.expression for p in design.userParameters}
+    if cached and cached["expressions"] == expression_map:
+        return cached["graph"]
+
+    graph = expressions.build_dependency_graph(
+        expression_map, lambda: [p.name for p in design.allParameters])
+    _dependency_graphs[doc_key] = {"expressions": dict(expression_map), "graph": graph}
+    return graph
+
+def get_expressions(design):
+    """Current {user parameter: expression}, from the graph cache when available."""
+    get_dependency_graph(design)
+    return _dependency_graphs[_document_key(adsk.core.Application.get())]["expressions"]
+
+def _note_expressions(design, changes):
+    """Brings the cached graph up to date after our own expression writes."""
+    if not changes: return
+    expression_map = dict(get_expressions(design))
+    expression_map.update(changes)
+    get_dependency_graph(design, expression_map)
+
+def parameter_issues(graph):
+    """{name: message} for parameters on a reference cycle or referencing unknown names."""
+    issues = {name: "Unknown name: " + ", ".join(refs) for name, refs in graph["unknown"].items()}
+    for name in graph["cycles"]:
+        issues[name] = "Circular reference"
+    return issues
+
+def parameter_units(design):
+    """{user parameter: unit}, from the cached scan when there is one (units don't change on edits)."""
+    entry = _scan_cache.get(_document_key(adsk.core.Application.get()))
+    if entry:
+        return {p["name"]: p["unit"] for p in entry["state"]["parameters"]}
+    return {p.name: p.unit for p in design.userParameters}
+
+def _parameter_unit(design, name):
+    """Unit of any parameter named `name` (True if it has none readable), or None if there's no such parameter."""
+    param = design.allParameters.itemByName(name)
+    if not param: return None
+    try:
+        return param.unit
+    except:
+        return True
+
+def _edit_cycles(design, edits):
+    """Names that would sit on a reference cycle once {name: expression} `edits` are written."""
+    expression_map = dict(get_expressions(design))
+    expression_map.update(edits)
+    return set(expressions.build_dependency_graph(expression_map)["cycles"])
+
+def check_parameter_edit(design, name, expression, units=None, cycles=None):
+    """Why Fusion would reject `expression` for user parameter `name`, or None (see expressions.check_expression).
+
+    Checked locally, so a bad edit costs no write and no recompute. Names that
+    aren't user parameters are looked up among the model parameters. `cycles`
+    is _edit_cycles() for all edits being written together.
+    """
+    units = parameter_units(design) if units is None else units
+    if name not in units:
+        return "Unknown parameter"
+    error = expressions.check_expression(expression, units[name], units, lambda ref: _parameter_unit(design, ref))
+    if error: return error
+    cycles = _edit_cycles(design, {name: expression}) if cycles is None else cycles
+    return "Circular reference" if name in cycles else None
+
+# --- STATE FINGERPRINTS ---
+
+def state_fingerprint(params, features):
+    """Canonical hash of {param: expression} and {feature: isSuppressed} maps."""
+    canonical = json.dumps([
+        sorted(params.items()),
+        sorted((name, None if v is None else bool(v)) for name, v in features.items())
+    ], separators=(",", ":"))
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:20]
+
+def keyset_fingerprint(param_names, feature_names):
+    """Hash identifying which parameters and features a snapshot covers."""
+    return state_fingerprint({name: "" for name in param_names}, {name: False for name in feature_names})
+
+def _fingerprint_entry(manifest, entry, body):
+    """Stores the body's fingerprint and key set on a manifest entry (not saved)."""
+    params = body.get("params", {})
+    feats = body.get("features", {})
+    keys_fp = keyset_fingerprint(params, feats)
+    manifest.setdefault("keysets", {})[keys_fp] = {"params": sorted(params), "features": sorted(feats)}
+    entry["fp"] = state_fingerprint(params, feats)
+    entry["keys"] = keys_fp
+
+def _prune_keysets(manifest):
+    used = {entry.get("keys") for entry in manifest["configs"].values()}
+    keysets = manifest.get("keysets", {})
+    for keys_fp in [k for k in keysets if k not in used]:
+        del keysets[keys_fp]
+
+def find_matching_configs(root, manifest, current_params, current_feats):
+    """Names of snapshots whose saved values all equal the current state.
+
+    Compares one hash per snapshot: the current state is hashed once per
+    distinct snapshot key set. Snapshots saved before fingerprints existed are
+    fingerprinted on first use and the manifest is updated.
+    """
+    missing = [(name, entry) for name, entry in manifest["configs"].items() if "fp" not in entry]
+    for name, entry in missing:
+        body = load_snapshot_body(root, name, manifest)
+        if body is not None:
+            _fingerprint_entry(manifest, entry, body)
+    if missing:
+        _save_manifest(root, manifest)
+
+    current_by_keyset = {}
+    for keys_fp, keys in manifest.get("keysets", {}).items():
+        current_by_keyset[keys_fp] = state_fingerprint(
+            {name: current_params.get(name) for name in keys["params"]},
+            {name: current_feats.get(name) for name in keys["features"]})
+
+    return [name for name, entry in manifest["configs"].items()
+            if "fp" in entry and current_by_keyset.get(entry.get("keys")) == entry["fp"]]
+
+# --- SNAPSHOT STORAGE ---
+# One attribute per snapshot plus a small manifest and a shared base state:
+#   Config_Manifest    {"version", "next_id", "base_rev", "keysets",
+#                       "configs": {name: {"key", "rev", "size", "saved", "fp", "keys"}}}
+#   Config_Base        key tables and base values (see snapshot_codec)
+#   Config_Snapshot_N  the snapshot encoded as a delta against the base
+#
+# This section is the adsk adapter behind snapshot_store.SnapshotStore: each
+# document's store is loaded once, keeps the parsed manifest and the decoded
+# snapshots in memory, and flush_store() writes back only what changed.
+
+def _decode_attr(attr, decode=json.loads):
+    """Decodes an attribute's value, or returns None if it can't be parsed."""
+    with diagnostics.phase("parse attributes"):
+        try:
+            return decode(attr.value)
+        except:
+            return None
+
+def _empty_manifest():
+    return {"version": MANIFEST_VERSION, "next_id": 1, "base_rev": 0, "configs": {}}
+
+def _read_legacy_bodies(root, manifest):
+    """Reads format 2 bodies: the Config_Snapshots blob, or plain per-snapshot attributes."""
+    legacy = root.attributes.itemByName(ATTRIBUTE_GROUP, ATTRIBUTE_NAME)
+    if legacy:
+        return _decode_attr(legacy) or {}, legacy
+
+    bodies = {}
+    for name, entry in manifest["configs"].items():
+        attr = root.attributes.itemByName(ATTRIBUTE_GROUP, entry["key"])
+        body = _decode_attr(attr) if attr else None
+        if body is not None:
+            bodies[name] = body
+    return bodies, None
+
+def compact_snapshot_store(root, bodies=None, manifest=None):
+    """Rebuilds the shared base from all snapshots and re-encodes every snapshot against it."""
+    if manifest is None:
+        manifest = load_manifest(root)
+    if bodies is None:
+        bodies = {name: load_snapshot_body(root, name, manifest) for name in manifest["configs"]}
+        bodies = {name: body for name, body in bodies.items() if body is not None}
+
+    base = snapshot_codec.build_base(bodies.values())
+    _save_base(root, manifest, base)
+    for name, body in bodies.items():
+        entry = manifest["configs"].get(name, {})
+        _write_snapshot_body(root, manifest, name, body, entry.get("saved"), base)
+    manifest["version"] = MANIFEST_VERSION
+    _save_manifest(root, manifest)
+    return manifest
+
+def _migrate_snapshot_store(root, manifest):
+    """Upgrades the legacy blob or plain per-snapshot attributes to the compact format."""
+    bodies, legacy = _read_legacy_bodies(root, manifest)
+    manifest.setdefault("base_rev", 0)
+    if bodies or legacy:
+        manifest = compact_snapshot_store(root, bodies, manifest)
+    if legacy:
+        legacy.deleteMe()
+    return manifest
+
+def _read_manifest(root, attr):
+    """Parses the manifest attribute, migrating older storage formats."""
+    if not attr:
+        return _migrate_snapshot_store(root, _empty_manifest())
+    manifest = _decode_attr(attr)
+    if manifest is None:
+        return _empty_manifest()
+    if manifest.get("version", 0) < MANIFEST_VERSION:
+        manifest = _migrate_snapshot_store(root, manifest)
+    return manifest
+
+def get_store(root):
+    """Returns the active document's SnapshotStore, parsing the manifest only when it changed.
+
+    The manifest attribute's text is compared with the text the store was
+    loaded from, so an undo or another writer reloads the store.
+    """
+    doc_key = _document_key(adsk.core.Application.get())
+    attr = root.attributes.itemByName(ATTRIBUTE_GROUP, MANIFEST_ATTR)
+    raw = attr.value if attr else None
+    store = _stores.get(doc_key)
+    if store is not None and store.meta["raw"] == raw:
+        return store
+    store = _stores[doc_key] = snapshot_store.SnapshotStore({"raw": raw, "manifest": _empty_manifest()})
+    store.meta["manifest"] = _read_manifest(root, attr)  # Migrations save through _save_manifest
+    return store
+
+def load_manifest(root):
+    """Returns the snapshot manifest, migrating older storage formats transparently."""
+    return get_store(root).meta["manifest"]
+
+def _save_manifest(root, manifest):
+    raw = json.dumps(manifest)
+    root.attributes.add(ATTRIBUTE_GROUP, MANIFEST_ATTR, raw)
+    store = _stores.get(_document_key(adsk.core.Application.get()))
+    if store is not None:
+        store.meta["raw"] = raw
+        store.meta["manifest"] = manifest
+
+def _load_base(root, manifest):
+    doc_key = _document_key(adsk.core.Application.get())
+    rev = manifest.get("base_rev", 0)
+    cached = _base_cache.get(doc_key)
+    if cached and cached[0] == rev:
+        return cached[1]
+    attr = root.attributes.itemByName(ATTRIBUTE_GROUP, BASE_ATTR)
+    base = _decode_attr(attr, snapshot_codec.unpack) if attr else None
+    if base is None:
+        base = snapshot_codec.empty_base()
+    _base_cache[doc_key] = (rev, base)
+    return base
+
+def _save_base(root, manifest, base):
+    """Writes the base and bumps its revision (the manifest still needs saving)."""
+    manifest["base_rev"] = manifest.get("base_rev", 0) + 1
+    root.attributes.add(ATTRIBUTE_GROUP, BASE_ATTR, snapshot_codec.pack(base))
+    _base_cache[_document_key(adsk.core.Application.get())] = (manifest["base_rev"], base)
+
+def _write_snapshot_body(root, manifest, name, body, saved, base):
+    """Encodes one snapshot against `base` into its attribute and records it in `manifest` (not saved)."""
+    entry = manifest["configs"].get(name)
+    if entry:
+        entry["rev"] = entry.get("rev", 0) + 1
+    else:
+        entry = {"key": SNAPSHOT_ATTR_PREFIX + str(manifest["next_id"]), "rev": 1}
+        manifest["next_id"] += 1
+        manifest["configs"][name] = entry
+
+    raw, _ = snapshot_codec.encode_snapshot(body, base)
+    root.attributes.add(ATTRIBUTE_GROUP, entry["key"], raw)
+    entry["size"] = len(raw)
+    entry["saved"] = saved
+    _fingerprint_entry(manifest, entry, body)
+    return entry
+
+def flush_store(root, store, saved=None):
+    """Writes the store's changes: one attribute per changed snapshot, at most one base and one manifest write.
+
+    Snapshots written into a store with no other snapshots get a base built
+    from them, so they encode as small deltas. Returns the manifest.
+    """
+    dirty, removed = store.take_dirty()
+    manifest = store.meta["manifest"]
+    if not dirty and not removed: return manifest
+    saved = saved or int(time.time())
+
+    with diagnostics.phase("write snapshots"):
+        for name in removed:
+            entry = manifest["configs"].pop(name, None)
+            attr = root.attributes.itemByName(ATTRIBUTE_GROUP, entry["key"]) if entry else None
+            if attr: attr.deleteMe()
+        if removed:
+            _prune_keysets(manifest)
+
+        if dirty:
+            bodies = {name: store.body(name) for name in dirty}
+            if any(name not in bodies for name in manifest["configs"]):
+                # Interning new keys mutates the base, so work on a private copy.
+                base = json.loads(json.dumps(_load_base(root, manifest)))
+                key_counts = (len(base["params"]), len(base["features"]))
+            else:
+                base = snapshot_codec.build_base(bodies.values())
+                key_counts = None
+            for name, body in bodies.items():
+                _write_snapshot_body(root, manifest, name, body, saved, base)
+            if key_counts != (len(base["params"]), len(base["features"])):
+                _save_base(root, manifest, base)
+        _save_manifest(root, manifest)
+    return manifest
+
+def save_snapshot_bodies(bodies, saved=None):
+    """Stores many snapshots ({name: body}) at once through one flush_store(). Returns the manifest."""
+    app = adsk.core.Application.get()
+    root = app.activeProduct.rootComponent
+    store = get_store(root)
+    for name, body in bodies.items():
+        store.put(name, body)
+    return flush_store(root, store, saved)
+
+def load_snapshot_body(root, name, manifest=None):
+    """Returns one snapshot's body, decoding its attribute into the store on first use; None if it doesn't exist.
+
+    Pass the manifest from load_manifest() when reading many snapshots in a
+    row: the store is then used as loaded, without re-checking the manifest.
+    """
+    store = _stores.get(_document_key(adsk.core.Application.get())) if manifest is not None else None
+    if store is None or store.meta["manifest"] is not manifest:
+        store = get_store(root)
+        manifest = store.meta["manifest"]
+
+    body = store.body(name)
+    if body is not None: return body
+    entry = manifest["configs"].get(name)
+    if not entry: return None
+    attr = root.attributes.itemByName(ATTRIBUTE_GROUP, entry["key"])
+    if not attr: return None
+    base = _load_base(root, manifest)
+    body = _decode_attr(attr, lambda raw: snapshot_codec.decode_snapshot(raw, base))
+    if body is None: return None
+    store.put(name, body, dirty=False)
+    return body
+
+def snapshot_summaries(manifest):
+    """Returns {name: {"size", "saved", "fp"}} for every snapshot, without reading any body.
+
+    The palette caches bodies fetched with get_snapshot() until "fp" changes.
+    """
+    return {name: {"size": entry.get("size", 0), "saved": entry.get("saved"), "fp": entry.get("fp")}
+            for name, entry in manifest["configs"].items()}
+
+def get_snapshot(config_name):
+    """Returns one snapshot for the palette as {"name", "fp", "params", "features"}, or None."""
+    design = adsk.core.Application.get().activeProduct
+    if not design: return None
+    root = design.rootComponent
+    manifest = load_manifest(root)
+    body = load_snapshot_body(root, config_name, manifest)
+    if body is None: return None
+    return {
+        "name": config_name,
+        "fp": manifest["configs"][config_name].get("fp"),
+        "params": body.get("params", {}),
+        "features": body.get("features", {})
+    }
 
 def scan_model():
-    """Scans parameters and timeline features/groups."""
+    """Scans parameters and CFG_ features/groups of all components. Returns the state as a dict."""
+    with diagnostics.phase("scan"):
+        state = _scan_model()
+    if "error" not in state:
+        _remember_scan(state)
+    return state
+
+# --- CONFIG MATRIX ---
+# Questions across all snapshots (filters, variation, duplicates, nearest to
+# the model) answered from a config_matrix.ConfigMatrix. Building it loads
+# every snapshot into the store once; it is rebuilt when the manifest or the
+# parameter units change, or a model expression it read for a snapshot that
+# doesn't set that parameter.
+
+def get_matrix(design):
+    """Returns the active document's ConfigMatrix, rebuilding it when stale."""
+    root = design.rootComponent
+    store = get_store(root)
+    units = parameter_units(design)
+    doc_key = _document_key(adsk.core.Application.get())
+    cached = _matrices.get(doc_key)
+    if cached and cached["raw"] == store.meta["raw"] and cached["units"] == units:
+        external = cached["matrix"].external
+        current = get_expressions(design) if external else {}
+        if all(current.get(name) == expression for name, expression in external.items()):
+            return cached["matrix"]
+
+    manifest = store.meta["manifest"]
+    with diagnostics.phase("build matrix"):
+        for name in manifest["configs"]:
+            if name not in store:
+                load_snapshot_body(root, name, manifest)
+        matrix = config_matrix.build(store, manifest["configs"], units, get_expressions(design))
+    _matrices[doc_key] = {"raw": store.meta["raw"], "units": units, "matrix": matrix}
+    return matrix
+
+def query_configs(text):
+    """Snapshots matching a filter (see ConfigMatrix.query) as {"query", "matches", "error"}; matches is None on error."""
+    design = adsk.core.Application.get().activeProduct
+    if not design: return {"query": text, "matches": None, "error": "No design"}
+    matrix = get_matrix(design)
+    try:
+        matches = matrix.rows(matrix.query(text))
+    except ValueError as e:
+        return {"query": text, "matches": None, "error": str(e)}
+    return {"query": text, "matches": matches, "error": None}
+
+def config_report(nearest=3):
+    """Duplicates, varying keys and the snapshots nearest the model, over all snapshots.
+
+    Returns {"count", "duplicates": [[names]], "varying": [variation entries],
+    "constant": number of keys set alike everywhere, "nearest": [...]} (see
+    ConfigMatrix.variation and nearest), or None without a design.
+    """
+    design = adsk.core.Application.get().activeProduct
+    if not design: return None
+    matrix = get_matrix(design)
+    state = capture_state(design)
+    variation = matrix.variation()
+    varying = [entry for entry in variation if entry["distinct"] > 1]
+    return {
+        "count": len(matrix),
+        "duplicates": matrix.duplicates(),
+        "varying": varying,
+        "constant": len(variation) - len(varying),
+        "nearest": matrix.nearest(config_matrix.state_values(parameter_units(design), state["params"]),
+                                  state["features"], nearest)
+    }
+
+# --- GEOMETRY METRICS CACHE ---
+# Measured values (see sweep.METRICS) keyed by the fingerprint of the full
+# model state they were measured in, so comparing configs doesn't need them
+# applied again:
+#   Config_Metrics  {"timeline": signature, "entries": {fp: {"values", "at"}}}
+# The whole store is dropped when the timeline signature changes. Edits inside
+# a feature that leave the timeline alone (sketch dimensions, model
+# parameters) aren't noticed; clear_metrics() resets the store.
+
+def timeline_signature(design):
+    """Hash of the timeline's item names and kinds, in order, plus the marker position.
+
+    Walking the timeline costs two API reads per item, so the hash is reused
+    while the timeline length, marker position and group count stay the same.
+    """
+    timeline = design.timeline
+    doc_key = _document_key(adsk.core.Application.get())
+    marker = (timeline.count, timeline.markerPosition, timeline.timelineGroups.count)
+    cached = _timeline_signatures.get(doc_key)
+    if cached and cached[0] == marker:
+        return cached[1]
+    with diagnostics.phase("timeline signature"):
+        items = [(item.name, bool(getattr(item, "isGroup", False))) for item in timeline]
+        items.append(timeline.markerPosition)
+    signature = hashlib.sha1(json.dumps(items).encode("utf-8")).hexdigest()[:20]
+    _timeline_signatures[doc_key] = (marker, signature)
+    return signature
+
+def load_metrics(design, signature=None):
+    """Returns the active document's metrics store, emptied if the timeline changed since it was filled.
+
+    The signature is only computed (unless given) when the store has entries.
+    """
+    doc_key = _document_key(adsk.core.Application.get())
+    store = _metrics_stores.get(doc_key)
+    if store is None:
+        attr = design.rootComponent.attributes.itemByName(ATTRIBUTE_GROUP, METRICS_ATTR)
+        store = (_decode_attr(attr) if attr else None) or {"timeline": None, "entries": {}}
+        _metrics_stores[doc_key] = store
+    if store["entries"]:
+        signature = signature or timeline_signature(design)
+        if store["timeline"] != signature:
+            store = _metrics_stores[doc_key] = {"timeline": signature, "entries": {}}
+    return store
+
+def save_metrics(design):
+    """Writes the metrics store, dropping the oldest entries beyond METRICS_CACHE_LIMIT."""
+    store = _metrics_stores.get(_document_key(adsk.core.Application.get()))
+    if store is None: return
+    entries = store["entries"]
+    if len(entries) > METRICS_CACHE_LIMIT:
+        for fp in sorted(entries, key=lambda k: entries[k].get("at", 0))[:len(entries) - METRICS_CACHE_LIMIT]:
+            del entries[fp]
+    design.rootComponent.attributes.add(ATTRIBUTE_GROUP, METRICS_ATTR, json.dumps(store))
+
+def clear_metrics(design):
+    _metrics_stores[_document_key(adsk.core.Application.get())] = {"timeline": None, "entries": {}}
+    attr = design.rootComponent.attributes.itemByName(ATTRIBUTE_GROUP, METRICS_ATTR)
+    if attr: attr.deleteMe()
+
+def remember_metrics(design, values, state=None, signature=None, save=True):
+    """Records measured `values` for `state` (default: the current model state). Returns its fingerprint.
+
+    Pass the timeline signature and save=False when recording many states in
+    a row, then call save_metrics() once.
+    """
+    state = state or capture_state(design)
+    fp = state_fingerprint(state["params"], state["features"])
+    signature = signature or timeline_signature(design)
+    store = load_metrics(design, signature)
+    store["timeline"] = signature
+    entry = store["entries"].setdefault(fp, {"values": {}})
+    entry["values"].update(values)
+    entry["at"] = int(time.time())
+    if save:
+        save_metrics(design)
+    return fp
+
+def cached_metrics(design, state, signature=None):
+    """Measured values for a full `state`, or None if it hasn't been measured."""
+    entry = load_metrics(design, signature)["entries"].get(state_fingerprint(state["params"], state["features"]))
+    return entry["values"] if entry else None
+
+def overlay_state(current, body):
+    """The full state reached by applying snapshot `body` to `current` (names the model lacks are ignored)."""
+    params = body.get("params", {})
+    features = body.get("features", {})
+    return {
+        "params": {name: params.get(name, expr) for name, expr in current["params"].items()},
+        "features": {name: features.get(name, value) for name, value in current["features"].items()}
+    }
+
+def _attach_metrics(root, manifest, current, configs, store):
+    """Adds cached metrics to the snapshot summaries in `configs`; returns the current state's metrics."""
+    if not store["entries"]: return None
+    for name, values in snapshot_metrics(root, manifest, current, store["entries"]).items():
+        if name in configs:
+            configs[name]["metrics"] = values
+    entry = store["entries"].get(state_fingerprint(current["params"], current["features"]))
+    return entry["values"] if entry else None
+
+def snapshot_metrics(root, manifest, current, entries):
+    """Returns {name: values} for the snapshots whose state, applied to `current`, has cached metrics.
+
+    The overlaid fingerprint is remembered per snapshot revision and per
+    value of the keys the snapshot leaves alone, so repeat scans read no bodies.
+    """
+    if len(_overlay_fingerprints) > 4 * METRICS_CACHE_LIMIT:
+        _overlay_fingerprints.clear()
+    doc_key = _document_key(adsk.core.Application.get())
+    current_keys = keyset_fingerprint(current["params"], current["features"])
+    untouched = {}
+    found = {}
+    for name, entry in manifest["configs"].items():
+        keys = manifest.get("keysets", {}).get(entry.get("keys"))
+        if keys is None: continue
+        if entry["keys"] not in untouched:
+            covered_params, covered_features = set(keys["params"]), set(keys["features"])
+            untouched[entry["keys"]] = state_fingerprint(
+                {n: v for n, v in current["params"].items() if n not in covered_params},
+                {n: v for n, v in current["features"].items() if n not in covered_features})
+        memo_key = (doc_key, entry["key"], entry.get("rev"), current_keys, untouched[entry["keys"]])
+        fp = _overlay_fingerprints.get(memo_key)
+        if fp is None:
+            body = load_snapshot_body(root, name, manifest)
+            if body is None: continue
+            state = overlay_state(current, body)
+            fp = _overlay_fingerprints[memo_key] = state_fingerprint(state["params"], state["features"])
+        if fp in entries:
+            found[name] = entries[fp]["values"]
+    return found
+
+# --- PER-DOCUMENT SCAN CACHE ---
+
+def _design_marker(app, design):
+    """Cheap change marker for a design: saved version plus timeline and parameter counts."""
+    data_file = app.activeDocument.dataFile
+    return (
+        data_file.versionNumber if data_file else 0,
+        design.timeline.count,
+        design.timeline.markerPosition,
+        design.userParameters.count
+    )
+
+def _scan_size(state):
+    """Estimated serialized size of a scan from its item counts; serializing it to measure costs as much as the send."""
+    return 1024 + sum(len(state.get(key) or ()) * size for key, size in _SCAN_ITEM_BYTES.items())
+
+def _remember_scan(state):
+    app = adsk.core.Application.get()
+    doc_key = _document_key(app)
+    _scan_cache.pop(doc_key, None)
+    _scan_cache[doc_key] = {
+        "marker": _design_marker(app, app.activeProduct),
+        "state": state,
+        "size": _scan_size(state)
+    }
+    # Evict least recently used documents beyond the budget (always keep the active one).
+    total = sum(entry["size"] for entry in _scan_cache.values())
+    while total > SCAN_CACHE_BUDGET and len(_scan_cache) > 1:
+        _, evicted = _scan_cache.popitem(last=False)
+        total -= evicted["size"]
+
+def get_cached_scan():
+    """Returns (state, is_stale) for the active document without scanning.
+
+    state is None when the document has no cached scan. is_stale is True when
+    the design's change marker moved since that scan. The marker is cheap but
+    blind to suppressions and expression edits made outside the palette, so a
+    state that isn't stale still needs a rescan to confirm it; is_stale only
+    says the rescan shouldn't wait.
+    """
     app = adsk.core.Application.get()
     design = app.activeProduct
-    if not design: return json.dumps({"error": "No design"})
+    if not design: return None, True
+    doc_key = _document_key(app)
+    entry = _scan_cache.get(doc_key)
+    if not entry: return None, True
+    _scan_cache.move_to_end(doc_key)
+    is_stale = entry["marker"] != _design_marker(app, design)
+    return entry["state"], is_stale
 
-    raw_name = app.activeDocument.name
-    clean_name = re.sub(r'\s+v\d+$', '', raw_name)
+def _clean_doc_name(app):
+    """Document name without Fusion's " v12" version suffix."""
+    return re.sub(r'\s+v\d+$', '', app.activeDocument.name)
+
+def _scan_model():
+    app = adsk.core.Application.get()
+    design = app.activeProduct
+    if not design: return {"error": "No design"}
+
+    clean_name = _clean_doc_name(app)
 
     # 1. Parameters (Safe for Text/Boolean)
     param_data = []
     for param in design.userParameters:
-        safe_val = 0
-        try:
-            # Try to get numeric value
-            safe_val = param.value
-        except:
-            # Fallback for Text/Boolean parameters that crash on .value
-            pass
-
         param_data.append({
             "name": param.name,
             "expression": param.expression,
-            "value": safe_val, 
+            "value": safe_value(param), 
             "unit": param.unit,
             "isFavorite": getattr(param, "isFavorite", False)
         })
 
-    # 2. Timeline Features (Root Features & Groups)
+    graph = get_dependency_graph(design, {p["name"]: p["expression"] for p in param_data})
+
+    # 2. Timeline Features (every component's CFG_ features & groups, via the index)
     feature_data = []
     root = design.rootComponent
-    
-    # A. Root Features
-    for feature in root.features:
-        if feature.name.startswith("CFG_"):
-            feature_data.append({
-                "name": feature.name,
-                "isSuppressed": feature.isSuppressed
-            })
-            
-    # B. Timeline Groups
-    timeline = design.timeline
-    for group in timeline.timelineGroups:
-        if group.name.startswith("CFG_"):
-            feature_data.append({
-                "name": group.name,
-                "isSuppressed": group.isSuppressed
-            })
-
-    # 3. Saved Snapshots
-    saved_configs = {}
-    attr = root.attributes.itemByName(ATTRIBUTE_GROUP, ATTRIBUTE_NAME)
-    if attr:
-        try:
-            saved_configs = json.loads(attr.value)
-        except:
-            saved_configs = {}
+    for name, item in get_cfg_items(design):
+        feature_data.append({
+            "name": name,
+            "isSuppressed": item.isSuppressed
+        })
+
+    # 3. Saved Snapshots (summaries plus which ones match the current state)
+    manifest = load_manifest(root)
+    current = {
+        "params": {p["name"]: p["expression"] for p in param_data},
+        "features": {f["name"]: f["isSuppressed"] for f in feature_data}
+    }
+    matching = find_matching_configs(root, manifest, current["params"], current["features"])
+    saved_configs = snapshot_summaries(manifest)  # After matching, which fingerprints older entries
+
+    # 4. Cached geometry metrics, for the current state and each snapshot applied to it
+    metrics = _attach_metrics(root, manifest, current, saved_configs, load_metrics(design))
 
     last_active = ""
     active_attr = root.attributes.itemByName(ATTRIBUTE_GROUP, ACTIVE_CONFIG_ATTR)
     if active_attr:
         last_active = active_attr.value
 
-    return json.dumps({
+    return {
         "doc_name": clean_name,
         "parameters": param_data,
         "features": feature_data,
         "configs": saved_configs,
-        "active_config": last_active
-    })
+        "matching_configs": matching,
+        "active_config": last_active,
+        "param_issues": parameter_issues(graph),
+        "metrics": metrics
+    }
+
+# --- PALETTE SYNC (DELTA PROTOCOL) ---
+
+def _diff_named_list(old_items, new_items):
+    """Diffs two lists of {"name": ...} dicts. Returns a patch section or None."""
+    old_by_name = {item["name"]: item for item in old_items}
+    new_names = [item["name"] for item in new_items]
+
+    section = {}
+    changed = [item for item in new_items if old_by_name.get(item["name"]) != item]
+    if changed: section["changed"] = changed
+    new_set = set(new_names)
+    removed = [name for name in old_by_name if name not in new_set]
+    if removed: section["removed"] = removed
+    if new_names != [item["name"] for item in old_items]:
+        section["order"] = new_names
+    return section or None
+
+def _diff_named_dict(old_map, new_map):
+    """Diffs two {name: body} dicts. Returns a patch section or None."""
+    section = {}
+    changed = {name: body for name, body in new_map.items() if old_map.get(name) != body}
+    if changed: section["changed"] = changed
+    removed = [name for name in old_map if name not in new_map]
+    if removed: section["removed"] = removed
+    if list(new_map) != list(old_map):
+        section["order"] = list(new_map)
+    return section or None
+
+def diff_states(old, new):
+    """Computes the patch that turns the `old` scan_model() state into `new`."""
+    patch = {}
+    scalars = {key: new.get(key) for key in ("doc_name", "active_config", "matching_configs", "param_issues", "metrics")
+               if old.get(key) != new.get(key)}
+    if scalars: patch["set"] = scalars
+
+    for key in ("parameters", "features"):
+        section = _diff_named_list(old.get(key, []), new.get(key, []))
+        if section: patch[key] = section
+
+    section = _diff_named_dict(old.get("configs", {}), new.get("configs", {}))
+    if section: patch["configs"] = section
+    return patch
+
+def build_ui_message(palette_key, state, force_full=False):
+    """Returns (html_action, json_payload) for sending `state` to a palette.
+
+    Sends 'update_ui' with the full state (and the unit table the palette's
+    expression check uses) the first time, after a document switch, on error
+    or when forced; otherwise sends a versioned 'patch_ui'
+    against the last state this palette received.
+    """
+    previous = _ui_sync.get(palette_key)
+    version = previous["version"] + 1 if previous else 1
+    _ui_sync[palette_key] = {"version": version, "state": state}
+
+    old = previous["state"] if previous else None
+    if (force_full or old is None or "error" in state or "error" in old
+            or old.get("doc_name") != state.get("doc_name")):
+        full = dict(state)
+        full["version"] = version
+        full["unit_dimensions"] = expressions.UNIT_DIMENSIONS  # The palette's expression check reads units from here
+        with diagnostics.phase("serialize"):
+            return 'update_ui', json.dumps(full)
+
+    with diagnostics.phase("serialize"):
+        patch = diff_states(old, state)
+        patch["version"] = version
+        patch["base_version"] = previous["version"]
+        return 'patch_ui', json.dumps(patch)
+
+def reset_ui_sync(palette_key=None):
+    """Forgets what was sent to a palette (or all palettes) so the next message is a full update."""
+    if palette_key is None:
+        _ui_sync.clear()
+    else:
+        _ui_sync.pop(palette_key, None)
+
+def state_with_param_updates(palette_key, updates):
+    """Returns the palette's last state with [{"name", "expression", "value"}] applied.
+
+    Lets a parameter edit be reported without a full scan_model(). Returns None
+    if the palette hasn't received a state for the active document yet.
+    """
+    previous = _ui_sync.get(palette_key)
+    if not previous or "error" in previous["state"]: return None
+    app = adsk.core.Application.get()
+    design = app.activeProduct
+    if not design or previous["state"].get("doc_name") != _clean_doc_name(app):
+        return None
+
+    by_name = {u["name"]: u for u in updates}
+    state = dict(previous["state"])
+    state["parameters"] = [
+        dict(p, expression=by_name[p["name"]]["expression"], value=by_name[p["name"]]["value"])
+        if p["name"] in by_name else p
+        for p in state["parameters"]
+    ]
+    current_params = {p["name"]: p["expression"] for p in state["parameters"]}
+    graph = get_dependency_graph(design, current_params)
+    state["param_issues"] = parameter_issues(graph)
+
+    root = design.rootComponent
+    manifest = load_manifest(root)
+    current = {"params": current_params, "features": {f["name"]: f["isSuppressed"] for f in state["features"]}}
+    state["matching_configs"] = find_matching_configs(root, manifest, current["params"], current["features"])
+
+    # Parameter edits leave the timeline alone, so the store the last scan validated still holds.
+    store = _metrics_stores.get(_document_key(app))
+    if store and store["entries"]:
+        state["configs"] = {name: {k: v for k, v in summary.items() if k != "metrics"}
+                            for name, summary in state["configs"].items()}
+        state["metrics"] = _attach_metrics(root, manifest, current, state["configs"], store)
+    _remember_scan(state)  # Edits don't move the design marker: keep the cached scan current
+    return state
 
 def update_parameter(name, expression):
+    """Writes one expression immediately. Returns Fusion's error message, or None on success."""
     app = adsk.core.Application.get()
     design = app.activeProduct
+    error = check_parameter_edit(design, name, str(expression))
+    if error:
+        return error
     param = design.userParameters.itemByName(name)
-    if param:
-        try:
-            param.expression = str(expression)
-        except:
-            pass 
+    if not param:
+        return "Unknown parameter"
+    try:
+        param.expression = str(expression)
+    except Exception as e:
+        return str(e)
+    return None
+
+def queue_parameter_edit(name, expression):
+    """Queues an edit for flush_parameter_edits(); a later edit to the same parameter replaces it.
+
+    The queue belongs to the active document: edits still queued from another
+    document are dropped.
+    """
+    global _pending_edits_doc
+    doc_key = _document_key(adsk.core.Application.get())
+    if doc_key != _pending_edits_doc:
+        _pending_edits.clear()
+        _pending_edits_doc = doc_key
+    _pending_edits.pop(name, None)
+    _pending_edits[name] = str(expression)
+
+def has_pending_edits():
+    return bool(_pending_edits)
+
+def flush_parameter_edits():
+    """Writes all queued edits under one deferred-compute window, dependencies first.
+
+    Returns {"applied": [names], "failed": [{"name", "expression", "error"}],
+    "changed": [{"name", "expression", "value"}], "dropped": [{"name", "expression"}]}
+    where "changed" lists the edited parameters plus every dependent parameter
+    whose value moved. Edits that fail check_parameter_edit() are reported
+    without being written; edits queued in a document that is no longer
+    active are returned under "dropped" and never written.
+    """
+    result = {"applied": [], "failed": [], "changed": [], "dropped": []}
+    if not _pending_edits: return result
+
+    edits = dict(_pending_edits)
+    _pending_edits.clear()
 
-def toggle_favorite(name):
+    app = adsk.core.Application.get()
+    try:
+        same_doc = _document_key(app) == _pending_edits_doc
+    except:
+        same_doc = False
+    if not same_doc:
+        result["dropped"] = [{"name": n, "expression": e} for n, e in edits.items()]
+        return result
+    design = app.activeProduct
+    if not design:
+        result["failed"] = [{"name": n, "expression": e, "error": "No design"} for n, e in edits.items()]
+        return result
+
+    units = parameter_units(design)
+    cycles = _edit_cycles(design, edits)
+    for name, expression in list(edits.items()):
+        error = check_parameter_edit(design, name, expression, units, cycles)
+        if error:
+            result["failed"].append({"name": name, "expression": expression, "error": error})
+            del edits[name]
+    if not edits: return result
+
+    graph = get_dependency_graph(design)
+    affected = expressions.topological_order(graph, set(edits) | expressions.dependents_of(graph, edits))
+    params = {name: design.userParameters.itemByName(name) for name in affected}
+    before = {name: safe_value(p) for name, p in params.items() if p and name not in edits}
+
+    with deferred_compute(design), diagnostics.phase("apply writes"):
+        for name in expressions.topological_order(graph, edits):
+            expression = edits[name]
+            param = params.get(name)
+            try:
+                if not param: raise ValueError("Unknown parameter")
+                param.expression = expression
+                result["applied"].append(name)
+            except Exception as e:
+                result["failed"].append({"name": name, "expression": expression, "error": str(e)})
+
+    _note_expressions(design, {name: edits[name] for name in result["applied"]})
+    for name in affected:
+        param = params.get(name)
+        if not param: continue
+        if name in result["applied"] or (name in before and safe_value(param) != before[name]):
+            result["changed"].append({"name": name, "expression": param.expression, "value": safe_value(param)})
+    return result
+
+def toggle_favorite(name, rescan=True):
+    """Flips a parameter's favorite flag; returns the new scan_model() state (None with rescan=False)."""
     app = adsk.core.Application.get()
     design = app.activeProduct
     param = design.userParameters.itemByName(name)
@@ -97,26 +1114,27 @@ def toggle_favorite(name):
             param.isFavorite = not current_state
         except:
             pass
-    return scan_model()
+    return scan_model() if rescan else None
 
-def toggle_feature(name, should_suppress):
+def toggle_feature(name, should_suppress, rescan=True):
+    """Suppresses or unsuppresses a CFG_ item; returns the new scan_model() state (None with rescan=False)."""
     app = adsk.core.Application.get()
     design = app.activeProduct
-    root = design.rootComponent
-    
-    item = root.features.itemByName(name)
-    if not item:
-        timeline = design.timeline
-        for group in timeline.timelineGroups:
-            if group.name == name:
-                item = group
-                break
-        
+    item = find_cfg_item(design, name)
     if item:
-        item.isSuppressed = should_suppress
-        adsk.doEvents() 
+        with diagnostics.phase("apply writes"):
+            item.isSuppressed = should_suppress
+        with diagnostics.phase("recompute"):
+            adsk.doEvents() 
         
-    return scan_model()
+    return scan_model() if rescan else None
+
+def capture_state(design):
+    """Current {"params": {name: expr}, "features": {name: is_suppressed}} of the model."""
+    return {
+        "params": {p.name: p.expression for p in design.userParameters},
+        "features": {name: item.isSuppressed for name, item in get_cfg_items(design)}
+    }
 
 def save_snapshot(config_name):
     app = adsk.core.Application.get()
@@ -125,34 +1143,10 @@ def save_snapshot(config_name):
     
     root = design.rootComponent 
 
-    # 1. Parameters
-    params = {p.name: p.expression for p in design.userParameters}
-    
-    # 2. Features
-    feats = {}
-    for f in root.features:
-        if f.name.startswith("CFG_"):
-            feats[f.name] = f.isSuppressed
-    timeline = design.timeline
-    for g in timeline.timelineGroups:
-        if g.name.startswith("CFG_"):
-            feats[g.name] = g.isSuppressed
-
-    # Load & Update
-    current_data = {}
-    attr = root.attributes.itemByName(ATTRIBUTE_GROUP, ATTRIBUTE_NAME)
-    if attr:
-        try:
-            current_data = json.loads(attr.value)
-        except:
-            current_data = {}
-    
-    current_data[config_name] = {
-        "params": params,
-        "features": feats
-    }
-
-    root.attributes.add(ATTRIBUTE_GROUP, ATTRIBUTE_NAME, json.dumps(current_data))
+    # Store as its own attribute and update the manifest
+    store = get_store(root)
+    store.put(config_name, capture_state(design))
+    flush_store(root, store)
     root.attributes.add(ATTRIBUTE_GROUP, ACTIVE_CONFIG_ATTR, config_name)
     return True
 
@@ -162,60 +1156,163 @@ def delete_snapshot(config_name):
     if not design: return False
     
     root = design.rootComponent 
-    attr = root.attributes.itemByName(ATTRIBUTE_GROUP, ATTRIBUTE_NAME)
-    if not attr: return False
-    
-    try:
-        current_data = json.loads(attr.value)
-        if config_name in current_data:
-            del current_data[config_name]
-            root.attributes.add(ATTRIBUTE_GROUP, ATTRIBUTE_NAME, json.dumps(current_data))
-            
-            active_attr = root.attributes.itemByName(ATTRIBUTE_GROUP, ACTIVE_CONFIG_ATTR)
-            if active_attr and active_attr.value == config_name:
-                root.attributes.add(ATTRIBUTE_GROUP, ACTIVE_CONFIG_ATTR, "")
-            return True
-    except:
-        pass
-    return False
+    store = get_store(root)
+    if config_name not in store.meta["manifest"]["configs"]: return False
+    store.remove(config_name)
+    flush_store(root, store)
+
+    active_attr = root.attributes.itemByName(ATTRIBUTE_GROUP, ACTIVE_CONFIG_ATTR)
+    if active_attr and active_attr.value == config_name:
+        root.attributes.add(ATTRIBUTE_GROUP, ACTIVE_CONFIG_ATTR, "")
+    return True
+
+def apply_state(design, state, minimal=True):
+    """Writes {"params": {name: expr}, "features": {name: is_suppressed}} to the model.
+
+    `state` may cover only some parameters and features; the rest are left
+    alone. With minimal=True (the default) the current expressions and
+    suppression states are read in one pass and only entries that differ are
+    written, inside one deferred-compute window. Returns a report
+    {"params", "features", "failed", "missing", "cycles", "invalid"} listing
+    the names written, the writes Fusion rejected and the names no longer in
+    the model.
+
+    Parameters are written dependencies-first. The target expressions are
+    checked up front: a reference cycle aborts the apply (listed in "cycles")
+    and expressions naming unknown parameters are skipped (listed in "invalid").
+    """
+    report = {"params": [], "features": [], "failed": [], "missing": [], "cycles": [], "invalid": {}}
 
-def apply_snapshot(config_name):
+    # 1. Read current state in one pass
+    params_by_name = {p.name: p for p in design.userParameters}
+    param_writes = []
+    for name, expr in state.get("params", {}).items():
+        p = params_by_name.get(name)
+        if not p:
+            report["missing"].append(name)
+        elif not minimal or p.expression != expr:
+            param_writes.append((name, p, expr))
+
+    # Validate the target expressions and order the writes dependencies-first
+    if param_writes:
+        target = dict(get_expressions(design))
+        target.update({name: expr for name, _, expr in param_writes})
+        graph = expressions.build_dependency_graph(
+            target, lambda: [p.name for p in design.allParameters])
+        if graph["cycles"]:
+            report["cycles"] = graph["cycles"]
+            return report
+        report["invalid"] = {name: graph["unknown"][name] for name, _, _ in param_writes if name in graph["unknown"]}
+        rank = graph["rank"]
+        param_writes = sorted((w for w in param_writes if w[0] not in report["invalid"]),
+                              key=lambda w: rank.get(w[0], len(rank)))
+
+    feature_writes = []
+    for name, is_suppressed in state.get("features", {}).items():
+        item = find_cfg_item(design, name)
+        if not item:
+            report["missing"].append(name)
+        elif not minimal or item.isSuppressed != is_suppressed:
+            feature_writes.append((name, item, is_suppressed))
+
+    # 2. Write only what differs
+    if param_writes or feature_writes:
+        with deferred_compute(design), diagnostics.phase("apply writes"):
+            for name, p, expr in param_writes:
+                try:
+                    p.expression = expr
+                    report["params"].append(name)
+                except:
+                    report["failed"].append(name)
+            _note_expressions(design, {name: expr for name, _, expr in param_writes if name in report["params"]})
+
+            for name, item, is_suppressed in feature_writes:
+                try:
+                    item.isSuppressed = is_suppressed
+                    report["features"].append(name)
+                except:
+                    report["failed"].append(name)
+
+    return report
+
+def apply_snapshot(config_name, minimal=True):
+    """Restores a saved snapshot through apply_state and marks it active.
+
+    Returns apply_state's report, or None if the snapshot does not exist.
+    """
     app = adsk.core.Application.get()
     design = app.activeProduct
     root = design.rootComponent 
     
-    attr = root.attributes.itemByName(ATTRIBUTE_GROUP, ATTRIBUTE_NAME)
-    if not attr: return
-    
-    data = json.loads(attr.value)
-    if config_name not in data: return
-    
-    snapshot = data[config_name]
-    
-    design.isComputeDeferred = True
-    try:
-        # 1. Apply Parameters
-        saved_params = snapshot.get("params", {})
-        for name, expr in saved_params.items():
-            p = design.userParameters.itemByName(name)
-            if p: p.expression = expr
-            
-        # 2. Apply Timeline Features
-        saved_feats = snapshot.get("features", {})
-        timeline = design.timeline
-        for name, is_suppressed in saved_feats.items():
-            item = root.features.itemByName(name)
-            if not item:
-                for group in timeline.timelineGroups:
-                    if group.name == name:
-                        item = group
-                        break
-            if item: 
-                item.isSuppressed = is_suppressed
-
-        root.attributes.add(ATTRIBUTE_GROUP, ACTIVE_CONFIG_ATTR, config_name)
-    except:
-        pass
-    finally:
-        design.isComputeDeferred = False
-        app.activeViewport.refresh()
\ No newline at end of file
+    snapshot = load_snapshot_body(root, config_name)
+    if snapshot is None: return None
+
+    report = apply_state(design, snapshot, minimal)
+    if report["cycles"]: return report
+    root.attributes.add(ATTRIBUTE_GROUP, ACTIVE_CONFIG_ATTR, config_name)
+    return report
+
+# --- SNAPSHOT ORDERING ---
+
+def change_weights(design):
+    """Relative recompute cost of changing each user parameter and CFG_ item.
+
+    Toggling a timeline item recomputes everything after it, so an item costs
+    the fraction of the timeline from it to the end. Where a parameter is used
+    isn't known, so it costs half the timeline for itself and for every
+    parameter its change propagates to.
+    """
+    timeline_count = max(design.timeline.count, 1)
+    weights = {}
+    for name, item in get_cfg_items(design):
+        try:
+            index = (getattr(item, "timelineObject", None) or item).index
+            weights[("f", name)] = max(timeline_count - index, 1) / timeline_count
+        except:
+            weights[("f", name)] = 1.0
+    graph = get_dependency_graph(design)
+    for name in graph["deps"]:
+        weights[("p", name)] = 0.5 * (1 + len(expressions.dependents_of(graph, [name])))
+    return weights
+
+def plan_snapshot_order(names=None, from_current=True):
+    """Orders snapshots so that applying them in turn changes as little as possible.
+
+    `names` defaults to every snapshot. With from_current=True the path starts
+    at the model's current state. Returns {"order", "cost", "list_cost"}: the
+    planned names, its weighted change cost and the cost in the given order.
+    """
+    app = adsk.core.Application.get()
+    design = app.activeProduct
+    root = design.rootComponent
+    manifest = load_manifest(root)
+    if names is None: names = list(manifest["configs"])
+
+    bodies, found = [], []
+    for name in names:
+        body = load_snapshot_body(root, name, manifest)
+        if body is not None:
+            bodies.append(body)
+            found.append(name)
+
+    with diagnostics.phase("plan order"):
+        start = capture_state(design) if from_current else None
+        weights = change_weights(design)
+        order, cost = snapshot_order.plan_order(bodies, weights, start)
+        list_cost = snapshot_order.path_cost(bodies, range(len(bodies)), weights, start)
+    return {"order": [found[i] for i in order], "cost": round(cost, 3), "list_cost": round(list_cost, 3)}
+
+def apply_snapshots_in_order(names=None, visit=None):
+    """Applies snapshots one after another in plan_snapshot_order's order.
+
+    `visit(name, report)` runs after each apply and may return False to stop.
+    Returns the plan with "applied" listing the snapshots actually applied.
+    """
+    plan = plan_snapshot_order(names)
+    plan["applied"] = []
+    for name in plan["order"]:
+        report = apply_snapshot(name)
+        plan["applied"].append(name)
+        if visit and visit(name, report) is False:
+            break
+    return plan
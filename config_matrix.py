@@ -0,0 +1,299 @@
+# config_matrix.py
+# Column-wise view of every snapshot for questions across snapshots: filters
+# ("CFG_Handle off, width > 80"), which keys actually vary, which snapshots are
+# duplicates and which are closest to the model. Pure Python: no adsk imports;
+# config_logic builds it from the design's SnapshotStore.
+#
+# Rows are snapshots, columns are parameters and features. A parameter column
+# holds each row's expression and its value evaluated in the parameter's unit
+# (None where it can't be worked out, e.g. text); a feature column is two
+# bitsets. Any set of rows is an int bitset (bit i = row i), so a filter is one
+# scan per column and filters combine with & | and ~.
+
+import math
+import re
+
+from . import expressions
+from . import snapshot_store
+
+_NO_VALUE = object()  # Memo entry for an expression that needs the row to evaluate
+
+def _bits(flags):
+    """Bitset of the rows whose flag is true."""
+    return int("".join("1" if f else "0" for f in flags)[::-1] or "0", 2)
+
+def _normal(value):
+    """A value rounded so "80 mm" and "8 cm" compare equal despite float noise."""
+    return float("%.12g" % value)
+
+def _same(a, b):
+    return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+
+def _unquote(text):
+    text = text.strip()
+    return text[1:-1] if len(text) > 1 and text[0] == text[-1] and text[0] in "'\"" else text
+
+class ConfigMatrix:
+    __slots__ = ("names", "units", "expressions", "values", "has_param", "suppressed", "has_feature", "all", "external")
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.units = {}          # param -> unit
+        self.expressions = {}    # param -> [expression or None per row]
+        self.values = {}         # param -> [value in the param's unit or None per row]
+        self.has_param = {}      # param -> bitset of rows that set it
+        self.suppressed = {}     # feature -> bitset of rows with it suppressed
+        self.has_feature = {}    # feature -> bitset of rows that set it
+        self.all = (1 << len(self.names)) - 1
+        self.external = {}       # Model expressions rows referenced without setting them
+
+    def __len__(self):
+        return len(self.names)
+
+    def rows(self, bits):
+        """Names of the rows in a bitset, in row order."""
+        return [name for i, name in enumerate(self.names) if bits >> i & 1]
+
+    # --- FILTERS ---
+
+    def feature_state(self, feature, suppressed):
+        """Rows that set `feature` to suppressed (True) or active (False)."""
+        bits = self.suppressed[feature]
+        return bits if suppressed else self.has_feature[feature] & ~bits
+
+    def compare(self, param, op, text):
+        """Rows where `param op text` holds; text is an expression in the param's unit, or plain text for = and !=."""
+        target = expressions.evaluate(text, self.units[param], self.units)
+        if target is not None:
+            test = {"=": _same, "==": _same, "!=": lambda a, b: not _same(a, b),
+                    "<": lambda a, b: a < b and not _same(a, b), "<=": lambda a, b: a <= b or _same(a, b),
+                    ">": lambda a, b: a > b and not _same(a, b), ">=": lambda a, b: a >= b or _same(a, b)}[op]
+            return _bits(v is not None and test(v, target) for v in self.values[param])
+        if op not in ("=", "==", "!="):
+            raise ValueError("'{}' isn't a value for {}".format(text, param))
+        wanted = _unquote(text)
+        equal = _bits(e is not None and _unquote(e) == wanted for e in self.expressions[param])
+        return equal if op != "!=" else self.has_param[param] & ~equal
+
+    _CLAUSE = re.compile(r"""^\s*(?P<not>(?:not\s+|!\s*))?
+        (?P<key>'[^']+'|"[^"]+"|[^\s=!<>]+)
+        \s*(?:(?P<op>==|=|!=|<=|>=|<|>)\s*(?P<value>.+?)|\s+(?P<state>on|off|active|suppressed|set|missing))?\s*$""",
+        re.VERBOSE | re.IGNORECASE)
+
+    def query(self, text):
+        """Rows matching a filter; returns a bitset. Raises ValueError for a malformed filter.
+
+        Clauses are joined with "," or "and" (all must hold) and "or" (either
+        side). A clause is "param op value" (op: = != < <= > >=, value in the
+        param's unit), "feature on|off", "key set|missing", or a word matched
+        against snapshot names. "not" negates a clause; quote names with spaces.
+        """
+        result = 0
+        for alternative in re.split(r"\s+or\s+|\|\|", text, flags=re.IGNORECASE):
+            bits = self.all
+            for clause in re.split(r",|\s+and\s+|&&", alternative, flags=re.IGNORECASE):
+                if clause.strip():
+                    bits &= self._clause(clause)
+            result |= bits
+        return result
+
+    def _clause(self, clause):
+        match = self._CLAUSE.match(clause)
+        if not match:
+            raise ValueError("Can't read '{}'".format(clause.strip()))
+        key, op, state = _unquote(match.group("key")), match.group("op"), (match.group("state") or "").lower()
+        if op and key not in self.units and key not in self.has_feature:
+            raise ValueError("Unknown parameter or feature: " + key)
+
+        if key in self.has_feature and (op or state not in ("set", "missing")):
+            if op:
+                value = _unquote(match.group("value")).lower()
+                if value not in ("on", "off", "active", "suppressed", "true", "false"):
+                    raise ValueError("{} is on or off, not '{}'".format(key, value))
+                suppressed = value in ("off", "suppressed", "true")
+                bits = self.feature_state(key, suppressed if op != "!=" else not suppressed)
+            else:
+                bits = self.feature_state(key, state in ("off", "suppressed"))
+        elif key in self.units or key in self.has_feature:
+            present = self.has_param.get(key, self.has_feature.get(key))
+            if op:
+                bits = self.compare(key, op, match.group("value"))
+            elif state in ("on", "off", "active", "suppressed"):
+                raise ValueError("{} is a parameter: compare it with a value".format(key))
+            else:
+                bits = present if state != "missing" else self.all & ~present
+        else:
+            if state:
+                raise ValueError("Unknown parameter or feature: " + key)
+            word = key.lower()
+            bits = _bits(word in name.lower() for name in self.names)
+        return self.all & ~bits if match.group("not") else bits
+
+    # --- ANALYSIS ---
+
+    def variation(self):
+        """How each column varies across the rows that set it, most distinct values first.
+
+        [{"key", "kind": "param"|"feature", "distinct", "rows", ...}] with
+        "min", "max", "mean", "stdev" (and "unit") for numeric parameters and
+        "suppressed" (a row count) for features.
+        """
+        report = []
+        for param, column in self.values.items():
+            texts = [e for e in self.expressions[param] if e is not None]
+            numbers = [v for v in column if v is not None]
+            entry = {"key": param, "kind": "param", "rows": len(texts), "unit": self.units[param]}
+            if numbers and len(numbers) == len(texts):
+                entry["distinct"] = len({_normal(v) for v in set(numbers)})
+                mean = sum(numbers) / len(numbers)
+                entry.update({"min": min(numbers), "max": max(numbers), "mean": mean,
+                              "stdev": math.sqrt(sum((v - mean) ** 2 for v in numbers) / len(numbers))})
+            else:
+                entry["distinct"] = len(set(texts))
+            report.append(entry)
+        for feature, present in self.has_feature.items():
+            suppressed = bin(self.suppressed[feature]).count("1")
+            rows = bin(present).count("1")
+            report.append({"key": feature, "kind": "feature", "rows": rows, "suppressed": suppressed,
+                           "distinct": (suppressed > 0) + (rows - suppressed > 0)})
+        report.sort(key=lambda e: (-e["distinct"], e["kind"], e["key"]))
+        return report
+
+    def _flags(self, bits):
+        """A bitset as a string with one "0"/"1" per row, in row order."""
+        return format(bits, "0{}b".format(len(self.names)))[::-1] if self.names else ""
+
+    def _column_keys(self, param):
+        """Per row: the value (rounded, see _normal) where known, else the expression; None where unset."""
+        normal = {v: _normal(v) for v in set(self.values[param]) if v is not None}
+        return [normal[v] if v is not None else e for v, e in zip(self.values[param], self.expressions[param])]
+
+    def duplicates(self):
+        """Groups (lists of names, in row order) of rows that set the same keys to the same values.
+
+        Parameters compare by value where one is known, so "80 mm" and "8 cm"
+        are duplicates.
+        """
+        columns = [self._column_keys(param) for param in self.values]
+        for feature, present in self.has_feature.items():
+            columns.append(self._flags(present))
+            columns.append(self._flags(self.suppressed[feature]))
+        groups = {}
+        for row, key in enumerate(zip(*columns)):
+            groups.setdefault(key, []).append(self.names[row])
+        return [names for names in groups.values() if len(names) > 1]
+
+    def nearest(self, params, features, limit=5):
+        """Rows closest to a state, fewest differing keys first.
+
+        `params` is {param: value in its unit or expression}, `features`
+        {feature: is_suppressed}; only keys a row sets are compared. Returns
+        [{"name", "differences", "keys": [differing keys], "distance"}] where
+        distance sums each numeric difference relative to the column's range.
+        """
+        counts = [0] * len(self.names)
+        distance = [0.0] * len(self.names)
+        differing = [[] for _ in self.names]
+        for param in self.values:
+            keys = self._column_keys(param)
+            current = params.get(param)
+            current = _normal(current) if isinstance(current, (int, float)) else current
+            numbers = [k for k in set(keys) if isinstance(k, float)]
+            span = (max(numbers) - min(numbers)) if numbers else 0
+            # Each distinct value's distance from the current one; None where they're the same.
+            contribution = {}
+            for key in set(keys):
+                if key is None or key == current: continue
+                numeric = isinstance(key, float) and isinstance(current, float)
+                contribution[key] = abs(key - current) / span if numeric and span else 1
+            if not contribution: continue
+            for row, key in enumerate(keys):
+                d = contribution.get(key)
+                if d is None: continue
+                counts[row] += 1
+                distance[row] += d
+                differing[row].append(param)
+        for feature, present in self.has_feature.items():
+            bits = present & (self.suppressed[feature] ^ (self.all if features.get(feature) else 0))
+            for row, flag in enumerate(self._flags(bits)):
+                if flag == "1":
+                    counts[row] += 1
+                    distance[row] += 1
+                    differing[row].append(feature)
+        order = sorted(range(len(self.names)), key=lambda row: (counts[row], distance[row], row))
+        return [{"name": self.names[row], "differences": counts[row], "keys": differing[row],
+                 "distance": round(distance[row], 6)} for row in order[:limit]]
+
+def _value_function(units, current, external):
+    """Evaluates parameter expressions to values in their unit, memoizing those that reference nothing.
+
+    Returns value(expression, param, row) where row is {param: expression} for
+    one snapshot; referenced parameters a row doesn't set are read from
+    `current` (the model) and recorded in `external`.
+    """
+    memo = {}
+
+    def value(expression, param, row, seen=()):
+        unit = units.get(param, "")
+        key = (expression, unit)
+        known = memo.get(key)
+        if known is None:
+            refs = [ref for ref in expressions.identifiers(expression, units) if ref in units]
+            known = memo[key] = _NO_VALUE if refs else expressions.evaluate(expression, unit, units)
+            if not refs: return known
+        if known is not _NO_VALUE:
+            return known
+
+        def resolve(ref):
+            if ref in seen or ref == param: return None  # Circular
+            ref_expression = row.get(ref)
+            if ref_expression is None:
+                ref_expression = current.get(ref)
+                if ref_expression is None: return None
+                external[ref] = ref_expression
+            result = value(ref_expression, ref, row, seen + (param,))
+            scale = expressions.unit_scale(units.get(ref, ""))
+            return None if result is None or scale is None else result * scale
+        return expressions.evaluate(expression, unit, units, resolve)
+    return value
+
+def state_values(units, params):
+    """{param: value in its unit, or the expression where there's none} for a state, as nearest() takes it."""
+    value = _value_function(units, params, {})
+    result = {}
+    for param, expression in params.items():
+        number = value(expression, param, params)
+        result[param] = expression if number is None else number
+    return result
+
+def build(store, names, units, current=None):
+    """ConfigMatrix of the snapshots `names` held in a snapshot_store.SnapshotStore.
+
+    units is {param: unit} for the model's parameters (others are treated as
+    unitless) and current {param: expression}, used for references a snapshot
+    doesn't cover.
+    """
+    names = [name for name in names if name in store]
+    matrix = ConfigMatrix(names)
+    snapshots = [store.snapshots[name] for name in names]
+    param_names = store.param_keys.names
+    feature_names = store.feature_keys.names
+    value = _value_function(units, current or {}, matrix.external)
+
+    rows = [{param_names[i]: expr for i, expr in enumerate(s.params) if expr is not None} for s in snapshots]
+    for i, param in enumerate(param_names):
+        column = [s.params[i] if i < len(s.params) else None for s in snapshots]
+        if all(expression is None for expression in column): continue
+        matrix.units[param] = units.get(param, "")
+        matrix.expressions[param] = column
+        matrix.values[param] = [None if expression is None else value(expression, param, rows[r])
+                                for r, expression in enumerate(column)]
+        matrix.has_param[param] = _bits(expression is not None for expression in column)
+
+    for i, feature in enumerate(feature_names):
+        column = [s.features[i] if i < len(s.features) else snapshot_store.ABSENT for s in snapshots]
+        present = _bits(state != snapshot_store.ABSENT for state in column)
+        if not present: continue
+        matrix.has_feature[feature] = present
+        matrix.suppressed[feature] = _bits(state == 1 for state in column)
+    return matrix
@@ -0,0 +1,142 @@
+# design_table.py
+# Import and export of the snapshot store as a design table: one row per
+# snapshot, one column per user parameter and CFG_ feature (sub-component
+# features as "Component/CFG_Name"). Files ending in .csv are CSV, anything
+# else is JSONL ({"name", "params", "features"} per line).
+#
+# In CSV, feature cells read "on" or "off" and an empty cell means the
+# snapshot doesn't cover that parameter or feature.
+
+import adsk.core, adsk.fusion
+import csv
+import json
+
+from . import config_logic
+from . import diagnostics
+
+NAME_COLUMN = "name"
+FEATURE_CELLS = {"on": False, "active": False, "unsuppressed": False,
+                 "off": True, "suppressed": True}
+
+def _is_csv(path):
+    return path.lower().endswith(".csv")
+
+def _ordered_keys(design, manifest):
+    """Parameter and feature columns: model order first, then names only snapshots still use."""
+    params = [p.name for p in design.userParameters]
+    features = list(config_logic.get_feature_index(design))
+    for keys in manifest.get("keysets", {}).values():
+        params += [name for name in keys["params"] if name not in params]
+        features += [name for name in keys["features"] if name not in features]
+    return params, features
+
+# --- EXPORT ---
+
+def export_table(path):
+    """Writes every snapshot to `path`, decoding one snapshot at a time. Returns the row count."""
+    app = adsk.core.Application.get()
+    design = adsk.fusion.Design.cast(app.activeProduct)
+    root = design.rootComponent
+    manifest = config_logic.load_manifest(root)
+
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f, diagnostics.phase("export table"):
+        if _is_csv(path):
+            params, features = _ordered_keys(design, manifest)
+            writer = csv.writer(f)
+            writer.writerow([NAME_COLUMN] + params + features)
+        for name in manifest["configs"]:
+            body = config_logic.load_snapshot_body(root, name, manifest)
+            if body is None: continue
+            if _is_csv(path):
+                body_params = body.get("params", {})
+                body_features = body.get("features", {})
+                writer.writerow([name]
+                                + [body_params.get(p, "") for p in params]
+                                + [("off" if body_features[n] else "on") if n in body_features else "" for n in features])
+            else:
+                f.write(json.dumps({"name": name, "params": body.get("params", {}),
+                                    "features": body.get("features", {})}) + "\n")
+            count += 1
+    return count
+
+# --- IMPORT ---
+# The row readers yield (line, name, params, features, error) one row at a time.
+
+def _csv_rows(f):
+    reader = csv.reader(f)
+    header = [cell.strip() for cell in next(reader, [])]
+    if not header or header[0].lower() != NAME_COLUMN:
+        yield 1, "", {}, {}, "the first column must be '{}'".format(NAME_COLUMN)
+        return
+    for row in reader:
+        if not any(cell.strip() for cell in row): continue
+        params, features, error = {}, {}, None
+        for column, cell in zip(header[1:], row[1:]):
+            cell = cell.strip()
+            if not cell: continue
+            if config_logic.is_feature_key(column):
+                if cell.lower() not in FEATURE_CELLS:
+                    error = "{}: '{}' is not on/off".format(column, cell)
+                    break
+                features[column] = FEATURE_CELLS[cell.lower()]
+            else:
+                params[column] = cell
+        yield reader.line_num, row[0].strip(), params, features, error
+
+def _jsonl_rows(f):
+    for number, line in enumerate(f, 1):
+        if not line.strip(): continue
+        try:
+            row = json.loads(line)
+            name = str(row.get("name", "")).strip()
+            params = {str(k): str(v) for k, v in row.get("params", {}).items()}
+            features = row.get("features", {})
+            bad = [k for k, v in features.items() if not isinstance(v, bool)]
+        except (ValueError, AttributeError):
+            yield number, "", {}, {}, "not a JSON object with name, params and features"
+            continue
+        error = "{}: isSuppressed must be true or false".format(bad[0]) if bad else None
+        yield number, name, params, features, error
+
+def import_table(path):
+    """Reads a design table and stores its rows as snapshots in one storage commit.
+
+    Rows are parsed one at a time. Names that aren't user parameters or CFG_
+    features of the model are dropped (and reported once); rows without a
+    name, repeating an earlier name or holding bad values are skipped.
+    Existing snapshots with the same name are overwritten.
+    Returns {"imported": [names], "errors": [messages]}.
+    """
+    app = adsk.core.Application.get()
+    design = adsk.fusion.Design.cast(app.activeProduct)
+    known_params = {p.name for p in design.userParameters}
+    known_features = set(config_logic.get_feature_index(design))
+
+    bodies = {}
+    errors = []
+    unknown = []
+    with open(path, newline="", encoding="utf-8-sig") as f, diagnostics.phase("import table"):
+        for line, name, params, features, error in (_csv_rows(f) if _is_csv(path) else _jsonl_rows(f)):
+            if not error and not name:
+                error = "missing name"
+            elif not error and name in bodies:
+                error = "duplicate name '{}'".format(name)
+            if error:
+                errors.append("Line {}: {}".format(line, error))
+                continue
+
+            for key in [k for k in params if k not in known_params] + [k for k in features if k not in known_features]:
+                if key not in unknown: unknown.append(key)
+                params.pop(key, None)
+                features.pop(key, None)
+            if not params and not features:
+                errors.append("Line {}: no values for the model's parameters or features".format(line))
+                continue
+            bodies[name] = {"params": params, "features": features}
+
+    if unknown:
+        errors.append("Ignored names not in the model: " + ", ".join(unknown))
+    if bodies:
+        config_logic.save_snapshot_bodies(bodies)
+    return {"imported": list(bodies), "errors": errors}
@@ -0,0 +1,105 @@
+# diagnostics.py
+# Per-action latency metrics for the palette's routed actions.
+#
+# Wrap each routed action in action(name) and its sub-phases in phase(name).
+# Samples are kept per (action, phase) in a rolling window; summary() turns
+# them into counts and percentiles for the palette and format_summary() into
+# text for the log. While disabled, action() and phase() return a shared
+# no-op context manager after a single flag check.
+
+import time
+from collections import deque
+from contextlib import nullcontext
+
+WINDOW = 200
+TOTAL = "total"
+
+enabled = False
+
+# (action, phase) -> {"count": int, "samples": deque of seconds}
+_stats = {}
+_action_stack = []
+_last_log = time.monotonic()
+_NULL = nullcontext()
+
+def set_enabled(flag):
+    global enabled
+    enabled = bool(flag)
+
+def reset():
+    _stats.clear()
+
+def record(action_name, phase_name, seconds):
+    entry = _stats.get((action_name, phase_name))
+    if entry is None:
+        entry = _stats[(action_name, phase_name)] = {"count": 0, "samples": deque(maxlen=WINDOW)}
+    entry["count"] += 1
+    entry["samples"].append(seconds)
+
+class _Timer:
+    __slots__ = ("phase_name", "is_action", "start")
+
+    def __init__(self, phase_name, is_action):
+        self.phase_name = phase_name
+        self.is_action = is_action
+
+    def __enter__(self):
+        if self.is_action:
+            _action_stack.append(self.phase_name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if self.is_action:
+            _action_stack.pop()
+            record(self.phase_name, TOTAL, elapsed)
+        else:
+            record(_action_stack[-1] if _action_stack else "-", self.phase_name, elapsed)
+        return False
+
+def action(name):
+    """Times a routed action; phases entered inside it are attributed to it."""
+    return _Timer(name, True) if enabled else _NULL
+
+def phase(name):
+    """Times a sub-phase (scan, parse attributes, apply writes, ...) of the current action."""
+    return _Timer(name, False) if enabled else _NULL
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def summary():
+    """Returns [{"action", "phase", "count", "p50_ms", "p90_ms", "max_ms"}], slowest actions first."""
+    rows = []
+    for (action_name, phase_name), entry in _stats.items():
+        ordered = sorted(entry["samples"])
+        rows.append({
+            "action": action_name,
+            "phase": phase_name,
+            "count": entry["count"],
+            "p50_ms": round(_percentile(ordered, 0.5) * 1000, 2),
+            "p90_ms": round(_percentile(ordered, 0.9) * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2)
+        })
+    totals = {r["action"]: r["p90_ms"] for r in rows if r["phase"] == TOTAL}
+    rows.sort(key=lambda r: (-totals.get(r["action"], 0), r["action"], r["phase"] != TOTAL, -r["p90_ms"]))
+    return rows
+
+def format_summary():
+    lines = ["LiveConfig diagnostics (last %d samples per entry)" % WINDOW]
+    for r in summary():
+        label = r["action"] if r["phase"] == TOTAL else "  " + r["phase"]
+        lines.append("%-28s n=%-6d p50=%8.2fms p90=%8.2fms max=%8.2fms" % (
+            label, r["count"], r["p50_ms"], r["p90_ms"], r["max_ms"]))
+    return "\n".join(lines)
+
+def maybe_log_summary(log, interval):
+    """Calls log(format_summary()) if `interval` seconds have passed since the last summary."""
+    global _last_log
+    if not enabled or not interval or not _stats:
+        return
+    now = time.monotonic()
+    if now - _last_log >= interval:
+        _last_log = now
+        log(format_summary())
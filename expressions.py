@@ -0,0 +1,516 @@
+# expressions.py
+# Parsing helpers for Fusion parameter expressions and the user-parameter
+# dependency graph built from them. Pure Python: no adsk imports.
+
+import math
+import re
+
+# Function names and constants Fusion accepts in expressions.
+FUNCTIONS = {
+    "abs", "acos", "acosh", "asin", "asinh", "atan", "atanh", "ceil", "cos", "cosh",
+    "exp", "floor", "ln", "log", "max", "min", "pow", "random", "round", "sign",
+    "sin", "sinh", "sqrt", "tan", "tanh", "if"
+}
+CONSTANTS = {"PI", "E", "pi", "e", "true", "false"}
+KEYWORDS = {"and", "or", "not"}  # Word forms of && || !
+
+_STRING = re.compile(r"'[^']*'|\"[^\"]*\"")
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?=\s*(\()?)")
+_NUMBER_EXPONENT = re.compile(r"\d(?:\.\d*)?[eE]$")
+_AFTER_NUMBER = re.compile(r"[\d.]\s*$")
+
+def identifiers(expression, known=()):
+    """Returns the names an expression references, ignoring strings, functions, keywords, units and constants.
+
+    Names in `known` (the user parameters) are references even when they look
+    like a unit or constant ("N", "s", "E"), except for a unit right after a
+    number ("10 N"), which binds to the number as it does in _Parser. Other
+    names right after a number are taken for units.
+    """
+    text = _STRING.sub(" ", expression or "")
+    names = []
+    for match in _IDENTIFIER.finditer(text):
+        name = match.group(0)
+        if (match.group(1) and name in FUNCTIONS) or name in KEYWORDS:
+            continue
+        # "1e5": the "e5" belongs to the number.
+        if _NUMBER_EXPONENT.search(text[max(0, match.start() - 8):match.start() + 1]):
+            continue
+        after_number = _AFTER_NUMBER.search(text[max(0, match.start() - 8):match.start()])
+        if name in CONSTANTS or name in UNIT_DIMENSIONS or after_number:
+            if name not in known:
+                continue  # A constant, a unit, or a unit Fusion knows and we don't ("10 micron")
+            if name in UNIT_DIMENSIONS and after_number:
+                continue
+        if name not in names:
+            names.append(name)
+    return names
+
+# --- DEPENDENCY GRAPH ---
+# A graph is a plain dict:
+#   "deps":       {name: [user parameters it references]}
+#   "dependents": {name: [user parameters that reference it]}
+#   "unknown":    {name: [identifiers that are neither user nor model parameters]}
+#   "cycles":     [names that sit on a reference cycle]
+#   "rank":       {name: position in a dependencies-first order}
+
+def build_dependency_graph(expressions, model_parameter_names=()):
+    """Builds the graph for {user parameter: expression}.
+
+    Identifiers that aren't user parameters are checked against
+    `model_parameter_names`, which may be a callable so the (expensive) list of
+    model parameters is only fetched when an expression needs it.
+    """
+    deps = {}
+    dependents = {name: [] for name in expressions}
+    unknown = {}
+    candidates = {}
+    for name, expression in expressions.items():
+        refs = identifiers(expression, expressions)
+        deps[name] = [ref for ref in refs if ref in expressions]
+        for ref in deps[name]:
+            dependents[ref].append(name)
+        others = [ref for ref in refs if ref not in expressions]
+        if others:
+            candidates[name] = others
+
+    if candidates:
+        known = model_parameter_names() if callable(model_parameter_names) else model_parameter_names
+        known = set(known)
+        for name, others in candidates.items():
+            missing = [ref for ref in others if ref not in known]
+            if missing:
+                unknown[name] = missing
+
+    # Kahn's algorithm; whatever never reaches in-degree 0 is on (or behind) a cycle.
+    remaining = {name: len(refs) for name, refs in deps.items()}
+    ready = [name for name, count in remaining.items() if count == 0]
+    rank = {}
+    while ready:
+        name = ready.pop(0)
+        rank[name] = len(rank)
+        for dependent in dependents[name]:
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0:
+                ready.append(dependent)
+    blocked = [name for name in expressions if name not in rank]
+    cycles = _cycle_members(blocked, deps)
+    for name in blocked:
+        rank[name] = len(rank)
+
+    return {"deps": deps, "dependents": dependents, "unknown": unknown, "cycles": cycles, "rank": rank}
+
+def _cycle_members(blocked, deps):
+    """Of the names Kahn couldn't order, returns those that can reach themselves."""
+    blocked_set = set(blocked)
+    members = []
+    for start in blocked:
+        stack = [ref for ref in deps[start] if ref in blocked_set]
+        seen = set()
+        while stack:
+            name = stack.pop()
+            if name == start:
+                members.append(start)
+                break
+            if name in seen:
+                continue
+            seen.add(name)
+            stack.extend(ref for ref in deps[name] if ref in blocked_set)
+    return members
+
+def topological_order(graph, names):
+    """Sorts `names` so every parameter comes after the parameters it references."""
+    rank = graph["rank"]
+    return sorted(names, key=lambda name: rank.get(name, len(rank)))
+
+def dependents_of(graph, names):
+    """Returns every user parameter that directly or transitively references `names`."""
+    found = set()
+    stack = list(names)
+    while stack:
+        for dependent in graph["dependents"].get(stack.pop(), []):
+            if dependent not in found:
+                found.add(dependent)
+                stack.append(dependent)
+    return found
+
+# --- EXPRESSION CHECK ---
+# A local parser that catches what Fusion would reject (syntax errors, unknown
+# names, units that don't fit the parameter) before an expression is written.
+# It errs on the side of passing: whatever it can't judge is left to Fusion.
+# resources/html/script.js mirrors the check (checkExpression) so the palette
+# can flag bad input without a round trip; keep the two in step. The palette
+# gets its unit table from UNIT_DIMENSIONS (see build_ui_message). Evaluation
+# (evaluate) is Python-only.
+#
+# A dimension is a tuple of exponents over (length, angle, mass, time,
+# temperature). Bare numbers are dimensionless and take on whatever unit their
+# context needs ("width + 5" is fine for a length), so dimensionless results
+# fit any parameter. None means the dimension can't be known locally (model
+# parameters with no unit lookup, text values) and is never reported. Values
+# are magnitudes in Fusion's internal units (cm, rad, kg, s); None where they
+# can't be worked out.
+
+DIMENSIONLESS = (0, 0, 0, 0, 0)
+_LENGTH, _ANGLE, _MASS, _TIME, _TEMPERATURE = (1, 0, 0, 0, 0), (0, 1, 0, 0, 0), (0, 0, 1, 0, 0), (0, 0, 0, 1, 0), (0, 0, 0, 0, 1)
+_FORCE = (1, 0, 1, -2, 0)
+_PRESSURE = (-1, 0, 1, -2, 0)
+
+# name: (dimension, internal units per unit); None for the offset temperature scales.
+UNIT_DIMENSIONS = {}
+UNIT_SCALES = {}
+for _dimension, _units in (
+        (_LENGTH, {"mm": 0.1, "cm": 1, "m": 100, "km": 1e5, "um": 1e-4, "micron": 1e-4, "nm": 1e-7, "in": 2.54,
+                   "ft": 30.48, "yd": 91.44, "mi": 160934.4, "mil": 0.00254, "inch": 2.54, "foot": 30.48,
+                   "feet": 30.48}),
+        (_ANGLE, {"deg": math.pi / 180, "rad": 1, "grad": math.pi / 200}),
+        (_MASS, {"g": 0.001, "kg": 1, "mg": 1e-6, "lbmass": 0.45359237, "lb": 0.45359237, "oz": 0.028349523125,
+                 "slug": 14.59390294}),
+        (_TIME, {"s": 1, "sec": 1, "min": 60, "hr": 3600, "ms": 0.001}),
+        (_FORCE, {"N": 100, "lbf": 444.8221615}),  # kg*cm/s^2
+        (_PRESSURE, {"Pa": 0.01, "kPa": 10, "MPa": 1e4, "GPa": 1e7, "psi": 68.94757, "ksi": 68947.57}),
+        (_TEMPERATURE, {"C": None, "F": None, "K": 1})):
+    for _name, _scale_factor in _units.items():
+        UNIT_DIMENSIONS[_name] = _dimension
+        UNIT_SCALES[_name] = _scale_factor
+
+# Unit names that may appear in expressions ("10 mm", "45 deg").
+UNITS = set(UNIT_DIMENSIONS)
+
+_DIMENSION_NAMES = {
+    DIMENSIONLESS: "no unit", _LENGTH: "length", _ANGLE: "angle", _MASS: "mass", _TIME: "time",
+    _TEMPERATURE: "temperature", _FORCE: "force", _PRESSURE: "pressure",
+    (2, 0, 0, 0, 0): "area", (3, 0, 0, 0, 0): "volume"
+}
+_BASE_NAMES = ("length", "angle", "mass", "time", "temperature")
+
+# Functions by result: same dimension as their (single) argument, dimensionless, or an angle.
+_SAME_AS_ARGUMENT = {"abs": abs, "ceil": math.ceil, "floor": math.floor, "round": round}
+_INVERSE_TRIG = {"asin": math.asin, "acos": math.acos, "atan": math.atan}
+_DIMENSIONLESS_FUNCTIONS = {
+    "sin": math.sin, "cos": math.cos, "tan": math.tan, "sinh": math.sinh, "cosh": math.cosh, "tanh": math.tanh,
+    "asinh": math.asinh, "acosh": math.acosh, "atanh": math.atanh, "exp": math.exp, "ln": math.log,
+    "log": math.log10, "sign": lambda x: (x > 0) - (x < 0)
+}
+_ARGUMENT_COUNTS = {"if": 3, "pow": 2, "random": 0}
+_COMPARISONS = {"==": lambda a, b: math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12),
+                "!=": lambda a, b: not math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12),
+                "<": lambda a, b: a < b, "<=": lambda a, b: a <= b, ">": lambda a, b: a > b, ">=": lambda a, b: a >= b}
+
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<string>'[^']*'|"[^"]*")
+  | (?P<op>==|!=|<=|>=|&&|\|\||[-+*/^%(),;<>!])
+)""", re.VERBOSE)
+
+def dimension_name(dimension):
+    """"length", "area", ... or a composite such as "mass/length^3"."""
+    if dimension in _DIMENSION_NAMES:
+        return _DIMENSION_NAMES[dimension]
+    up = [(n, e) for n, e in zip(_BASE_NAMES, dimension) if e > 0]
+    down = [(n, -e) for n, e in zip(_BASE_NAMES, dimension) if e < 0]
+    text = lambda parts: "*".join(n if e == 1 else "{}^{:g}".format(n, e) for n, e in parts)
+    return (text(up) or "1") + ("/" + text(down) if down else "")
+
+def _tokenize(expression):
+    tokens = []
+    text = expression.rstrip()
+    pos = 0
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if not match:
+            raise ValueError("Unexpected '{}'".format(text[pos:].strip()[:1]))
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos = match.end()
+    return tokens
+
+def _add(a, b, op):
+    """Dimension of a + b (also -, comparisons and the branches of if/min/max)."""
+    if a is None or b is None: return None
+    if a == DIMENSIONLESS: return b
+    if b == DIMENSIONLESS or a == b: return a
+    raise ValueError("Can't {} {} and {}".format(op, dimension_name(a), dimension_name(b)))
+
+def _scale(a, factor):
+    if a is None: return None
+    return tuple(round(e * factor, 6) for e in a)
+
+def _combine(a, b, sign):
+    if a is None or b is None: return None
+    return tuple(round(x + sign * y, 6) for x, y in zip(a, b))
+
+def _apply(fn, *values):
+    """fn(*values), or None if a value is unknown or fn fails (a domain error, say)."""
+    if any(v is None for v in values): return None
+    try:
+        return float(fn(*values))
+    except:
+        return None
+
+class _Parser:
+    """Recursive descent over the tokens; each rule returns (dimension, value).
+
+    `resolve(name)` gives a parameter's value when evaluating. `number_scales`
+    is {dimension: scale} for bare numbers mixed with a dimensioned value: they
+    are read in the parameter's own unit.
+    """
+
+    def __init__(self, tokens, parameter_units, lookup, resolve=None, number_scales=None):
+        self.tokens = tokens
+        self.pos = 0
+        self.parameter_units = parameter_units
+        self.lookup = lookup
+        self.resolve = resolve
+        self.number_scales = number_scales or {}
+
+    def peek(self, offset=0):
+        i = self.pos + offset
+        return self.tokens[i] if i < len(self.tokens) else (None, None)
+
+    def accept(self, *values):
+        kind, value = self.peek()
+        if kind in ("op", "name") and value in values:
+            self.pos += 1
+            return value
+        return None
+
+    def expect(self, value):
+        if not self.accept(value):
+            found = self.peek()[1]
+            raise ValueError("Expected '{}'".format(value) + (" before '{}'".format(found) if found else ""))
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("Empty expression")
+        result = self.logical()
+        if self.pos < len(self.tokens):
+            raise ValueError("Unexpected '{}'".format(self.peek()[1]))
+        return result
+
+    def mix(self, left, right, op):
+        """Dimension and the two values of `left op right` for +, -, comparisons and branches."""
+        dimension = _add(left[0], right[0], op)
+        return dimension, self.adopt(left, dimension), self.adopt(right, dimension)
+
+    def adopt(self, operand, dimension):
+        """An operand's value once mixed into `dimension`: bare numbers take the parameter's unit."""
+        own, value = operand
+        if value is None or own != DIMENSIONLESS or dimension in (None, DIMENSIONLESS):
+            return value
+        scale = self.number_scales.get(dimension)
+        return None if scale is None else value * scale
+
+    def logical(self):
+        left = self.comparison()
+        while True:
+            op = self.accept("&&", "||", "and", "or")
+            if not op: return left
+            right = self.comparison()
+            if left[1] is None or right[1] is None:
+                left = (DIMENSIONLESS, None)
+            elif op in ("&&", "and"):
+                left = (DIMENSIONLESS, float(bool(left[1]) and bool(right[1])))
+            else:
+                left = (DIMENSIONLESS, float(bool(left[1]) or bool(right[1])))
+
+    def comparison(self):
+        left = self.additive()
+        op = self.accept("==", "!=", "<", "<=", ">", ">=")
+        if op:
+            _, a, b = self.mix(left, self.additive(), "compare")
+            return DIMENSIONLESS, _apply(_COMPARISONS[op], a, b)
+        return left
+
+    def additive(self):
+        left = self.term()
+        while True:
+            op = self.accept("+", "-")
+            if not op: return left
+            dimension, a, b = self.mix(left, self.term(), "add" if op == "+" else "subtract")
+            left = (dimension, _apply(lambda x, y: x + y if op == "+" else x - y, a, b))
+
+    def term(self):
+        start = self.pos
+        dimension, value = self.unary()
+        while True:
+            op = self.accept("*", "/", "%")
+            if not op: return dimension, value
+            right_start = self.pos
+            right = self.unary()
+            unit = self.fraction_unit(start, right_start) if op == "/" else None
+            if unit:
+                # "3/8 in": Fusion reads a fraction before a unit as a number of that unit.
+                denominator = float(self.tokens[right_start][1])
+                dimension, value = UNIT_DIMENSIONS[unit], _apply(lambda x, s: x / denominator * s, value, UNIT_SCALES[unit])
+            elif op == "%":
+                dimension, a, b = self.mix((dimension, value), right, "take the remainder of")
+                value = _apply(math.fmod, a, b)
+            else:
+                dimension = _combine(dimension, right[0], 1 if op == "*" else -1)
+                value = _apply(lambda x, y: x * y if op == "*" else x / y, value, right[1])
+
+    def fraction_unit(self, start, right_start):
+        """The unit of "3/8 in" when the division just parsed is a (signed) number over a number with a unit."""
+        left = self.tokens[start:right_start - 1]
+        if left and left[0][1] in ("-", "+"): left = left[1:]
+        right = self.tokens[right_start:self.pos]
+        if (len(left) == 1 and left[0][0] == "number" and len(right) == 2 and right[0][0] == "number"
+                and right[1][1] in UNIT_DIMENSIONS):
+            return right[1][1]
+        return None
+
+    def unary(self):
+        op = self.accept("-", "+", "!", "not")
+        if op:
+            dimension, value = self.unary()
+            if op in ("!", "not"): return DIMENSIONLESS, _apply(lambda x: not x, value)
+            return dimension, (None if value is None else -value if op == "-" else value)
+        return self.power()
+
+    def power(self):
+        base = self.primary()
+        if not self.accept("^"):
+            return base
+        return self._power(base, self.unary())
+
+    def _power(self, base, exponent):
+        if exponent[0] not in (None, DIMENSIONLESS):
+            raise ValueError("Exponent has a unit ({})".format(dimension_name(exponent[0])))
+        value = _apply(math.pow, base[1], exponent[1])
+        if base[0] == DIMENSIONLESS: return DIMENSIONLESS, value
+        return (_scale(base[0], exponent[1]) if exponent[1] is not None else None), value
+
+    def primary(self):
+        kind, value = self.peek()
+        if kind is None:
+            raise ValueError("Incomplete expression")
+        self.pos += 1
+        if kind == "number":
+            number = float(value)
+            unit_kind, unit = self.peek()
+            if unit_kind == "name" and self.peek(1)[1] != "(":
+                if unit in UNIT_DIMENSIONS:
+                    self.pos += 1  # "10 mm": the unit binds to the number
+                    return UNIT_DIMENSIONS[unit], _apply(lambda s: number * s, UNIT_SCALES[unit])
+                if unit not in self.parameter_units and unit not in FUNCTIONS and unit not in CONSTANTS \
+                        and unit not in KEYWORDS:
+                    self.pos += 1  # "5 L": a unit we don't know; let Fusion judge it
+                    return None, None
+            return DIMENSIONLESS, number
+        if kind == "string":
+            return None, None
+        if kind == "op" and value == "(":
+            result = self.logical()
+            self.expect(")")
+            return result
+        if kind == "name":
+            if self.peek()[1] == "(" and value in FUNCTIONS:
+                self.pos += 1
+                return self.function(value)
+            return self.name(value)
+        raise ValueError("Unexpected '{}'".format(value))
+
+    def function(self, name):
+        args = []
+        if not self.accept(")"):
+            while True:
+                args.append(self.logical())
+                if self.accept(")"): break
+                if not self.accept(",", ";"):
+                    raise ValueError("Expected ',' or ')' in {}()".format(name))
+        expected = _ARGUMENT_COUNTS.get(name, None if name in ("max", "min") else 1)
+        if (expected is None and not args) or (expected is not None and len(args) != expected):
+            raise ValueError("{}() takes {} argument{}".format(
+                name, expected if expected is not None else "at least 1", "" if expected == 1 else "s"))
+        if name == "if":
+            dimension, a, b = self.mix(args[1], args[2], "mix")
+            condition = args[0][1]
+            return dimension, (None if condition is None else a if condition else b)
+        if name in ("max", "min"):
+            result = args[0]
+            for arg in args[1:]:
+                dimension, a, b = self.mix(result, arg, "compare")
+                result = (dimension, _apply(max if name == "max" else min, a, b))
+            return result
+        if name == "pow":
+            return self._power(args[0], args[1])
+        if name == "sqrt":
+            return _scale(args[0][0], 0.5), _apply(math.sqrt, args[0][1])
+        if name == "random":
+            return DIMENSIONLESS, None
+        if name in _SAME_AS_ARGUMENT:
+            return args[0][0], _apply(_SAME_AS_ARGUMENT[name], args[0][1])
+        if name in _INVERSE_TRIG:
+            return _ANGLE, _apply(_INVERSE_TRIG[name], args[0][1])
+        return DIMENSIONLESS, _apply(_DIMENSIONLESS_FUNCTIONS[name], args[0][1])
+
+    def name(self, name):
+        if name in self.parameter_units:
+            return unit_dimension(self.parameter_units[name]), (self.resolve(name) if self.resolve else None)
+        if name in CONSTANTS:
+            return DIMENSIONLESS, {"PI": math.pi, "pi": math.pi, "E": math.e, "e": math.e, "true": 1.0}.get(name, 0.0)
+        if name in UNIT_DIMENSIONS:
+            return UNIT_DIMENSIONS[name], UNIT_SCALES[name]  # "5 kg/m^3": a unit on its own
+        if name in FUNCTIONS:
+            raise ValueError("{}() needs parentheses".format(name))
+        unit = self.lookup(name) if self.lookup else None
+        if unit is None:
+            raise ValueError("Unknown name: " + name)
+        return (unit_dimension(unit) if unit is not True else None), None
+
+_units = {"": (DIMENSIONLESS, 1.0)}
+
+def _unit(unit):
+    if unit not in _units:
+        try:
+            _units[unit] = _Parser(_tokenize(unit), {}, None).parse()
+        except:
+            _units[unit] = (None, None)
+    return _units[unit]
+
+def unit_dimension(unit):
+    """Dimension of a parameter unit such as "mm" or "kg / m^3"; None if it isn't understood."""
+    return _unit(unit)[0]
+
+def unit_scale(unit):
+    """Internal units (cm, rad, kg, s) per `unit`; None if it can't be converted."""
+    return _unit(unit)[1]
+
+def check_expression(expression, unit="", parameter_units=None, lookup=None):
+    """Returns why Fusion would reject `expression` for a parameter in `unit`, or None.
+
+    parameter_units is {user parameter: unit}. Other names are passed to
+    lookup(name), which returns the unit of a model parameter of that name, True
+    if one exists with an unknown unit, or None if there's no such parameter;
+    without a lookup they are reported as unknown.
+    """
+    try:
+        dimension, _ = _Parser(_tokenize(str(expression)), parameter_units or {}, lookup).parse()
+    except ValueError as e:
+        return str(e)
+    target = unit_dimension(unit)
+    if dimension is None or target is None or dimension == DIMENSIONLESS or dimension == target:
+        return None
+    if target == DIMENSIONLESS:
+        return "Expected no unit, got {}".format(dimension_name(dimension))
+    return "Expected {}, got {}".format(dimension_name(target), dimension_name(dimension))
+
+def evaluate(expression, unit="", parameter_units=None, resolve=None):
+    """Value of `expression` in `unit` ("8 cm" in "mm" is 80.0), or None if it can't be worked out.
+
+    resolve(name) returns a user parameter's value in internal units (see
+    unit_scale), or None. Names that aren't in parameter_units make the value
+    unknown, as do text values and units that don't fit.
+    """
+    dimension, scale = _unit(unit)
+    try:
+        result_dimension, value = _Parser(_tokenize(str(expression)), parameter_units or {}, lambda name: True,
+                                          resolve, {dimension: scale} if scale else None).parse()
+    except:
+        return None
+    if value is None or result_dimension is None: return None
+    if result_dimension == DIMENSIONLESS: return value  # A bare number is already in the parameter's unit
+    if result_dimension != dimension or not scale: return None
+    return value / scale
@@ -24,6 +24,18 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 
+    // --- DIAGNOSTICS TOGGLE ---
+    const diagCheck = document.getElementById('diagEnableCheck');
+    const diagReset = document.getElementById('diagResetBtn');
+    if (diagCheck) {
+        diagCheck.checked = (localStorage.getItem('ll_diagnostics') === 'true');
+        diagCheck.addEventListener('change', function(e) {
+            localStorage.setItem('ll_diagnostics', e.target.checked);
+            setDiagnostics(e.target.checked, false);
+        });
+    }
+    if (diagReset) diagReset.addEventListener('click', () => setDiagnostics(diagCheck.checked, true));
+
     // --- BUTTON INITIALIZATION ---
     const scanBtn = document.getElementById('scanBtn');
     const saveBtn = document.getElementById('saveConfigBtn');
@@ -39,10 +51,39 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     if (saveBtn) saveBtn.addEventListener('click', saveSnapshot);
+
+    const sweepGridBtn = document.getElementById('sweepGridBtn');
+    const sweepSnapshotsBtn = document.getElementById('sweepSnapshotsBtn');
+    if (sweepGridBtn) sweepGridBtn.addEventListener('click', () => runSweep('grid'));
+    if (sweepSnapshotsBtn) sweepSnapshotsBtn.addEventListener('click', () => runSweep('snapshots'));
+    const jobCancelBtn = document.getElementById('jobCancelBtn');
+    if (jobCancelBtn) jobCancelBtn.addEventListener('click', cancelCurrentJob);
+
+    const importTableBtn = document.getElementById('importTableBtn');
+    const exportTableBtn = document.getElementById('exportTableBtn');
+    if (importTableBtn) importTableBtn.addEventListener('click', () => sendToFusion('import_table'));
+    if (exportTableBtn) exportTableBtn.addEventListener('click', () => sendToFusion('export_table'));
+
+    const measureConfigsBtn = document.getElementById('measureConfigsBtn');
+    const clearMetricsBtn = document.getElementById('clearMetricsBtn');
+    if (measureConfigsBtn) measureConfigsBtn.addEventListener('click', () => sendToFusion('measure_configs'));
+    if (clearMetricsBtn) clearMetricsBtn.addEventListener('click', () => sendToFusion('clear_metrics'));
+
+    const configFilterInput = document.getElementById('configFilter');
+    const findDuplicatesBtn = document.getElementById('findDuplicatesBtn');
+    if (configFilterInput) configFilterInput.addEventListener('input', () => scheduleConfigQuery(configFilterInput.value));
+    if (findDuplicatesBtn) findDuplicatesBtn.addEventListener('click', () => sendToFusion('config_report'));
+
+    const applyAllBtn = document.getElementById('applyAllBtn');
+    if (applyAllBtn) applyAllBtn.addEventListener('click', () => {
+        renderSweepStatus({ running: true });
+        sendToFusion('apply_all_in_order');
+    });
 });
 
 // --- CACHE ---
 let lastReceivedData = null;
+let firstRenderReported = false;
 
 // --- HELPERS ---
 function toggleSection(sectionId) {
@@ -51,24 +92,8 @@ function toggleSection(sectionId) {
 }
 
 function isConfigMatch(data, configName) {
-    if (!configName || !data.configs || !data.configs[configName]) return false;
-    const saved = data.configs[configName];
-
-    // Check Params
-    if (saved.params) {
-        for (const [name, savedExpr] of Object.entries(saved.params)) {
-            const currentParam = data.parameters.find(p => p.name === name);
-            if (!currentParam || currentParam.expression !== savedExpr) return false;
-        }
-    }
-    // Check Features
-    if (saved.features) {
-        for (const [name, savedSuppressed] of Object.entries(saved.features)) {
-            const currentFeat = data.features.find(f => f.name === name);
-            if (!currentFeat || currentFeat.isSuppressed !== savedSuppressed) return false;
-        }
-    }
-    return true;
+    // Python compares state fingerprints and reports the snapshots that match.
+    return !!configName && (data.matching_configs || []).includes(configName);
 }
 
 function markAsDirty() {
@@ -82,6 +107,31 @@ function markAsDirty() {
 let connectionAttempts = 0;
 const MAX_ATTEMPTS = 20;
 
+// --- BRIDGE ---
+// Messages from Python by html action; each handler takes the parsed payload.
+
+const BRIDGE_HANDLERS = {
+    update_ui: renderFullUpdate,
+    patch_ui: applyPatch,
+    param_errors: showParamErrors,
+    diagnostics: renderDiagnostics,
+    sweep_status: renderSweepStatus,
+    job_status: handleJobStatus,
+    batch_result: handleBatchResult,
+    table_status: renderTableStatus,
+    snapshot_body: handleSnapshotBody,
+    config_query: handleConfigQuery,
+    config_report: renderConfigReport
+};
+
+function dispatchFromFusion(action, data) {
+    try {
+        BRIDGE_HANDLERS[action](typeof data === 'string' ? JSON.parse(data) : data);
+    } catch (e) {
+        console.error(`Error handling '${action}'`, e);
+    }
+}
+
 function waitForFusion() {
     if (window.adsk) {
         console.log("Fusion API Bridge Found!");
@@ -92,26 +142,21 @@ function waitForFusion() {
         if (saveBtn) saveBtn.disabled = false;
 
         if (window.adsk.fusion && window.adsk.fusion.on) {
-            window.adsk.fusion.on('update_ui', function(jsonString) {
-                var data = JSON.parse(jsonString);
-                renderUI(data);
+            Object.keys(BRIDGE_HANDLERS).forEach(action => {
+                window.adsk.fusion.on(action, data => dispatchFromFusion(action, data));
             });
         }
-        
+
         window.fusionJavaScriptHandler = {
             handle: function(action, data) {
-                if (action === 'update_ui') {
-                    try {
-                        var parsed = typeof data === 'string' ? JSON.parse(data) : data;
-                        renderUI(parsed);
-                    } catch (e) {
-                        console.error("Legacy Parse Error", e);
-                    }
-                    return "OK";
-                }
+                if (!(action in BRIDGE_HANDLERS)) return;
+                dispatchFromFusion(action, data);
+                return "OK";
             }
         };
 
+        const diagCheck = document.getElementById('diagEnableCheck');
+        if (diagCheck && diagCheck.checked) setDiagnostics(true, false);
         refreshData();
     } else {
         connectionAttempts++;
@@ -129,24 +174,318 @@ function waitForFusion() {
     }
 }
 
-function sendToFusion(action, data = {}) {
-    const dataStr = JSON.stringify(data);
+// --- BATCHED RPC ---
+// Actions sent in the same frame cross the bridge as one 'batch' message;
+// Python runs them in one compute window and answers with one 'batch_result'.
+
+// These open dialogs or manage their own recompute, so they are never batched.
+// cancel_job, get_snapshot and query_configs are answered straight from the
+// HTML event; the latter two and config_report answer on their own message.
+const UNBATCHED_ACTIONS = new Set(['run_sweep', 'apply_all_in_order', 'measure_configs', 'import_table', 'export_table',
+    'cancel_job', 'get_snapshot', 'query_configs', 'config_report']);
+let pendingActions = [];
+let flushScheduled = false;
+
+function postToFusion(message) {
+    const payload = JSON.stringify(message);
     if (window.adsk && window.adsk.fusion && window.adsk.fusion.sendCommand) {
-        data.action = action; 
-        window.adsk.fusion.sendCommand(JSON.stringify(data));
+        window.adsk.fusion.sendCommand(payload);
     } 
     else if (window.adsk && window.adsk.fusionSendData) {
-        data.action = action; 
-        window.adsk.fusionSendData('send', JSON.stringify(data));
+        window.adsk.fusionSendData('send', payload);
     }
 }
 
+function sendToFusion(action, data = {}) {
+    data.action = action; 
+    if (UNBATCHED_ACTIONS.has(action)) {
+        flushActions();
+        postToFusion(data);
+        return;
+    }
+    pendingActions.push(data);
+    if (!flushScheduled) {
+        flushScheduled = true;
+        // A hidden palette may never get an animation frame: the timeout is the fallback.
+        requestAnimationFrame(flushActions);
+        setTimeout(flushActions, 50);
+    }
+}
+
+function flushActions() {
+    flushScheduled = false;
+    if (pendingActions.length === 0) return;
+    const actions = pendingActions;
+    pendingActions = [];
+    postToFusion(actions.length === 1 ? actions[0] : { action: 'batch', actions: actions });
+}
+
+function handleBatchResult(result) {
+    (result.results || []).forEach(r => {
+        if (!r.ok) console.error(`Action ${r.action} failed: ${r.error}`);
+    });
+    // The batch's state send ('update_ui' or 'patch_ui') takes the same path as a standalone one.
+    const update = result.update;
+    if (update && update.action in BRIDGE_HANDLERS) BRIDGE_HANDLERS[update.action](update.data);
+}
+
 function refreshData() {
     sendToFusion('refresh_data');
 }
 
+// --- DELTA PATCHES ---
+
+function mergeNamedList(items, section) {
+    const byName = new Map(items.map(item => [item.name, item]));
+    (section.removed || []).forEach(name => byName.delete(name));
+    (section.changed || []).forEach(item => byName.set(item.name, item));
+    if (!section.order) return Array.from(byName.values());
+    return section.order.filter(name => byName.has(name)).map(name => byName.get(name));
+}
+
+function mergeNamedMap(map, section) {
+    const merged = Object.assign({}, map, section.changed || {});
+    (section.removed || []).forEach(name => delete merged[name]);
+    if (!section.order) return merged;
+    const ordered = {};
+    section.order.forEach(name => { if (name in merged) ordered[name] = merged[name]; });
+    return ordered;
+}
+
+function applyPatch(patch) {
+    // Out of step with Python (missed a message or never got a full update): resync.
+    if (!lastReceivedData || lastReceivedData.version !== patch.base_version) {
+        refreshData();
+        return;
+    }
+    const data = lastReceivedData;
+    if (patch.set) Object.assign(data, patch.set);
+    if (patch.parameters) data.parameters = mergeNamedList(data.parameters || [], patch.parameters);
+    if (patch.features) data.features = mergeNamedList(data.features || [], patch.features);
+    if (patch.configs) data.configs = mergeNamedMap(data.configs || {}, patch.configs);
+    data.version = patch.version;
+    renderUI(data);
+}
+
+// --- KEYED LISTS ---
+// Rows are keyed by name and patched in place, so focus, scroll position and
+// untouched rows survive updates. Lists longer than VIRTUALIZE_AFTER only keep
+// the visible window (plus OVERSCAN_ROWS) in the DOM, between two spacers.
+
+const VIRTUALIZE_AFTER = 150;
+const OVERSCAN_ROWS = 10;
+
+function renderKeyedList(container, items, opts) {
+    let state = container._keyed;
+    if (!state) {
+        container.innerHTML = '';
+        state = container._keyed = {
+            rows: new Map(),
+            top: document.createElement('div'),
+            bottom: document.createElement('div'),
+            empty: document.createElement('div'),
+            rowHeight: 0
+        };
+        state.empty.className = 'empty-state';
+        container.append(state.top, state.bottom);
+        container.addEventListener('scroll', () => renderWindow(container));
+    }
+    state.items = items;
+    state.opts = opts;
+    container.classList.toggle('virtual-list', items.length > VIRTUALIZE_AFTER);
+
+    if (items.length === 0 && opts.emptyText) {
+        state.empty.innerText = opts.emptyText;
+        if (!state.empty.isConnected) container.appendChild(state.empty);
+    } else if (state.empty.isConnected) {
+        state.empty.remove();
+    }
+    renderWindow(container);
+}
+
+function renderWindow(container) {
+    const state = container._keyed;
+    const { items, opts, rows } = state;
+    const virtual = container.classList.contains('virtual-list');
+
+    let start = 0;
+    let end = items.length;
+    if (virtual && state.rowHeight) {
+        start = Math.max(0, Math.floor(container.scrollTop / state.rowHeight) - OVERSCAN_ROWS);
+        end = Math.min(items.length,
+            Math.ceil((container.scrollTop + container.clientHeight) / state.rowHeight) + OVERSCAN_ROWS);
+    } else if (virtual) {
+        end = Math.min(items.length, 2 * OVERSCAN_ROWS); // first pass: measure a row
+    }
+
+    const seen = new Set();
+    let cursor = state.top.nextSibling;
+    for (let i = start; i < end; i++) {
+        const item = items[i];
+        const key = opts.key(item);
+        seen.add(key);
+        let row = rows.get(key);
+        if (!row) {
+            row = opts.create(key);
+            rows.set(key, row);
+        }
+        opts.update(row, item);
+        if (row === cursor) {
+            cursor = cursor.nextSibling;
+        } else {
+            container.insertBefore(row, cursor);
+        }
+    }
+    rows.forEach((row, key) => {
+        if (!seen.has(key)) {
+            row.remove();
+            rows.delete(key);
+        }
+    });
+
+    if (virtual && !state.rowHeight && rows.size > 0) {
+        const first = rows.values().next().value;
+        state.rowHeight = first.offsetHeight + parseFloat(getComputedStyle(first).marginBottom || 0);
+        if (state.rowHeight) return renderWindow(container);
+    }
+    state.top.style.height = virtual ? `${start * state.rowHeight}px` : '0';
+    state.bottom.style.height = virtual ? `${(items.length - end) * state.rowHeight}px` : '0';
+}
+
+// --- ROW BUILDERS ---
+
+function createParamRow(name) {
+    const row = document.createElement('div');
+    row.className = 'param-row';
+    row.innerHTML = `
+        <div class="param-label"><span class="fav-star">★</span><span class="param-name"></span></div>
+        <div class="param-input"><input type="text"></div>
+    `;
+    const input = row.querySelector('input');
+    input.dataset.param = name;
+    row.querySelector('.param-name').innerText = name;
+    row.querySelector('.param-label').title = name;
+    row.querySelector('.fav-star').onclick = () => toggleFavorite(name);
+    input.onchange = () => updateParam(name, input.value);
+    input.onkeydown = (e) => handleEnter(e, input);
+    return row;
+}
+
+function updateParamRow(row, param) {
+    if (row._favorite !== param.isFavorite) {
+        row._favorite = param.isFavorite;
+        row.querySelector('.fav-star').style.color = param.isFavorite ? '#ff9e3b' : '#555';
+    }
+    const input = row.querySelector('input');
+    if (row._expression !== param.expression && input !== document.activeElement) {
+        row._expression = param.expression;
+        input.value = param.expression;
+    }
+    const issues = (lastReceivedData && lastReceivedData.param_issues) || {};
+    const error = paramErrors.get(param.name) || issues[param.name] || '';
+    if (input.title !== error) {
+        input.classList.toggle('input-error', !!error);
+        input.title = error;
+    }
+}
+
+function createConfigRow(name) {
+    const row = document.createElement('div');
+    row.className = 'config-row';
+    const btn = document.createElement('button');
+    btn.className = 'config-btn';
+    btn.innerText = name;
+    btn.onclick = () => loadSnapshot(name);
+    const metrics = document.createElement('span');
+    metrics.className = 'config-metrics';
+    btn.appendChild(metrics);
+    
+    const expandBtn = document.createElement('button');
+    expandBtn.className = 'action-btn expand-btn';
+    expandBtn.title = 'Show values';
+    expandBtn.onclick = () => toggleConfigDetails(name);
+
+    const updateBtn = document.createElement('button');
+    updateBtn.className = 'action-btn update-btn';
+    updateBtn.innerHTML = '💾';
+    updateBtn.onclick = () => updateSnapshot(name);
+
+    const delBtn = document.createElement('button');
+    delBtn.className = 'action-btn delete-btn';
+    delBtn.innerHTML = '🗑️';
+    delBtn.onclick = () => deleteSnapshot(name);
+
+    const details = document.createElement('div');
+    details.className = 'config-details';
+
+    row.appendChild(btn);
+    row.appendChild(expandBtn);
+    row.appendChild(updateBtn);
+    row.appendChild(delBtn);
+    row.appendChild(details);
+    return row;
+}
+
+function updateConfigRow(row, config) {
+    row.firstChild.classList.toggle('active-config', config.isActive);
+    const text = formatMetrics(config.metrics);
+    const title = metricsTitle(config.metrics);
+    if (row.firstChild.lastChild.innerText !== text) row.firstChild.lastChild.innerText = text;
+    if (row.firstChild.title !== title) row.firstChild.title = title;
+
+    const expanded = config.name === expandedConfig;
+    const expandBtn = row.querySelector('.expand-btn');
+    const arrow = expanded ? '▾' : '▸';
+    if (expandBtn.innerText !== arrow) expandBtn.innerText = arrow;
+    const details = row.lastChild;
+    const detailText = expanded ? snapshotDetails(config.name) : '';
+    if (details.innerText !== detailText) details.innerText = detailText;
+}
+
+// Cached metrics arrive in Fusion's internal units (kg, cm).
+function formatMetrics(m) {
+    if (!m) return '';
+    const parts = [];
+    if (m.mass_kg !== undefined) parts.push(`${Number(m.mass_kg.toPrecision(3))} kg`);
+    if (m.bbox_x_cm !== undefined) {
+        parts.push([m.bbox_x_cm, m.bbox_y_cm, m.bbox_z_cm].map(v => Number((v * 10).toPrecision(3))).join('×') + ' mm');
+    }
+    return parts.join(' · ');
+}
+
+function metricsTitle(m) {
+    if (!m) return '';
+    return Object.keys(m).sort().map(key => `${key}: ${Number(m[key].toPrecision(6))}`).join('\n');
+}
+
+function createFeatureRow(name) {
+    const row = document.createElement('div');
+    row.className = 'feature-row';
+    row.innerHTML = `
+        <span></span>
+        <label class="switch">
+            <input type="checkbox">
+            <span class="slider"></span>
+        </label>
+    `;
+    row.querySelector('span').innerText = name;
+    const input = row.querySelector('input');
+    input.onchange = () => toggleFeature(name, input.checked);
+    return row;
+}
+
+function updateFeatureRow(row, feat) {
+    const input = row.querySelector('input');
+    if (input.checked !== !feat.isSuppressed) input.checked = !feat.isSuppressed;
+}
+
 // --- RENDERING ---
 
+function renderFullUpdate(data) {
+    if (data.unit_dimensions) loadUnitTable(data.unit_dimensions);
+    renderUI(data);
+}
+
 function renderUI(data) {
     lastReceivedData = data;
     const docNameEl = document.getElementById('docName');
@@ -157,45 +496,24 @@ function renderUI(data) {
     const favOnly = document.getElementById('favFilterCheck').checked;
 
     if (pContainer) {
-        pContainer.innerHTML = '';
-        let paramsToShow = data.parameters || [];
-        if (favOnly) {
-            paramsToShow = paramsToShow.filter(p => p.isFavorite);
-        }
-
-        if (paramsToShow.length === 0) {
-            if (favOnly && data.parameters.length > 0) {
-                 pContainer.innerHTML = '<div class="empty-state">No Favorites marked. Uncheck ★ Favs to view all.</div>';
-            } else {
-                 pContainer.innerHTML = '<div class="empty-state">No User Parameters found.</div>';
-            }
-        } else {
-            paramsToShow.forEach(param => {
-                const row = document.createElement('div');
-                row.className = 'param-row';
-                const starColor = param.isFavorite ? '#ff9e3b' : '#555';
-                const star = `<span class="fav-star" style="color:${starColor}; margin-right:6px; cursor:pointer;" onclick="toggleFavorite('${param.name}')">★</span>`;
-                
-                row.innerHTML = `
-                    <div class="param-label" title="${param.name}">${star}${param.name}</div>
-                    <div class="param-input">
-                        <input type="text" value="${param.expression}" onchange="updateParam('${param.name}', this.value)" onkeydown="handleEnter(event, this)">
-                    </div>
-                `;
-                pContainer.appendChild(row);
-            });
-        }
+        const allParams = data.parameters || [];
+        const paramsToShow = favOnly ? allParams.filter(p => p.isFavorite) : allParams;
+        renderKeyedList(pContainer, paramsToShow, {
+            key: p => p.name,
+            create: createParamRow,
+            update: updateParamRow,
+            emptyText: (favOnly && allParams.length > 0)
+                ? 'No Favorites marked. Uncheck ★ Favs to view all.'
+                : 'No User Parameters found.'
+        });
     }
 
     // 2. Render Configs
     const cContainer = document.getElementById('configList');
     if (cContainer) {
-        cContainer.innerHTML = '';
         const configNames = data.configs ? Object.keys(data.configs) : [];
-        if (configNames.length === 0) {
-            cContainer.innerHTML = '<div class="empty-state">No configs saved.</div>';
-        } else {
-            let effectiveActive = data.active_config;
+        let effectiveActive = data.active_config;
+        if (configNames.length > 0) {
             if (effectiveActive && !isConfigMatch(data, effectiveActive)) {
                 effectiveActive = null;
                 setTimeout(markAsDirty, 0);
@@ -203,58 +521,641 @@ function renderUI(data) {
                 const nameInput = document.getElementById('newConfigName');
                 if (nameInput) nameInput.style.borderColor = '';
             }
-
-            configNames.forEach(name => {
-                const row = document.createElement('div');
-                row.className = 'config-row';
-                const btn = document.createElement('button');
-                btn.className = 'config-btn';
-                if (effectiveActive === name) btn.classList.add('active-config');
-                btn.innerText = name;
-                btn.onclick = () => loadSnapshot(name);
-                
-                const updateBtn = document.createElement('button');
-                updateBtn.className = 'action-btn update-btn';
-                updateBtn.innerHTML = '💾';
-                updateBtn.onclick = () => updateSnapshot(name);
-
-                const delBtn = document.createElement('button');
-                delBtn.className = 'action-btn delete-btn';
-                delBtn.innerHTML = '🗑️';
-                delBtn.onclick = () => deleteSnapshot(name);
-
-                row.appendChild(btn);
-                row.appendChild(updateBtn);
-                row.appendChild(delBtn);
-                cContainer.appendChild(row);
-            });
         }
+        forgetSnapshotBodies(data.configs || {});
+        refreshConfigQuery(data.configs || {});
+        const shownNames = configFilter.matches ? configNames.filter(name => configFilter.matches.has(name)) : configNames;
+        renderKeyedList(cContainer, shownNames.map(name => ({
+            name: name,
+            isActive: name === effectiveActive,
+            metrics: data.configs[name].metrics
+        })), {
+            key: c => c.name,
+            create: createConfigRow,
+            update: updateConfigRow,
+            emptyText: configNames.length ? 'No snapshots match the filter.' : 'No configs saved.'
+        });
     }
 
     // 3. Render Timeline Features
     const fContainer = document.getElementById('featureList');
     if (fContainer) {
-        fContainer.innerHTML = '';
-        if (data.features) {
-            data.features.forEach(feat => {
-                const row = document.createElement('div');
-                row.className = 'feature-row';
-                const isChecked = !feat.isSuppressed ? 'checked' : '';
-                row.innerHTML = `
-                    <span>${feat.name}</span>
-                    <label class="switch">
-                        <input type="checkbox" ${isChecked} onchange="toggleFeature('${feat.name}', this.checked)">
-                        <span class="slider"></span>
-                    </label>
-                `;
-                fContainer.appendChild(row);
-            });
+        renderKeyedList(fContainer, data.features || [], {
+            key: f => f.name,
+            create: createFeatureRow,
+            update: updateFeatureRow,
+            emptyText: ''
+        });
+    }
+
+    if (!firstRenderReported) {
+        // Python measures time-to-first-render from the moment the palette was opened.
+        firstRenderReported = true;
+        requestAnimationFrame(() => sendToFusion('first_render'));
+    }
+}
+
+// --- DIAGNOSTICS ---
+
+function setDiagnostics(enabled, reset) {
+    sendToFusion('set_diagnostics', { enabled: enabled, reset: reset });
+    if (!enabled || reset) {
+        renderDiagnostics([]);
+    }
+}
+
+function renderDiagnostics(rows) {
+    const container = document.getElementById('diagList');
+    if (!container) return;
+    if (rows.length === 0) {
+        const enabled = document.getElementById('diagEnableCheck').checked;
+        container.innerHTML = `<div class="empty-state">${enabled ? 'No actions timed yet.' : 'Diagnostics disabled.'}</div>`;
+        return;
+    }
+    const table = document.createElement('table');
+    table.className = 'diag-table';
+    table.innerHTML = '<tr><th>Action / phase</th><th>n</th><th>p50 ms</th><th>p90 ms</th><th>max ms</th></tr>';
+    rows.forEach(r => {
+        const tr = document.createElement('tr');
+        if (r.phase === 'total') tr.className = 'diag-action';
+        [r.phase === 'total' ? r.action : r.phase, r.count, r.p50_ms, r.p90_ms, r.max_ms].forEach(value => {
+            const td = document.createElement('td');
+            td.innerText = value;
+            tr.appendChild(td);
+        });
+        table.appendChild(tr);
+    });
+    container.innerHTML = '';
+    container.appendChild(table);
+}
+
+// --- SNAPSHOT DETAILS ---
+// update_ui only carries snapshot summaries. A snapshot's values are fetched
+// with get_snapshot when its row is expanded and cached until the summary's
+// fingerprint (fp) changes.
+
+const snapshotBodies = new Map();
+const requestedSnapshots = new Set();
+let expandedConfig = null;
+
+function toggleConfigDetails(name) {
+    expandedConfig = expandedConfig === name ? null : name;
+    if (lastReceivedData) renderUI(lastReceivedData);
+}
+
+function cachedSnapshot(name) {
+    const summary = lastReceivedData && (lastReceivedData.configs || {})[name];
+    const body = snapshotBodies.get(name);
+    return summary && body && body.fp === summary.fp ? body : null;
+}
+
+function requestSnapshot(name) {
+    const fp = ((lastReceivedData && lastReceivedData.configs || {})[name] || {}).fp;
+    const key = `${name}\n${fp}`;
+    if (requestedSnapshots.has(key)) return;
+    requestedSnapshots.add(key);
+    setTimeout(() => sendToFusion('get_snapshot', { config_name: name }), 0); // Not from inside a render
+}
+
+function handleSnapshotBody(body) {
+    Array.from(requestedSnapshots).filter(key => key.startsWith(body.name + '\n')).forEach(key => requestedSnapshots.delete(key));
+    if (body.missing) {
+        // Keep the answer for this fingerprint so the row doesn't ask again.
+        body.fp = ((lastReceivedData && lastReceivedData.configs || {})[body.name] || {}).fp;
+    }
+    snapshotBodies.set(body.name, body);
+    if (lastReceivedData && body.name === expandedConfig) renderUI(lastReceivedData);
+}
+
+function forgetSnapshotBodies(configs) {
+    snapshotBodies.forEach((body, name) => { if (!(name in configs)) snapshotBodies.delete(name); });
+    if (expandedConfig && !(expandedConfig in configs)) expandedConfig = null;
+}
+
+// The snapshot's values that differ from the model, one per line.
+function snapshotDetails(name) {
+    const body = cachedSnapshot(name);
+    if (!body) {
+        requestSnapshot(name);
+        return 'Loading…';
+    }
+    if (body.missing) return 'Snapshot not found.';
+    const current = new Map((lastReceivedData.parameters || []).map(p => [p.name, p.expression]));
+    const suppressed = new Map((lastReceivedData.features || []).map(f => [f.name, f.isSuppressed]));
+    const lines = [];
+    Object.keys(body.params).forEach(param => {
+        if (current.get(param) !== body.params[param]) {
+            lines.push(`${param} = ${body.params[param]}` + (current.has(param) ? ` (now ${current.get(param)})` : ' (not in model)'));
         }
+    });
+    Object.keys(body.features).forEach(feat => {
+        if (suppressed.get(feat) !== body.features[feat]) lines.push(`${feat}: ${body.features[feat] ? 'off' : 'on'}`);
+    });
+    const count = Object.keys(body.params).length + Object.keys(body.features).length;
+    const header = lines.length ? `${lines.length} of ${count} values differ from the model:` : `All ${count} values match the model.`;
+    return [header].concat(lines).join('\n');
+}
+
+// --- CONFIG FILTER ---
+// The filter box is answered by Python's config matrix (query_configs): it
+// returns the matching snapshot names, which renderUI shows alone. The query
+// is re-sent whenever the snapshots change, and an empty box needs no round trip.
+
+const configFilter = { query: '', matches: null, configsKey: null };
+let configQueryTimer = null;
+
+function configsKey(configs) {
+    return Object.keys(configs).map(name => `${name}\n${configs[name].fp}`).join('\n');
+}
+
+function scheduleConfigQuery(query) {
+    clearTimeout(configQueryTimer);
+    configQueryTimer = setTimeout(() => sendConfigQuery(query.trim()), 250);
+}
+
+function sendConfigQuery(query) {
+    configFilter.query = query;
+    configFilter.configsKey = configsKey((lastReceivedData && lastReceivedData.configs) || {});
+    if (!query) {
+        configFilter.matches = null;
+        renderConfigFilterStatus(null);
+        if (lastReceivedData) renderUI(lastReceivedData);
+        return;
+    }
+    sendToFusion('query_configs', { query: query });
+}
+
+// Asks again when the snapshots changed since the last answer (called while rendering).
+function refreshConfigQuery(configs) {
+    if (!configFilter.query || configFilter.configsKey === configsKey(configs)) return;
+    configFilter.configsKey = configsKey(configs);
+    setTimeout(() => sendConfigQuery(configFilter.query), 0); // Not from inside a render
+}
+
+function handleConfigQuery(result) {
+    if (result.query !== configFilter.query) return; // Superseded by a newer query
+    if (!result.error) configFilter.matches = new Set(result.matches);
+    renderConfigFilterStatus(result);
+    if (lastReceivedData) renderUI(lastReceivedData);
+}
+
+function renderConfigFilterStatus(result) {
+    const el = document.getElementById('configFilterStatus');
+    const input = document.getElementById('configFilter');
+    const error = result && result.error ? result.error : '';
+    if (input) {
+        input.classList.toggle('input-error', !!error);
+        input.title = error;
+    }
+    if (!el) return;
+    const total = Object.keys((lastReceivedData && lastReceivedData.configs) || {}).length;
+    el.classList.toggle('status-error', !!error);
+    el.innerText = !result ? '' : error ? error : `${result.matches.length} of ${total} snapshots match.`;
+}
+
+// Duplicates, varying keys and nearest snapshots from config_report.
+function renderConfigReport(report) {
+    const el = document.getElementById('configReport');
+    if (!el) return;
+    const lines = [];
+    if (report.duplicates.length) {
+        lines.push(`${report.duplicates.length} group(s) of identical snapshots:`);
+        report.duplicates.forEach(group => lines.push('  ' + group.join(' = ')));
+    } else {
+        lines.push(`No duplicates among ${report.count} snapshots.`);
+    }
+    const describe = e => e.kind === 'feature'
+        ? `${e.key} (off in ${e.suppressed} of ${e.rows})`
+        : e.min !== undefined
+            ? `${e.key} (${Number(e.min.toPrecision(4))}–${Number(e.max.toPrecision(4))}${e.unit ? ' ' + e.unit : ''}, ${e.distinct} values)`
+            : `${e.key} (${e.distinct} values)`;
+    lines.push(`${report.varying.length} keys vary, ${report.constant} are the same everywhere` + (report.varying.length ? ':' : '.'));
+    report.varying.slice(0, 8).forEach(e => lines.push('  ' + describe(e)));
+    if (report.varying.length > 8) lines.push(`  … and ${report.varying.length - 8} more`);
+    if (report.nearest.length) {
+        lines.push('Closest to the model:');
+        report.nearest.forEach(n => lines.push(`  ${n.name}: ` + (n.differences
+            ? `${n.differences} difference(s) (${n.keys.slice(0, 3).join(', ')}${n.keys.length > 3 ? ', …' : ''})`
+            : 'matches')));
+    }
+    el.innerText = lines.join('\n');
+}
+
+// --- SWEEP ---
+
+function checkedValues(name) {
+    return Array.from(document.querySelectorAll(`input[name="${name}"]:checked`)).map(input => input.value);
+}
+
+function runSweep(source) {
+    const grid = document.getElementById('sweepGrid').value;
+    if (source === 'grid' && !grid.trim()) {
+        renderSweepStatus({ error: 'Enter one "name = value, value" line per axis.' });
+        return;
+    }
+    renderSweepStatus({ running: true });
+    sendToFusion('run_sweep', {
+        source: source,
+        grid: grid,
+        metrics: checkedValues('sweepMetric'),
+        exports: checkedValues('sweepExport')
+    });
+}
+
+function renderSweepStatus(status) {
+    const el = document.getElementById('sweepStatus');
+    if (!el) return;
+    el.classList.toggle('status-error', !!status.error);
+    if (status.error) el.innerText = status.error;
+    else if (status.running) el.innerText = 'Running...';
+    else if (status.message) el.innerText = status.message;
+    else {
+        const name = status.path.split(/[\\/]/).pop();
+        el.innerText = `${status.cancelled ? 'Stopped' : 'Done'}: ${status.ran} run (${status.cached || 0} from cache), ` +
+            `${status.skipped} resumed, ${status.failed} failed of ${status.total} → ${name}`;
     }
 }
 
+// --- BACKGROUND JOBS ---
+// Python runs most actions from a scheduler and reports each job's progress.
+// The bar only appears for jobs still active after JOB_BAR_DELAY ms.
+
+const JOB_LABELS = {
+    load_snapshot: 'Loading snapshot',
+    apply_all_in_order: 'Applying snapshots',
+    run_sweep: 'Sweeping',
+    measure_configs: 'Measuring',
+    refresh_data: 'Scanning model',
+    toggle_feature: 'Updating feature',
+    batch: 'Applying changes',
+    import_table: 'Importing',
+    export_table: 'Exporting'
+};
+const JOB_BAR_DELAY = 250;
+const activeJobs = new Map();
+let jobBarTimer = null;
+
+function handleJobStatus(status) {
+    if (status.state === 'error') {
+        console.error(`Job ${status.label} failed: ${status.error}`);
+        showJobError(`${JOB_LABELS[status.label] || status.label} failed: ${status.error}`);
+    }
+    if (['queued', 'running', 'progress'].includes(status.state)) activeJobs.set(status.id, status);
+    else activeJobs.delete(status.id);
+    if (!jobBarTimer) jobBarTimer = setTimeout(renderJobBar, JOB_BAR_DELAY);
+}
+
+function currentJob() {
+    // The job that is actually running, else the oldest waiting one.
+    const jobs = Array.from(activeJobs.values());
+    return jobs.find(j => j.state !== 'queued') || jobs[0];
+}
+
+function renderJobBar() {
+    jobBarTimer = null;
+    const bar = document.getElementById('jobBar');
+    if (!bar || bar.classList.contains('job-error')) return;
+    const job = currentJob();
+    bar.classList.toggle('hidden', !job);
+    if (!job) return;
+    let text = JOB_LABELS[job.label] || job.label;
+    if (job.state === 'progress') text += ` ${job.done + 1}/${job.total}: ${job.message}`;
+    else text += '…';
+    if (activeJobs.size > 1) text += ` (+${activeJobs.size - 1} queued)`;
+    document.getElementById('jobText').innerText = text;
+    bar.dataset.jobId = job.id;
+}
+
+function showJobError(message) {
+    const bar = document.getElementById('jobBar');
+    if (!bar) return;
+    bar.classList.remove('hidden');
+    bar.classList.add('job-error');
+    document.getElementById('jobText').innerText = message;
+    setTimeout(() => { bar.classList.remove('job-error'); renderJobBar(); }, 4000);
+}
+
+function cancelCurrentJob() {
+    const bar = document.getElementById('jobBar');
+    if (bar && bar.classList.contains('job-error')) {
+        bar.classList.remove('job-error');
+        renderJobBar();
+        return;
+    }
+    const job = currentJob();
+    if (job) sendToFusion('cancel_job', { id: job.id });
+}
+
+// --- DESIGN TABLES ---
+
+function renderTableStatus(status) {
+    const el = document.getElementById('tableStatus');
+    if (!el) return;
+    const errors = status.errors || [];
+    el.classList.toggle('status-error', errors.length > 0);
+    el.innerText = [status.message].concat(errors).join('\n');
+}
+
+// --- EXPRESSION CHECK ---
+// Mirrors expressions.check_expression (keep the two in step) so an edit Fusion
+// would reject is flagged as it's typed, without a round trip. Dimensions are
+// exponent arrays over [length, angle, mass, time, temperature]; bare numbers
+// are dimensionless and fit any unit; null means "can't tell" and is never
+// reported. Names that aren't user parameters may be model parameters, which
+// the palette doesn't know: those are left for Python to check. The unit table
+// is expressions.UNIT_DIMENSIONS, sent with every full update_ui.
+
+const EXPR_FUNCTIONS = new Set(['abs', 'acos', 'acosh', 'asin', 'asinh', 'atan', 'atanh', 'ceil', 'cos', 'cosh',
+    'exp', 'floor', 'ln', 'log', 'max', 'min', 'pow', 'random', 'round', 'sign',
+    'sin', 'sinh', 'sqrt', 'tan', 'tanh', 'if']);
+const EXPR_CONSTANTS = new Set(['PI', 'E', 'pi', 'e', 'true', 'false']);
+const EXPR_KEYWORDS = new Set(['and', 'or', 'not']); // Word forms of && || !
+const DIMENSIONLESS = [0, 0, 0, 0, 0];
+const UNIT_DIMENSIONS = {};
+const ANGLE = [0, 1, 0, 0, 0];
+
+function loadUnitTable(table) {
+    Object.keys(UNIT_DIMENSIONS).forEach(name => delete UNIT_DIMENSIONS[name]);
+    Object.assign(UNIT_DIMENSIONS, table);
+}
+const DIMENSION_NAMES = {
+    '0,0,0,0,0': 'no unit', '1,0,0,0,0': 'length', '0,1,0,0,0': 'angle', '0,0,1,0,0': 'mass', '0,0,0,1,0': 'time',
+    '0,0,0,0,1': 'temperature', '1,0,1,-2,0': 'force', '-1,0,1,-2,0': 'pressure', '2,0,0,0,0': 'area', '3,0,0,0,0': 'volume'
+};
+const BASE_NAMES = ['length', 'angle', 'mass', 'time', 'temperature'];
+const ARGUMENT_COUNTS = { if: 3, pow: 2, random: 0 };
+const EXPR_TOKEN = /\s*(?:((?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)|([A-Za-z_][A-Za-z0-9_]*)|('[^']*'|"[^"]*")|(==|!=|<=|>=|&&|\|\||[-+*/^%(),;<>!]))/y;
+
+function dimensionName(dim) {
+    if (DIMENSION_NAMES[dim.join(',')]) return DIMENSION_NAMES[dim.join(',')];
+    const text = parts => parts.map(([n, e]) => e === 1 ? n : `${n}^${e}`).join('*');
+    const up = BASE_NAMES.map((n, i) => [n, dim[i]]).filter(([, e]) => e > 0);
+    const down = BASE_NAMES.map((n, i) => [n, -dim[i]]).filter(([, e]) => e > 0);
+    return (text(up) || '1') + (down.length ? '/' + text(down) : '');
+}
+
+function tokenizeExpression(expression) {
+    const tokens = [];
+    const text = expression.trimEnd();
+    EXPR_TOKEN.lastIndex = 0;
+    while (EXPR_TOKEN.lastIndex < text.length) {
+        const start = EXPR_TOKEN.lastIndex;
+        const m = EXPR_TOKEN.exec(text);
+        if (!m) throw new Error(`Unexpected '${text.slice(start).trim().charAt(0)}'`);
+        if (m[1] !== undefined) tokens.push(['number', m[1]]);
+        else if (m[2] !== undefined) tokens.push(['name', m[2]]);
+        else if (m[3] !== undefined) tokens.push(['string', m[3]]);
+        else tokens.push(['op', m[4]]);
+    }
+    return tokens;
+}
+
+const sameDim = (a, b) => a.every((e, i) => e === b[i]);
+const roundDim = dim => dim.map(e => Math.round(e * 1e6) / 1e6);
+
+function addDims(a, b, op) {
+    if (a === null || b === null) return null;
+    if (sameDim(a, DIMENSIONLESS)) return b;
+    if (sameDim(b, DIMENSIONLESS) || sameDim(a, b)) return a;
+    throw new Error(`Can't ${op} ${dimensionName(a)} and ${dimensionName(b)}`);
+}
+
+function combineDims(a, b, sign) {
+    if (a === null || b === null) return null;
+    return roundDim(a.map((e, i) => e + sign * b[i]));
+}
+
+function powerDim(base, exponent, exponentValue) {
+    if (exponent !== null && !sameDim(exponent, DIMENSIONLESS)) throw new Error(`Exponent has a unit (${dimensionName(exponent)})`);
+    if (base !== null && sameDim(base, DIMENSIONLESS)) return DIMENSIONLESS;
+    return base !== null && exponentValue !== null ? roundDim(base.map(e => e * exponentValue)) : null;
+}
+
+function unitDimension(unit) {
+    if (!unit) return DIMENSIONLESS;
+    try {
+        return parseExpression(tokenizeExpression(unit), {}, null);
+    } catch (e) {
+        return null;
+    }
+}
+
+// Recursive descent; each rule returns [dimension, constant value or null].
+function parseExpression(tokens, units, lookup) {
+    let pos = 0;
+    const peek = (offset = 0) => tokens[pos + offset] || [null, null];
+    const accept = (...values) => {
+        const [kind, value] = peek();
+        if ((kind === 'op' || kind === 'name') && values.includes(value)) { pos++; return value; }
+        return null;
+    };
+    const expect = value => {
+        if (accept(value)) return;
+        const found = peek()[1];
+        throw new Error(`Expected '${value}'` + (found ? ` before '${found}'` : ''));
+    };
+
+    function logical() {
+        let left = comparison();
+        while (accept('&&', '||', 'and', 'or')) {
+            comparison();
+            left = [DIMENSIONLESS, null];
+        }
+        return left;
+    }
+    function comparison() {
+        const left = additive();
+        if (accept('==', '!=', '<', '<=', '>', '>=')) {
+            addDims(left[0], additive()[0], 'compare');
+            return [DIMENSIONLESS, null];
+        }
+        return left;
+    }
+    function additive() {
+        let [dim, value] = term();
+        for (let op; (op = accept('+', '-'));) {
+            const [right, rightValue] = term();
+            dim = addDims(dim, right, op === '+' ? 'add' : 'subtract');
+            value = value === null || rightValue === null ? null : op === '+' ? value + rightValue : value - rightValue;
+        }
+        return [dim, value];
+    }
+    function term() {
+        const start = pos;
+        let [dim, value] = unary();
+        for (let op; (op = accept('*', '/', '%'));) {
+            const rightStart = pos;
+            const [right] = unary();
+            const unit = op === '/' ? fractionUnit(start, rightStart) : null;
+            // "3/8 in": Fusion reads a fraction before a unit as a number of that unit.
+            if (unit) dim = UNIT_DIMENSIONS[unit];
+            else dim = op === '%' ? addDims(dim, right, 'take the remainder of') : combineDims(dim, right, op === '*' ? 1 : -1);
+            value = null;
+        }
+        return [dim, value];
+    }
+    function fractionUnit(start, rightStart) {
+        let left = tokens.slice(start, rightStart - 1);
+        if (left.length && (left[0][1] === '-' || left[0][1] === '+')) left = left.slice(1);
+        const right = tokens.slice(rightStart, pos);
+        if (left.length === 1 && left[0][0] === 'number' && right.length === 2 && right[0][0] === 'number'
+            && right[1][1] in UNIT_DIMENSIONS) return right[1][1];
+        return null;
+    }
+    function unary() {
+        const op = accept('-', '+', '!', 'not');
+        if (!op) return power();
+        const [dim, value] = unary();
+        if (op === '!' || op === 'not') return [DIMENSIONLESS, null];
+        return [dim, value === null ? null : op === '-' ? -value : value];
+    }
+    function power() {
+        const [base, value] = primary();
+        if (!accept('^')) return [base, value];
+        const [exponent, exponentValue] = unary();
+        return [powerDim(base, exponent, exponentValue), null];
+    }
+    function primary() {
+        const [kind, value] = peek();
+        if (kind === null) throw new Error('Incomplete expression');
+        pos++;
+        if (kind === 'number') {
+            const [unitKind, unit] = peek();
+            if (unitKind === 'name' && peek(1)[1] !== '(') {
+                if (unit in UNIT_DIMENSIONS) {
+                    pos++; // "10 mm": the unit binds to the number
+                    return [UNIT_DIMENSIONS[unit], null];
+                }
+                if (!(unit in units) && !EXPR_FUNCTIONS.has(unit) && !EXPR_CONSTANTS.has(unit) && !EXPR_KEYWORDS.has(unit)) {
+                    pos++; // "5 L": a unit we don't know; let Fusion judge it
+                    return [null, null];
+                }
+            }
+            return [DIMENSIONLESS, parseFloat(value)];
+        }
+        if (kind === 'string') return [null, null];
+        if (kind === 'op' && value === '(') {
+            const result = logical();
+            expect(')');
+            return result;
+        }
+        if (kind === 'name') {
+            if (peek()[1] === '(' && EXPR_FUNCTIONS.has(value)) {
+                pos++;
+                return [callFunction(value), null];
+            }
+            return [nameDim(value), null];
+        }
+        throw new Error(`Unexpected '${value}'`);
+    }
+    function callFunction(name) {
+        const args = [];
+        if (!accept(')')) {
+            for (;;) {
+                args.push(logical());
+                if (accept(')')) break;
+                if (!accept(',', ';')) throw new Error(`Expected ',' or ')' in ${name}()`);
+            }
+        }
+        const expected = name in ARGUMENT_COUNTS ? ARGUMENT_COUNTS[name] : (name === 'max' || name === 'min') ? null : 1;
+        if ((expected === null && !args.length) || (expected !== null && args.length !== expected)) {
+            throw new Error(`${name}() takes ${expected !== null ? expected : 'at least 1'} argument${expected === 1 ? '' : 's'}`);
+        }
+        const dims = args.map(a => a[0]);
+        if (name === 'if') return addDims(dims[1], dims[2], 'mix');
+        if (name === 'max' || name === 'min') return dims.slice(1).reduce((acc, d) => addDims(acc, d, 'compare'), dims[0]);
+        if (name === 'pow') return powerDim(dims[0], dims[1], args[1][1]);
+        if (name === 'sqrt') return dims[0] === null ? null : roundDim(dims[0].map(e => e * 0.5));
+        if (['abs', 'ceil', 'floor', 'round'].includes(name)) return dims[0];
+        if (['asin', 'acos', 'atan'].includes(name)) return ANGLE;
+        return DIMENSIONLESS;
+    }
+    function nameDim(name) {
+        if (name in units) return unitDimension(units[name]);
+        if (EXPR_CONSTANTS.has(name)) return DIMENSIONLESS;
+        if (name in UNIT_DIMENSIONS) return UNIT_DIMENSIONS[name]; // "5 kg/m^3": a unit on its own
+        if (EXPR_FUNCTIONS.has(name)) throw new Error(`${name}() needs parentheses`);
+        const unit = lookup ? lookup(name) : null;
+        if (unit === null || unit === undefined) throw new Error(`Unknown name: ${name}`);
+        return unit === true ? null : unitDimension(unit);
+    }
+
+    if (!tokens.length) throw new Error('Empty expression');
+    const [dim] = logical();
+    if (pos < tokens.length) throw new Error(`Unexpected '${peek()[1]}'`);
+    return dim;
+}
+
+function checkExpression(expression, unit, units, lookup) {
+    let dim;
+    try {
+        dim = parseExpression(tokenizeExpression(String(expression)), units || {}, lookup);
+    } catch (e) {
+        return e.message;
+    }
+    const target = unitDimension(unit);
+    if (dim === null || target === null || sameDim(dim, DIMENSIONLESS) || sameDim(dim, target)) return null;
+    if (sameDim(target, DIMENSIONLESS)) return `Expected no unit, got ${dimensionName(dim)}`;
+    return `Expected ${dimensionName(target)}, got ${dimensionName(dim)}`;
+}
+
+// User parameters an expression references (strings, functions, units and constants skipped).
+function referencedParams(expression, units) {
+    const text = String(expression || '').replace(/'[^']*'|"[^"]*"/g, ' ');
+    const names = [];
+    const pattern = /[A-Za-z_][A-Za-z0-9_]*/g;
+    for (let m; (m = pattern.exec(text));) {
+        // "10 N": a unit right after a number binds to it, even if a parameter shares its name.
+        if (m[0] in UNIT_DIMENSIONS && /[\d.]\s*$/.test(text.slice(0, m.index))) continue;
+        if (m[0] in units) names.push(m[0]);
+    }
+    return names;
+}
+
+// checkExpression against the last state, plus a reference-cycle check through the current expressions.
+function checkParamEdit(name, expression) {
+    const params = (lastReceivedData && lastReceivedData.parameters) || [];
+    const units = {};
+    const current = {};
+    params.forEach(p => { units[p.name] = p.unit || ''; current[p.name] = p.expression; });
+    if (!(name in units)) return null; // Not scanned yet: leave it to Fusion
+    const error = checkExpression(expression, units[name], units, () => true);
+    if (error) return error;
+    const seen = new Set();
+    const stack = referencedParams(expression, units);
+    while (stack.length) {
+        const ref = stack.pop();
+        if (ref === name) return 'Circular reference';
+        if (seen.has(ref)) continue;
+        seen.add(ref);
+        stack.push(...referencedParams(current[ref], units));
+    }
+    return null;
+}
+
+// --- PARAMETER ERRORS ---
+
+// Rejected expressions by parameter name; applied whenever the row is rendered.
+const paramErrors = new Map();
+
+function setParamError(name, message) {
+    if (message) paramErrors.set(name, message);
+    else paramErrors.delete(name);
+    const input = document.querySelector(`input[data-param="${CSS.escape(name)}"]`);
+    if (!input) return;
+    input.classList.toggle('input-error', !!message);
+    input.title = message || '';
+}
+
+function showParamErrors(errors) {
+    errors.forEach(err => setParamError(err.name, err.expression ? `${err.expression}: ${err.error}` : err.error));
+}
+
 // --- LOGIC ---
 function updateParam(name, value) {
+    const error = checkParamEdit(name, value);
+    setParamError(name, error ? `${value}: ${error}` : null);
+    if (error) return; // Fusion would reject it: nothing is sent and the model isn't dirty
     sendToFusion('update_param', { name: name, value: value });
     if (lastReceivedData && lastReceivedData.parameters) {
         const param = lastReceivedData.parameters.find(p => p.name === name);
@@ -270,7 +1171,10 @@ function toggleFeature(name, isChecked) {
     sendToFusion('toggle_feature', { name: name, is_suppressed: shouldSuppress });
 }
 function handleEnter(e, input) {
-    if (e.key === 'Enter') input.blur(); 
+    if (e.key === 'Enter') {
+        input.blur(); // fires onchange -> update_param
+        sendToFusion('apply_params');
+    }
 }
 function saveSnapshot() {
     const nameInput = document.getElementById('newConfigName');
@@ -0,0 +1,173 @@
+# scheduler.py
+# Work queue for the add-in, drained from one Fusion custom event so HTML and
+# document event handlers return at once and Fusion handles its own events
+# (and newer palette clicks) between work items.
+#
+# A job is a callable. If it returns a generator, the generator runs one step
+# per event; each step yields (done, total, message) for progress reports and
+# the job can be cancelled between steps. Jobs submitted with the same key
+# supersede each other: a queued one is dropped and a running one is cancelled
+# at its next step. Everything runs on Fusion's main thread; timers only fire
+# the custom event.
+
+import adsk.core
+import inspect
+import itertools
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+from . import diagnostics
+
+EVENT_ID = 'EdJ_Config_Scheduler'
+
+_app = None
+_report = None
+_handlers = []
+_timers = []
+_ids = itertools.count(1)
+
+# Waiting jobs by id, in submission order.
+_queue = OrderedDict()
+
+# The job whose generator is part-way through, if any.
+_running = None
+
+class _SchedulerEventHandler(adsk.core.CustomEventHandler):
+    def __init__(self):
+        super().__init__()
+    def notify(self, args):
+        try:
+            run_next()
+        except:
+            if _report:
+                _report({"id": None, "label": "scheduler", "state": "error", "error": traceback.format_exc()})
+
+def start(app, report=None):
+    """Registers the custom event. `report(status)` receives every job status change."""
+    global _app, _report
+    _app = app
+    _report = report
+    event = app.registerCustomEvent(EVENT_ID)
+    handler = _SchedulerEventHandler()
+    event.add(handler)
+    _handlers.append(handler)
+
+def stop():
+    """Drops all work and unregisters the custom event."""
+    global _running
+    for timer in _timers:
+        timer.cancel()
+    _timers.clear()
+    _queue.clear()
+    if _running:
+        try:
+            _running["gen"].close()
+        except:
+            pass
+        _running = None
+    if _app:
+        _app.unregisterCustomEvent(EVENT_ID)
+    _handlers.clear()
+
+def _status(job, state, **extra):
+    if _report and (not job["quiet"] or state == "error"):
+        status = {"id": job["id"], "label": job["label"], "state": state}
+        status.update(extra)
+        _report(status)
+
+def _fire(delay=0):
+    if delay > 0:
+        _timers[:] = [timer for timer in _timers if timer.is_alive()]
+        timer = threading.Timer(delay, _app.fireCustomEvent, (EVENT_ID,))
+        timer.daemon = True
+        timer.start()
+        _timers.append(timer)
+    else:
+        _app.fireCustomEvent(EVENT_ID)
+
+def submit(label, work, key=None, delay=0, quiet=False):
+    """Queues `work` and returns the job id.
+
+    A queued job with the same `key` is dropped and a running one is cancelled.
+    With `delay` the job waits at least that many seconds, so resubmitting
+    under the same key debounces it. Quiet jobs only report errors.
+    """
+    job = {"id": next(_ids), "label": label, "work": work, "key": key, "quiet": quiet,
+           "due": time.monotonic() + delay, "cancel": False}
+    if key is not None:
+        for old in [j for j in _queue.values() if j["key"] == key]:
+            del _queue[old["id"]]
+            _status(old, "superseded", by=job["id"])
+        if _running and _running["key"] == key:
+            _running["cancel"] = True
+    _queue[job["id"]] = job
+    _status(job, "queued")
+    _fire(delay)
+    return job["id"]
+
+def cancel(job_id=None, key=None):
+    """Cancels queued or running jobs by id or key. Returns True if any was found."""
+    found = False
+    for job in [j for j in _queue.values() if j["id"] == job_id or (key is not None and j["key"] == key)]:
+        del _queue[job["id"]]
+        _status(job, "cancelled")
+        found = True
+    if _running and (_running["id"] == job_id or (key is not None and _running["key"] == key)):
+        _running["cancel"] = True
+        _fire()
+        found = True
+    return found
+
+def is_idle():
+    return _running is None and not _queue
+
+def _step(job):
+    """Advances a generator job by one step."""
+    global _running
+    try:
+        with diagnostics.action(job["label"]):
+            done, total, message = next(job["gen"])
+        _status(job, "progress", done=done, total=total, message=message)
+    except StopIteration as finished:
+        _running = None
+        _status(job, "done", result=finished.value)
+    except Exception as e:
+        _running = None
+        _status(job, "error", error=str(e))
+
+def run_next():
+    """Runs one unit of work: the next step of the running job, else the next due job."""
+    global _running
+    if _running:
+        job = _running
+        if job["cancel"]:
+            _running = None
+            job["gen"].close()
+            _status(job, "cancelled")
+        else:
+            _step(job)
+    else:
+        now = time.monotonic()
+        job = next((j for j in _queue.values() if j["due"] <= now), None)
+        if job is None: return
+        del _queue[job["id"]]
+        _status(job, "running")
+        try:
+            with diagnostics.action(job["label"]):
+                result = job["work"]()
+        except Exception as e:
+            _status(job, "error", error=str(e))
+        else:
+            if inspect.isgenerator(result):
+                job["gen"] = result
+                _running = job
+                _step(job)
+            else:
+                _status(job, "done", result=result)
+
+    # Keep draining while something is runnable; delayed jobs have their own timer.
+    now = time.monotonic()
+    if _running or any(j["due"] <= now for j in _queue.values()):
+        _fire()
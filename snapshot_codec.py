@@ -0,0 +1,128 @@
+# snapshot_codec.py
+# Compact, delta-encoded storage format for configuration snapshots.
+#
+# Snapshots are stored as deltas against a shared base state. Parameter and
+# feature names are interned once in the base's key tables and snapshots refer
+# to them by index. Large payloads are zlib-compressed and base64-encoded.
+#
+#   base:     {"v": 3, "params": [names], "param_values": [expr | None],
+#              "features": [names], "feature_values": [0 | 1 | None]}
+#   snapshot: {"v": 3, "n": [param_keys, feature_keys], "p": [[i, expr], ...],
+#              "f": [[i, 0|1], ...], "xp": [i, ...], "xf": [i, ...]}
+#
+# "p"/"f" hold values that differ from the base, "xp"/"xf" hold base keys the
+# snapshot doesn't contain. Key tables only ever grow: a new key is appended
+# with the value of the snapshot that introduced it, and "n" records the table
+# lengths a snapshot was encoded against so keys added later decode as absent.
+# Plain {"params": ..., "features": ...} bodies (format 2) decode unchanged.
+
+import base64
+import json
+import zlib
+from collections import Counter
+
+FORMAT_VERSION = 3
+COMPRESS_THRESHOLD = 256
+COMPRESSED_PREFIX = "z:"
+
+def empty_base():
+    return {"v": FORMAT_VERSION, "params": [], "param_values": [], "features": [], "feature_values": []}
+
+def build_base(bodies):
+    """Builds a base whose values are the most common value of each key across `bodies`."""
+    param_counts = {}
+    feature_counts = {}
+    for body in bodies:
+        for name, expr in body.get("params", {}).items():
+            param_counts.setdefault(name, Counter())[expr] += 1
+        for name, is_suppressed in body.get("features", {}).items():
+            feature_counts.setdefault(name, Counter())[int(bool(is_suppressed))] += 1
+
+    base = empty_base()
+    for name, counts in param_counts.items():
+        base["params"].append(name)
+        base["param_values"].append(counts.most_common(1)[0][0])
+    for name, counts in feature_counts.items():
+        base["features"].append(name)
+        base["feature_values"].append(counts.most_common(1)[0][0])
+    return base
+
+def pack(obj, compress=True):
+    """Serialises `obj` to compact JSON, compressing it when that is smaller."""
+    raw = json.dumps(obj, separators=(",", ":"))
+    if compress and len(raw) >= COMPRESS_THRESHOLD:
+        packed = COMPRESSED_PREFIX + base64.b64encode(zlib.compress(raw.encode("utf-8"), 9)).decode("ascii")
+        if len(packed) < len(raw):
+            return packed
+    return raw
+
+def unpack(raw):
+    if raw.startswith(COMPRESSED_PREFIX):
+        raw = zlib.decompress(base64.b64decode(raw[len(COMPRESSED_PREFIX):])).decode("utf-8")
+    return json.loads(raw)
+
+def _encode_section(values, names, base_values, base_index, encode_value):
+    """Returns (overrides, excluded, base_changed) for one key table."""
+    overrides = []
+    changed = False
+    seen = set()
+    for name, value in values.items():
+        value = encode_value(value)
+        i = base_index.get(name)
+        if i is None:
+            # Intern the new key with this snapshot's value as its base value.
+            i = len(names)
+            names.append(name)
+            base_values.append(value)
+            base_index[name] = i
+            changed = True
+        seen.add(i)
+        if base_values[i] != value:
+            overrides.append([i, value])
+    excluded = [i for i, v in enumerate(base_values) if v is not None and i not in seen]
+    return overrides, excluded, changed
+
+def encode_snapshot(body, base, compress=True):
+    """Encodes `body` against `base`, interning new keys into `base` in place.
+
+    Returns (raw, base_changed); when base_changed is True the caller must
+    persist the base before (or together with) the snapshot.
+    """
+    param_index = {name: i for i, name in enumerate(base["params"])}
+    feature_index = {name: i for i, name in enumerate(base["features"])}
+
+    p, xp, params_changed = _encode_section(
+        body.get("params", {}), base["params"], base["param_values"], param_index, str)
+    f, xf, features_changed = _encode_section(
+        body.get("features", {}), base["features"], base["feature_values"], feature_index,
+        lambda v: int(bool(v)))
+
+    delta = {"v": FORMAT_VERSION, "n": [len(base["params"]), len(base["features"])]}
+    if p: delta["p"] = p
+    if f: delta["f"] = f
+    if xp: delta["xp"] = xp
+    if xf: delta["xf"] = xf
+    return pack(delta, compress), params_changed or features_changed
+
+def _decode_section(names, base_values, key_count, overrides, excluded, decode_value):
+    values = base_values[:key_count]
+    names = names[:key_count]
+    for i in excluded:
+        values[i] = None
+    for i, value in overrides:
+        values[i] = value
+    return {name: decode_value(v) for name, v in zip(names, values) if v is not None}
+
+def decode_snapshot(raw, base):
+    """Decodes a stored snapshot back to {"params": {...}, "features": {...}}."""
+    delta = unpack(raw)
+    if delta.get("v") != FORMAT_VERSION:
+        return delta  # Format 2: plain body
+
+    param_count, feature_count = delta.get("n", [len(base["params"]), len(base["features"])])
+    return {
+        "params": _decode_section(base["params"], base["param_values"], param_count,
+                                  delta.get("p", []), delta.get("xp", []), str),
+        "features": _decode_section(base["features"], base["feature_values"], feature_count,
+                                    delta.get("f", []), delta.get("xf", []), bool)
+    }
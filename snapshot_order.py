@@ -0,0 +1,92 @@
+# snapshot_order.py
+# Orders a set of model states so that applying them one after another changes
+# as little as possible between consecutive states. Pure Python: no adsk imports.
+#
+# A state is {"params": {name: expr}, "features": {name: is_suppressed}}.
+# Weights are {("p", name): cost, ("f", name): cost}; unweighted keys cost 1.
+# The cost of moving between two states is the summed weight of the keys whose
+# values differ (a key only one of them covers counts as differing).
+
+MAX_IMPROVEMENT_PASSES = 20
+
+def _varying_keys(states):
+    """Keys whose value isn't the same in every state; only these can cost anything."""
+    first = {}
+    varying = set()
+    for i, state in enumerate(states):
+        for kind, section in (("p", "params"), ("f", "features")):
+            values = state.get(section, {})
+            for name, value in values.items():
+                key = (kind, name)
+                if key not in first:
+                    first[key] = value
+                    if i > 0: varying.add(key)
+                elif first[key] != value:
+                    varying.add(key)
+            if i > 0:
+                varying.update(key for key in first if key[0] == kind and key[1] not in values)
+    return sorted(varying)
+
+def _vector(state, keys):
+    sections = {"p": state.get("params", {}), "f": state.get("features", {})}
+    return tuple(sections[kind].get(name) for kind, name in keys)
+
+def _cost_matrix(states, weights):
+    keys = _varying_keys(states)
+    key_weights = [weights.get(key, 1.0) for key in keys]
+    vectors = [_vector(state, keys) for state in states]
+    n = len(states)
+    cost = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            a, b = vectors[i], vectors[j]
+            cost[i][j] = cost[j][i] = sum(w for w, x, y in zip(key_weights, a, b) if x != y)
+    return cost
+
+def path_cost(states, order, weights=None, start=None):
+    """Total change cost of applying `states` in `order`, beginning at `start` (if given)."""
+    nodes = ([start] if start is not None else []) + [states[i] for i in order]
+    cost = _cost_matrix(nodes, weights or {})
+    return float(sum(cost[i][i + 1] for i in range(len(nodes) - 1)))
+
+def plan_order(states, weights=None, start=None):
+    """Returns (order, cost): indices into `states` and the total change cost.
+
+    Builds a nearest-neighbour path from `start` (the current model state; any
+    state may come first when it is None) and improves it with 2-opt moves.
+    """
+    n = len(states)
+    if n < 2: return list(range(n)), (path_cost(states, range(n), weights, start) if n else 0.0)
+
+    # Node 0 is the start state; without one it is a free node that costs nothing to leave.
+    cost = _cost_matrix([start or {}] + list(states), weights or {})
+    if start is None:
+        for i in range(n + 1):
+            cost[0][i] = cost[i][0] = 0.0
+
+    path = [0]
+    remaining = set(range(1, n + 1))
+    while remaining:
+        last = path[-1]
+        nearest = min(remaining, key=lambda j: (cost[last][j], j))
+        path.append(nearest)
+        remaining.remove(nearest)
+
+    # 2-opt on an open path with a fixed first node: reverse path[i..j].
+    for _ in range(MAX_IMPROVEMENT_PASSES):
+        improved = False
+        for i in range(1, n):
+            for j in range(i + 1, n + 1):
+                before = cost[path[i - 1]][path[i]]
+                after = cost[path[i - 1]][path[j]]
+                if j < n:
+                    before += cost[path[j]][path[j + 1]]
+                    after += cost[path[i]][path[j + 1]]
+                if after < before - 1e-9:
+                    path[i:j + 1] = reversed(path[i:j + 1])
+                    improved = True
+        if not improved:
+            break
+
+    total = sum(cost[path[k]][path[k + 1]] for k in range(n))
+    return [node - 1 for node in path[1:]], total
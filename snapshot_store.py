@@ -0,0 +1,137 @@
+# snapshot_store.py
+# In-memory snapshot model, kept once per design by config_logic. Pure Python:
+# no adsk imports; config_logic's storage adapter loads snapshots into it from
+# attributes and flushes the ones marked dirty back.
+#
+# Parameter and feature names are interned once in two key tables shared by
+# every snapshot. A snapshot holds a list of parameter expressions and a
+# bytearray of feature states, both indexed by those tables. A None
+# expression, an ABSENT feature byte or an index past the end of a snapshot's
+# arrays means the snapshot doesn't cover that key. Expressions are interned
+# as well, so a value many snapshots share is stored once.
+
+import sys
+
+ABSENT = 2  # Feature byte for a key the snapshot doesn't cover; 0 = active, 1 = suppressed
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+class KeyTable:
+    """Names and their indexes; only ever grows, so indexes stay valid."""
+    __slots__ = ("names", "index")
+
+    def __init__(self):
+        self.names = []
+        self.index = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        i = self.index.get(name)
+        if i is None:
+            i = self.index[name] = len(self.names)
+            self.names.append(_intern(name))
+        return i
+
+    def layout(self, names):
+        """Indexes of `names` (a list), interning new ones; None if they are the table's first keys, in order.
+
+        Snapshots of one design nearly always list their keys in the same
+        order, so the common case costs one list comparison.
+        """
+        if self.names[:len(names)] != names:
+            indexes = [self.intern(name) for name in names]
+            if self.names[:len(names)] != names:
+                return indexes
+        return None
+
+class Snapshot:
+    __slots__ = ("params", "features", "sparse")
+
+    def __init__(self, params, features, sparse):
+        self.params = params
+        self.features = features
+        self.sparse = sparse  # params may hold None: body() has to filter them out
+
+class SnapshotStore:
+    """A design's snapshots by name, plus which of them changed since the last flush.
+
+    Snapshots may be loaded lazily: a name the store doesn't hold isn't
+    necessarily missing from storage. `meta` belongs to the storage layer
+    (config_logic keeps the manifest and the raw text it was parsed from there).
+    """
+    __slots__ = ("param_keys", "feature_keys", "snapshots", "dirty", "removed", "meta")
+
+    def __init__(self, meta=None):
+        self.param_keys = KeyTable()
+        self.feature_keys = KeyTable()
+        self.snapshots = {}
+        self.dirty = {}  # Names to write, in the order they changed
+        self.removed = set()
+        self.meta = meta if meta is not None else {}
+
+    def __contains__(self, name):
+        return name in self.snapshots
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    def _pack(self, body):
+        params = body.get("params", {})
+        features = body.get("features", {})
+        try:
+            param_values = list(map(sys.intern, params.values()))
+            sparse = False
+        except TypeError:  # Not all text (a None expression, say)
+            param_values = [_intern(expr) for expr in params.values()]
+            sparse = True
+        layout = self.param_keys.layout(list(params))
+        if layout is not None:
+            sparse = True
+            values, param_values = param_values, [None] * len(self.param_keys)
+            for i, expr in zip(layout, values):
+                param_values[i] = expr
+
+        feature_values = bytearray(ABSENT if s is None else 1 if s else 0 for s in features.values())
+        layout = self.feature_keys.layout(list(features))
+        if layout is not None:
+            values, feature_values = feature_values, bytearray([ABSENT]) * len(self.feature_keys)
+            for i, state in zip(layout, values):
+                feature_values[i] = state
+        return Snapshot(param_values, feature_values, sparse)
+
+    def put(self, name, body, dirty=True):
+        """Stores {"params": {name: expr}, "features": {name: is_suppressed}} under `name`."""
+        self.snapshots[name] = self._pack(body)
+        self.removed.discard(name)
+        if dirty:
+            self.dirty[name] = True
+
+    def remove(self, name):
+        """Drops `name`, loaded or not, and records it for the next flush."""
+        self.snapshots.pop(name, None)
+        self.dirty.pop(name, None)
+        self.removed.add(name)
+
+    def body(self, name):
+        """Returns the snapshot as a new {"params", "features"} dict, or None if it isn't loaded."""
+        snapshot = self.snapshots.get(name)
+        if snapshot is None: return None
+        if snapshot.sparse:
+            params = {name: expr for name, expr in zip(self.param_keys.names, snapshot.params) if expr is not None}
+        else:
+            params = dict(zip(self.param_keys.names, snapshot.params))
+        states = snapshot.features
+        if ABSENT in states:
+            features = {name: bool(state) for name, state in zip(self.feature_keys.names, states) if state != ABSENT}
+        else:
+            features = dict(zip(self.feature_keys.names, map(bool, states)))
+        return {"params": params, "features": features}
+
+    def take_dirty(self):
+        """Returns ([names to write], {names to delete}) and starts a new change set."""
+        dirty, removed = list(self.dirty), self.removed
+        self.dirty, self.removed = {}, set()
+        return dirty, removed
@@ -0,0 +1,379 @@
+# sweep.py
+# Batch configuration sweeps: apply a list of variants one after another,
+# measure each one and stream the results to a CSV or JSONL file. The results
+# file doubles as the checkpoint, so an interrupted sweep resumes where it
+# stopped.
+
+import adsk.core, adsk.fusion
+import csv
+import itertools
+import json
+import os
+
+from . import config_logic
+from . import diagnostics
+
+# --- VARIANTS ---
+# A variant is {"id", "label", "params": {name: expr}, "features": {name: is_suppressed}}.
+# The id is the variant's state fingerprint, so it stays the same when a grid
+# is reordered or extended and a resumed sweep still recognises finished rows.
+
+FEATURE_VALUES = {
+    "on": [False], "active": [False], "unsuppressed": [False], "true": [False],
+    "off": [True], "suppressed": [True], "false": [True],
+    "both": [False, True], "*": [False, True]
+}
+
+def _variant(label, params, features):
+    return {
+        "id": config_logic.state_fingerprint(params, features)[:12],
+        "label": label,
+        "params": params,
+        "features": features
+    }
+
+def _split_values(text):
+    """Splits "10 mm, max(1 mm, 2 mm)" on top-level commas."""
+    values, depth, current = [], 0, ""
+    for char in text:
+        if char == "," and depth == 0:
+            values.append(current.strip())
+            current = ""
+            continue
+        if char == "(": depth += 1
+        elif char == ")": depth -= 1
+        current += char
+    values.append(current.strip())
+    return [value for value in values if value]
+
+def parse_grid(text):
+    """Parses one "name = value, value, ..." line per axis into (params, features).
+
+    CFG_ names (also "Component/CFG_Name") are features and take on/off (or
+    both); everything else is a parameter expression. Raises ValueError naming the offending line.
+    """
+    params, features = {}, {}
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"): continue
+        name, sep, values = line.partition("=")
+        name = name.strip()
+        values = _split_values(values)
+        if not sep or not name or not values:
+            raise ValueError("Line {}: expected 'name = value, value, ...'".format(number))
+        if config_logic.is_feature_key(name):
+            states = []
+            for value in values:
+                if value.lower() not in FEATURE_VALUES:
+                    raise ValueError("Line {}: '{}' is not on/off/both".format(number, value))
+                states += [s for s in FEATURE_VALUES[value.lower()] if s not in states]
+            features[name] = states
+        else:
+            params[name] = values
+    return params, features
+
+def grid_variants(params=None, features=None):
+    """Yields one variant per combination of {param: [exprs]} and {feature: [is_suppressed]}."""
+    params = params or {}
+    features = features or {}
+    axes = [("p", name, values) for name, values in params.items()]
+    axes += [("f", name, values) for name, values in features.items()]
+    for combo in itertools.product(*[values for _, _, values in axes]):
+        variant_params, variant_features, label = {}, {}, []
+        for (kind, name, _), value in zip(axes, combo):
+            if kind == "p":
+                variant_params[name] = value
+                label.append("{}={}".format(name, value))
+            else:
+                variant_features[name] = value
+                label.append("{}={}".format(name, "off" if value else "on"))
+        yield _variant(", ".join(label), variant_params, variant_features)
+
+def snapshot_variants(root, names=None):
+    """Yields one variant per saved snapshot (all of them when `names` is None).
+
+    Snapshots come in config_logic.plan_snapshot_order's order so consecutive
+    variants differ as little as possible.
+    """
+    manifest = config_logic.load_manifest(root)
+    for name in config_logic.plan_snapshot_order(names)["order"]:
+        body = config_logic.load_snapshot_body(root, name, manifest)
+        if body is not None:
+            yield _variant(name, body.get("params", {}), body.get("features", {}))
+
+# --- METRICS & EXPORTS ---
+
+# metric name: result columns it adds
+METRICS = {
+    "mass": ["mass_kg"],
+    "volume": ["volume_cm3"],
+    "area": ["area_cm2"],
+    "center_of_mass": ["com_x_cm", "com_y_cm", "com_z_cm"],
+    "bbox": ["bbox_x_cm", "bbox_y_cm", "bbox_z_cm"]
+}
+PHYSICAL_METRICS = {"mass", "volume", "area", "center_of_mass"}
+
+EXPORT_FORMATS = {"step": ".step", "stl": ".stl", "f3d": ".f3d"}
+
+def measure(design, metrics):
+    """Returns {column: value} for the selected metrics of the root component."""
+    root = design.rootComponent
+    values = {}
+    if PHYSICAL_METRICS.intersection(metrics):
+        props = root.getPhysicalProperties(adsk.fusion.CalculationAccuracy.LowCalculationAccuracy)
+        if "mass" in metrics: values["mass_kg"] = props.mass
+        if "volume" in metrics: values["volume_cm3"] = props.volume
+        if "area" in metrics: values["area_cm2"] = props.area
+        if "center_of_mass" in metrics:
+            com = props.centerOfMass
+            values.update({"com_x_cm": com.x, "com_y_cm": com.y, "com_z_cm": com.z})
+    if "bbox" in metrics:
+        box = root.boundingBox
+        values.update({
+            "bbox_x_cm": box.maxPoint.x - box.minPoint.x,
+            "bbox_y_cm": box.maxPoint.y - box.minPoint.y,
+            "bbox_z_cm": box.maxPoint.z - box.minPoint.z
+        })
+    return values
+
+def export_variant(design, variant, export_dir, formats):
+    """Exports the current model once per format; returns the written file names."""
+    manager = design.exportManager
+    written = []
+    for fmt in formats:
+        path = os.path.join(export_dir, variant["id"] + EXPORT_FORMATS[fmt])
+        if fmt == "step":
+            options = manager.createSTEPExportOptions(path)
+        elif fmt == "stl":
+            options = manager.createSTLExportOptions(design.rootComponent, path)
+        else:
+            options = manager.createFusionArchiveExportOptions(path)
+        if manager.execute(options):
+            written.append(os.path.basename(path))
+    return written
+
+def _apply_problems(report):
+    """Names apply_state couldn't write, or [] when the state was applied in full."""
+    return report["cycles"] or report["failed"] or list(report["invalid"]) or report["missing"]
+
+def _metric_columns(metrics):
+    return [column for metric in metrics for column in METRICS[metric]]
+
+# --- RESULTS FILE ---
+
+def _is_csv(path):
+    return path.lower().endswith(".csv")
+
+def result_columns(variants, metrics, formats):
+    """Column order for a CSV results file."""
+    params, features = [], []
+    for variant in variants:
+        params += [name for name in variant["params"] if name not in params]
+        features += [name for name in variant["features"] if name not in features]
+    columns = ["id", "label", "status", "error"] + params + features
+    for metric in metrics:
+        columns += METRICS[metric]
+    if formats:
+        columns.append("exports")
+    return columns
+
+def read_checkpoint(path):
+    """Ids of the variants already measured successfully in a results file.
+
+    Failed variants don't count, so a resumed sweep runs them again and
+    appends a new row for each; the last row for a variant is its result.
+    """
+    if not os.path.exists(path): return set()
+    done = set()
+    with open(path, newline="", encoding="utf-8") as f:
+        if _is_csv(path):
+            for row in csv.DictReader(f):
+                # A row cut short by a crash has no status: run it again.
+                if row.get("id") and row.get("status") == "ok":
+                    done.add(row["id"])
+        else:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                    if row.get("status") == "ok":
+                        done.add(row["id"])
+                except:
+                    pass
+    return done
+
+def _open_results(path, columns, resume):
+    """Opens the results file for appending and returns a write_row(dict) function plus the file."""
+    exists = resume and os.path.exists(path) and os.path.getsize(path) > 0
+    if exists:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) not in (b"\n", b"\r")
+        if _is_csv(path):
+            with open(path, newline="", encoding="utf-8") as f:
+                header = next(csv.reader(f), [])
+            if header != columns:
+                raise ValueError("{} was written by a different sweep; choose a new results file.".format(os.path.basename(path)))
+    f = open(path, "a" if exists else "w", newline="", encoding="utf-8")
+    if exists and needs_newline:
+        f.write("\n")  # Finish the line a crash cut short
+
+    if _is_csv(path):
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        if not exists: writer.writeheader()
+        write = writer.writerow
+    else:
+        write = lambda row: f.write(json.dumps(row) + "\n")
+
+    def write_row(row):
+        write(row)
+        f.flush()
+    return write_row, f
+
+# --- RUNNER ---
+
+def run_sweep(variants, out_path, metrics=("mass", "bbox"), export_dir=None, export_formats=(),
+              resume=True, restore=True, progress=None):
+    """Applies each variant, measures it and appends one result row per variant to `out_path`.
+
+    `out_path` ending in .csv writes CSV, anything else JSONL. With resume=True
+    variants already measured in the file are skipped (failed ones run again,
+    see read_checkpoint). `progress(done, total, label)`
+    is called before each variant and may return False to stop the sweep.
+    With restore=True the model is put back the way it was afterwards.
+    Variants measured before (see config_logic's metrics cache) aren't
+    applied again unless files are exported.
+    Returns {"total", "ran", "skipped", "failed", "cached", "cancelled", "path"}.
+    """
+    summary = {}
+    steps = iter_sweep(variants, out_path, metrics, export_dir, export_formats, resume, restore, summary)
+    for done, total, label in steps:
+        if progress and progress(done, total, label) is False:
+            summary["cancelled"] = True
+            steps.close()
+            break
+    return summary
+
+def iter_sweep(variants, out_path, metrics=("mass", "bbox"), export_dir=None, export_formats=(),
+               resume=True, restore=True, summary=None):
+    """Step-by-step run_sweep: yields (done, total, label) before each variant it runs.
+
+    Returns the summary when exhausted. `summary`, if given, is filled in as
+    the sweep goes, so it stays meaningful when the generator is closed early
+    (which also closes the results file and restores the model).
+    """
+    app = adsk.core.Application.get()
+    design = adsk.fusion.Design.cast(app.activeProduct)
+    variants = list(variants)
+    metrics = [m for m in metrics if m in METRICS]
+    export_formats = [fmt for fmt in export_formats if fmt in EXPORT_FORMATS]
+    if export_formats:
+        export_dir = export_dir or os.path.splitext(out_path)[0] + "_exports"
+        os.makedirs(export_dir, exist_ok=True)
+
+    summary = summary if summary is not None else {}
+    summary.update({"total": len(variants), "ran": 0, "skipped": 0, "failed": 0, "cached": 0,
+                    "cancelled": False, "path": out_path})
+    done = read_checkpoint(out_path) if resume else set()
+    write_row, f = _open_results(out_path, result_columns(variants, metrics, export_formats), resume)
+
+    # Track the model state as variants are applied, so each one's full state
+    # (the metrics cache key) is known without reading the model back.
+    signature = config_logic.timeline_signature(design)
+    original = state = config_logic.capture_state(design)
+    columns = _metric_columns(metrics)
+    try:
+        for i, variant in enumerate(variants):
+            if variant["id"] in done:
+                summary["skipped"] += 1
+                continue
+            yield i, len(variants), variant["label"]
+
+            row = {"id": variant["id"], "label": variant["label"], "status": "ok", "error": ""}
+            row.update(variant["params"])
+            row.update({name: "off" if value else "on" for name, value in variant["features"].items()})
+            target = config_logic.overlay_state(state, variant)
+            cached = None
+            if not export_formats and variant["params"].keys() <= state["params"].keys() \
+                    and variant["features"].keys() <= state["features"].keys():
+                cached = config_logic.cached_metrics(design, target, signature)
+            try:
+                if cached and all(column in cached for column in columns):
+                    # Measured before in this exact state: no need to apply it.
+                    row.update({column: cached[column] for column in columns})
+                    summary["cached"] += 1
+                else:
+                    with diagnostics.phase("sweep variant"):
+                        report = config_logic.apply_state(design, variant)
+                    problems = _apply_problems(report)
+                    if problems:
+                        row["status"] = "failed"
+                        row["error"] = "Could not apply: " + ", ".join(problems)
+                        state = config_logic.capture_state(design)
+                    else:
+                        state = target
+                        values = measure(design, metrics)
+                        config_logic.remember_metrics(design, values, state, signature, save=False)
+                        row.update(values)
+                        if export_formats:
+                            row["exports"] = ";".join(export_variant(design, variant, export_dir, export_formats))
+            except Exception as e:
+                row["status"] = "failed"
+                row["error"] = str(e)
+                state = config_logic.capture_state(design)
+
+            if row["status"] != "ok": summary["failed"] += 1
+            summary["ran"] += 1
+            done.add(variant["id"])
+            write_row(row)
+    finally:
+        f.close()
+        config_logic.save_metrics(design)
+        if restore:
+            config_logic.apply_state(design, original)
+    return summary
+
+def iter_measure_snapshots(names=None, metrics=tuple(METRICS), restore=True, summary=None):
+    """Measures the snapshots (all when `names` is None) whose metrics aren't cached yet.
+
+    Each snapshot is applied to the model's current state, the same state the
+    palette shows cached metrics against, in change-minimizing order. Yields
+    (done, total, name) before each apply and stores the results in the
+    metrics cache. Returns {"total", "measured", "cached", "failed"}; like
+    iter_sweep it also fills in `summary` as it goes.
+    """
+    app = adsk.core.Application.get()
+    design = adsk.fusion.Design.cast(app.activeProduct)
+    root = design.rootComponent
+    manifest = config_logic.load_manifest(root)
+    if names is None: names = list(manifest["configs"])
+    metrics = [m for m in metrics if m in METRICS]
+    columns = _metric_columns(metrics)
+
+    signature = config_logic.timeline_signature(design)
+    original = config_logic.capture_state(design)
+    known = config_logic.snapshot_metrics(root, manifest, original,
+                                          config_logic.load_metrics(design, signature)["entries"])
+    todo = [name for name in names if not all(column in known.get(name, {}) for column in columns)]
+    if todo:
+        todo = config_logic.plan_snapshot_order(todo)["order"]
+
+    summary = summary if summary is not None else {}
+    summary.update({"total": len(names), "measured": 0, "cached": len(names) - len(todo), "failed": []})
+    try:
+        for i, name in enumerate(todo):
+            yield i, len(todo), name
+            body = config_logic.load_snapshot_body(root, name, manifest)
+            if body is None: continue
+            target = config_logic.overlay_state(original, body)
+            with diagnostics.phase("measure snapshot"):
+                report = config_logic.apply_state(design, target)
+            if _apply_problems(report):
+                summary["failed"].append(name)
+                continue
+            config_logic.remember_metrics(design, measure(design, metrics), target, signature, save=False)
+            summary["measured"] += 1
+    finally:
+        config_logic.save_metrics(design)
+        if restore:
+            config_logic.apply_state(design, original)
+    return summary
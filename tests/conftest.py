@@ -0,0 +1,26 @@
+# conftest.py
+# The add-in's modules are loaded as the package "liveconfig" (as in the
+# benchmarks), on top of the simulated adsk API in benchmarks/fake_adsk.
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks", "fake_adsk"))
+
+import adsk.fusion
+from bench_config_logic import load_addin_module, reset_module_state
+
+@pytest.fixture
+def config_logic():
+    module = load_addin_module("config_logic")
+    reset_module_state(module)
+    return module
+
+@pytest.fixture
+def design(config_logic):
+    """A fresh simulated design: 5 mm parameters param_0..4, CFG_Feature_0..1 and CFG_Group_0."""
+    return adsk.fusion.build_design(params=5, cfg_features=2, groups=1, cfg_groups=1)
@@ -0,0 +1,45 @@
+# test_config_matrix.py
+
+from bench_config_logic import load_addin_module
+
+config_matrix = load_addin_module("config_matrix")
+snapshot_store = load_addin_module("snapshot_store")
+
+UNITS = {"width": "mm", "height": "mm"}
+BODIES = {
+    "Small": {"params": {"width": "40 mm", "height": "10 mm"}, "features": {"CFG_Handle": True}},
+    "Large": {"params": {"width": "9 cm", "height": "10 mm"}, "features": {"CFG_Handle": False}},
+    "Same": {"params": {"width": "4 cm", "height": "10 mm"}, "features": {"CFG_Handle": True}},
+    "Derived": {"params": {"width": "height * 6"}, "features": {}},
+}
+
+def _matrix(current=None):
+    store = snapshot_store.SnapshotStore()
+    for name, body in BODIES.items():
+        store.put(name, body, dirty=False)
+    return config_matrix.build(store, list(BODIES), UNITS, current)
+
+def test_values_are_in_the_parameter_unit():
+    assert _matrix().values["width"] == [40.0, 90.0, 40.0, None]  # "Derived" doesn't set height
+    matrix = _matrix({"height": "15 mm"})
+    assert matrix.values["width"][3] == 90.0
+    assert matrix.external == {"height": "15 mm"}
+
+def test_filters():
+    matrix = _matrix()
+    assert matrix.rows(matrix.query("width > 50")) == ["Large"]
+    assert matrix.rows(matrix.query("CFG_Handle off")) == ["Small", "Same"]
+    assert matrix.rows(matrix.query("CFG_Handle off, width = 4 cm")) == ["Small", "Same"]
+
+def test_duplicates_compare_by_value():
+    assert _matrix().duplicates() == [["Small", "Same"]]
+
+def test_variation_and_nearest():
+    matrix = _matrix({"height": "15 mm"})
+    width = next(e for e in matrix.variation() if e["key"] == "width")
+    assert (width["rows"], width["distinct"], width["min"], width["max"]) == (4, 2, 40.0, 90.0)
+    current = config_matrix.state_values(UNITS, {"width": "90 mm", "height": "10 mm"})
+    nearest = matrix.nearest(current, {"CFG_Handle": False}, limit=3)
+    assert nearest[0] == {"name": "Large", "differences": 0, "keys": [], "distance": 0.0}
+    assert nearest[1]["name"] == "Derived"  # 6 * 15 mm
+    assert nearest[2] == {"name": "Small", "differences": 2, "keys": ["width", "CFG_Handle"], "distance": 2.0}
@@ -0,0 +1,58 @@
+# test_expressions.py
+
+import pytest
+from bench_config_logic import load_addin_module
+
+expressions = load_addin_module("expressions")
+
+def test_identifiers_skip_functions_units_and_constants():
+    assert expressions.identifiers("max(width, 10 mm) * PI + 1e5") == ["width"]
+    assert expressions.identifiers("'text with height' + depth") == ["depth"]
+
+def test_identifiers_keep_parameters_named_like_units():
+    known = {"width", "N", "s", "g", "E"}
+    assert expressions.identifiers("width*N + s + g + E", known) == ["width", "N", "s", "g", "E"]
+    assert expressions.identifiers("10 N + N", known) == ["N"]  # The first N is the unit of 10
+
+def test_dependency_graph_with_parameter_named_like_a_unit():
+    graph = expressions.build_dependency_graph({"N": "4", "width": "N*10 mm"})
+    assert graph["deps"] == {"N": [], "width": ["N"]}
+    assert expressions.topological_order(graph, ["width", "N"]) == ["N", "width"]
+    assert expressions.dependents_of(graph, ["N"]) == {"width"}
+
+def test_dependency_graph_cycles_and_unknown_names():
+    graph = expressions.build_dependency_graph({"a": "b + 1", "b": "a * 2", "c": "d1 + nope"}, ["d1"])
+    assert sorted(graph["cycles"]) == ["a", "b"]
+    assert graph["unknown"] == {"c": ["nope"]}
+
+def test_check_fractions_before_a_unit():
+    assert expressions.check_expression("3/8 in", "in") is None
+    assert expressions.check_expression("-3/8 in", "mm") is None
+    assert expressions.check_expression("3/8 in", "deg") == "Expected angle, got length"
+    assert expressions.evaluate("3/8 in", "in") == 0.375
+
+def test_check_leaves_unknown_units_to_fusion():
+    assert expressions.check_expression("10 micron", "mm") is None
+    assert expressions.check_expression("5 L", "mm") is None
+    assert expressions.identifiers("5 L + width", {"width"}) == ["width"]
+
+def test_check_rejects_what_fusion_would():
+    units = {"width": "mm"}
+    assert expressions.check_expression("10 kg", "mm") == "Expected length, got mass"
+    assert expressions.check_expression("width + 1 s", "mm", units) == "Can't add length and time"
+    assert expressions.check_expression("width +", "mm", units) == "Incomplete expression"
+    assert expressions.check_expression("depth * 2", "mm", units) == "Unknown name: depth"
+
+def test_keyword_operators_are_not_references():
+    assert expressions.identifiers("if(a and b, 2, 3)", {"a", "b"}) == ["a", "b"]
+    assert expressions.identifiers("not a or b", {"a", "b"}) == ["a", "b"]
+    graph = expressions.build_dependency_graph({"a": "1", "b": "2", "c": "if(a and b, 2, 3)"})
+    assert graph["unknown"] == {}
+    assert graph["deps"]["c"] == ["a", "b"]
+
+def test_keyword_operators_after_a_number():
+    units = {"a": "", "b": ""}
+    assert expressions.check_expression("if(a > 1 and b > 1, 2 mm, 3 mm)", "mm", units) is None
+    assert expressions.check_expression("if(a > 1 mm or b > 1, 2 mm, 3 mm)", "mm", {"a": "mm", "b": ""}) is None
+    assert expressions.evaluate("if(2 > 1 and 3 > 1, 2 mm, 3 mm)", "mm") == pytest.approx(2.0)
+    assert expressions.evaluate("if(2 > 5 or 0, 2 mm, 3 mm)", "mm") == pytest.approx(3.0)
@@ -0,0 +1,17 @@
+# test_feature_index.py
+
+def test_index_covers_features_and_groups(config_logic, design):
+    index = config_logic.get_feature_index(design)
+    assert list(index) == ["CFG_Feature_0", "CFG_Feature_1", "CFG_Group_0"]
+    assert config_logic.find_cfg_item(design, "CFG_Group_0").name == "CFG_Group_0"
+
+def test_renamed_group_is_found_without_a_rebuild(config_logic, design):
+    config_logic.get_feature_index(design)
+    design.timeline.timelineGroups.item(0).name = "CFG_Renamed"
+    assert config_logic.find_cfg_item(design, "CFG_Renamed").name == "CFG_Renamed"
+    assert config_logic.find_cfg_item(design, "CFG_Group_0") is None
+
+def test_renamed_feature_is_found_without_a_rebuild(config_logic, design):
+    config_logic.get_feature_index(design)
+    design.rootComponent.features.itemByName("CFG_Feature_1").name = "CFG_Renamed"
+    assert config_logic.find_cfg_item(design, "CFG_Renamed").name == "CFG_Renamed"
@@ -0,0 +1,18 @@
+# test_metrics_cache.py
+
+import adsk.core
+
+def test_scans_reuse_the_timeline_signature(config_logic, design):
+    config_logic.remember_metrics(design, {"mass": 1.0})
+    config_logic.scan_model()
+    adsk.core.reset_calls()
+    config_logic.scan_model()
+    assert adsk.core.calls["Timeline.__iter__"] == 0
+    assert config_logic.cached_metrics(design, config_logic.capture_state(design)) == {"mass": 1.0}
+
+def test_timeline_change_drops_the_metrics(config_logic, design):
+    config_logic.remember_metrics(design, {"mass": 1.0})
+    design.rootComponent.add_feature("Extrude_new")
+    adsk.core.reset_calls()
+    assert config_logic.cached_metrics(design, config_logic.capture_state(design)) is None
+    assert adsk.core.calls["Timeline.__iter__"] == 1
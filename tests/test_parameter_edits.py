@@ -0,0 +1,27 @@
+# test_parameter_edits.py
+
+import adsk.fusion
+
+def test_flush_writes_queued_edits(config_logic, design):
+    config_logic.queue_parameter_edit("param_0", "20 mm")
+    result = config_logic.flush_parameter_edits()
+    assert result["applied"] == ["param_0"]
+    assert result["dropped"] == []
+    assert design.userParameters.itemByName("param_0").expression == "20 mm"
+
+def test_edits_from_another_document_are_dropped(config_logic, design):
+    config_logic.queue_parameter_edit("param_0", "20 mm")
+    other = adsk.fusion.build_design(params=5, cfg_features=0, groups=0, cfg_groups=0, name="Other v1")
+    result = config_logic.flush_parameter_edits()
+    assert result["applied"] == []
+    assert result["dropped"] == [{"name": "param_0", "expression": "20 mm"}]
+    assert other.userParameters.itemByName("param_0").expression == "10 mm"
+    assert not config_logic.has_pending_edits()
+
+def test_queueing_in_a_new_document_discards_the_old_queue(config_logic, design):
+    config_logic.queue_parameter_edit("param_0", "20 mm")
+    adsk.fusion.build_design(params=5, cfg_features=0, groups=0, cfg_groups=0, name="Other v1")
+    config_logic.queue_parameter_edit("param_1", "30 mm")
+    result = config_logic.flush_parameter_edits()
+    assert result["applied"] == ["param_1"]
+    assert result["dropped"] == []
@@ -0,0 +1,19 @@
+# test_scan_cache.py
+
+import adsk.core
+import adsk.fusion
+
+def test_cached_scan_is_stale_only_when_the_marker_moves(config_logic, design):
+    state = config_logic.scan_model()
+    adsk.core.Application.get().activeDocument.isModified = True
+    assert config_logic.get_cached_scan() == (state, False)
+    design.userParameters.add("extra", "1 mm")
+    assert config_logic.get_cached_scan() == (state, True)
+
+def test_scan_cache_evicts_least_recently_used_documents(config_logic, design, monkeypatch):
+    first = config_logic.scan_model()
+    monkeypatch.setattr(config_logic, "SCAN_CACHE_BUDGET", config_logic._scan_size(first) + 1)
+    adsk.fusion.build_design(params=5, cfg_features=2, groups=1, cfg_groups=1, name="Other v1")
+    config_logic.scan_model()
+    assert len(config_logic._scan_cache) == 1
+    assert config_logic.get_cached_scan()[0]["doc_name"] == "Other"
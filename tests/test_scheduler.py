@@ -0,0 +1,65 @@
+# test_scheduler.py
+
+import adsk.core
+import pytest
+from bench_config_logic import load_addin_module
+
+scheduler = load_addin_module("scheduler")
+
+@pytest.fixture
+def reports():
+    app = adsk.core.Application.get()
+    app.fired.clear()
+    statuses = []
+    scheduler.start(app, statuses.append)
+    yield statuses
+    scheduler.stop()
+
+def _states(reports, job_id):
+    return [r["state"] for r in reports if r["id"] == job_id]
+
+def test_jobs_run_from_the_custom_event(reports):
+    ran = []
+    job_id = scheduler.submit("job", lambda: ran.append(1) or "result")
+    assert ran == []
+    adsk.core.Application.get().run_custom_events()
+    assert ran == [1]
+    assert _states(reports, job_id) == ["queued", "running", "done"]
+    assert reports[-1]["result"] == "result"
+    assert scheduler.is_idle()
+
+def test_generator_jobs_step_once_per_event(reports):
+    def work():
+        for i in range(3):
+            yield i + 1, 3, "step"
+        return "finished"
+    job_id = scheduler.submit("steps", work)
+    adsk.core.Application.get().run_custom_events()
+    progress = [r["done"] for r in reports if r["state"] == "progress"]
+    assert progress == [1, 2, 3]
+    assert _states(reports, job_id)[-1] == "done"
+    assert reports[-1]["result"] == "finished"
+
+def test_same_key_supersedes_queued_and_cancels_running(reports):
+    ran = []
+    first = scheduler.submit("first", lambda: ran.append("first"), key="k")
+    second = scheduler.submit("second", lambda: ran.append("second"), key="k")
+    assert _states(reports, first) == ["queued", "superseded"]
+
+    def slow():
+        yield 1, 2, "half"
+        ran.append("slow finished")
+    adsk.core.Application.get().run_custom_events()
+    running = scheduler.submit("slow", slow, key="s")
+    scheduler.run_next()
+    scheduler.submit("replacement", lambda: ran.append("replacement"), key="s")
+    adsk.core.Application.get().run_custom_events()
+    assert ran == ["second", "replacement"]
+    assert _states(reports, running)[-1] == "cancelled"
+    assert _states(reports, second)[-1] == "done"
+
+def test_quiet_jobs_only_report_errors(reports):
+    scheduler.submit("quiet", lambda: None, quiet=True)
+    failing = scheduler.submit("failing", lambda: 1 / 0, quiet=True)
+    adsk.core.Application.get().run_custom_events()
+    assert [(r["id"], r["state"]) for r in reports] == [(failing, "error")]
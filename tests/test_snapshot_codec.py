@@ -0,0 +1,40 @@
+# test_snapshot_codec.py
+
+from bench_config_logic import load_addin_module
+
+snapshot_codec = load_addin_module("snapshot_codec")
+
+BODIES = [
+    {"params": {"width": "80 mm", "height": "20 mm"}, "features": {"CFG_Handle": False, "CFG_Lid": True}},
+    {"params": {"width": "90 mm", "height": "20 mm"}, "features": {"CFG_Handle": True, "CFG_Lid": True}},
+    {"params": {"width": "80 mm"}, "features": {"CFG_Lid": False}},
+]
+
+def test_round_trip_against_a_built_base():
+    base = snapshot_codec.build_base(BODIES)
+    assert base["param_values"][base["params"].index("width")] == "80 mm"
+    for body in BODIES:
+        raw, changed = snapshot_codec.encode_snapshot(body, base)
+        assert not changed
+        assert snapshot_codec.decode_snapshot(raw, base) == body
+
+def test_base_grows_and_older_snapshots_ignore_new_keys():
+    base = snapshot_codec.build_base(BODIES[:1])
+    old_raw, _ = snapshot_codec.encode_snapshot(BODIES[0], base)
+    new_body = {"params": {"width": "80 mm", "depth": "5 mm"}, "features": {"CFG_Rim": True}}
+    new_raw, changed = snapshot_codec.encode_snapshot(new_body, base)
+    assert changed
+    assert base["params"][-1] == "depth" and base["features"][-1] == "CFG_Rim"
+    assert snapshot_codec.decode_snapshot(new_raw, base) == new_body
+    assert snapshot_codec.decode_snapshot(old_raw, base) == BODIES[0]
+
+def test_large_payloads_are_compressed():
+    body = {"params": {"param_%d" % i: "%d mm" % i for i in range(200)}, "features": {}}
+    raw = snapshot_codec.pack(body)
+    assert raw.startswith(snapshot_codec.COMPRESSED_PREFIX)
+    assert snapshot_codec.unpack(raw) == body
+    assert snapshot_codec.pack({"a": 1}) == '{"a":1}'
+
+def test_plain_bodies_decode_unchanged():
+    raw = snapshot_codec.pack(BODIES[0])
+    assert snapshot_codec.decode_snapshot(raw, snapshot_codec.empty_base()) == BODIES[0]
@@ -0,0 +1,50 @@
+# test_snapshot_storage.py
+# config_logic's attribute storage behind the SnapshotStore.
+
+import json
+
+BODIES = {
+    "Small": {"params": {"param_0": "10 mm", "param_1": "11 mm"}, "features": {"CFG_Feature_0": True}},
+    "Large": {"params": {"param_0": "50 mm", "param_1": "11 mm"}, "features": {"CFG_Feature_0": False}},
+}
+
+def _attr(design, config_logic, name):
+    return design.rootComponent.attributes.itemByName(config_logic.ATTRIBUTE_GROUP, name)
+
+def test_save_and_load_bodies(config_logic, design):
+    manifest = config_logic.save_snapshot_bodies(BODIES)
+    assert sorted(manifest["configs"]) == ["Large", "Small"]
+    assert _attr(design, config_logic, config_logic.BASE_ATTR) is not None
+    config_logic._stores.clear()
+    config_logic._base_cache.clear()
+    root = design.rootComponent
+    for name, body in BODIES.items():
+        assert config_logic.load_snapshot_body(root, name) == body
+
+def test_legacy_blob_is_migrated(config_logic, design):
+    root = design.rootComponent
+    root.attributes.add(config_logic.ATTRIBUTE_GROUP, config_logic.ATTRIBUTE_NAME, json.dumps(BODIES))
+    manifest = config_logic.load_manifest(root)
+    assert manifest["version"] == config_logic.MANIFEST_VERSION
+    assert sorted(manifest["configs"]) == ["Large", "Small"]
+    assert _attr(design, config_logic, config_logic.ATTRIBUTE_NAME) is None
+    config_logic._stores.clear()
+    assert config_logic.load_snapshot_body(root, "Large") == BODIES["Large"]
+
+def test_new_keys_grow_the_base_without_rewriting_older_snapshots(config_logic, design):
+    config_logic.save_snapshot_bodies(BODIES)
+    root = design.rootComponent
+    small_raw = _attr(design, config_logic, config_logic.load_manifest(root)["configs"]["Small"]["key"]).value
+    extra = {"params": {"param_0": "10 mm", "param_4": "1 mm"}, "features": {"CFG_Group_0": True}}
+    manifest = config_logic.save_snapshot_bodies({"Extra": extra})
+    assert manifest["base_rev"] == 2
+    assert _attr(design, config_logic, manifest["configs"]["Small"]["key"]).value == small_raw
+    config_logic._stores.clear()
+    config_logic._base_cache.clear()
+    assert config_logic.load_snapshot_body(root, "Extra") == extra
+    assert config_logic.load_snapshot_body(root, "Small") == BODIES["Small"]
+
+def test_only_the_current_base_is_cached(config_logic, design):
+    config_logic.save_snapshot_bodies(BODIES)
+    config_logic.save_snapshot_bodies({"Extra": {"params": {"param_4": "1 mm"}, "features": {}}})
+    assert [rev for rev, _ in config_logic._base_cache.values()] == [2]
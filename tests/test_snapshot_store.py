@@ -0,0 +1,42 @@
+# test_snapshot_store.py
+
+from bench_config_logic import load_addin_module
+
+snapshot_store = load_addin_module("snapshot_store")
+
+def test_bodies_round_trip_through_shared_key_tables():
+    store = snapshot_store.SnapshotStore()
+    a = {"params": {"width": "80 mm", "height": "20 mm"}, "features": {"CFG_Handle": True}}
+    b = {"params": {"depth": "5 mm"}, "features": {"CFG_Lid": False}}
+    store.put("A", a)
+    store.put("B", b)
+    assert store.body("A") == a
+    assert store.body("B") == b
+    assert store.param_keys.names == ["width", "height", "depth"]
+    assert store.body("missing") is None
+    assert "A" in store and len(store) == 2
+
+def test_dirty_and_removed_names_form_one_change_set():
+    store = snapshot_store.SnapshotStore()
+    store.put("Loaded", {"params": {}, "features": {}}, dirty=False)
+    store.put("A", {"params": {"width": "1 mm"}, "features": {}})
+    store.put("B", {"params": {"width": "2 mm"}, "features": {}})
+    store.remove("B")
+    store.remove("Old")
+    assert store.take_dirty() == (["A"], {"B", "Old"})
+    assert store.take_dirty() == ([], set())
+
+def test_put_after_remove_keeps_the_snapshot():
+    store = snapshot_store.SnapshotStore()
+    store.remove("A")
+    store.put("A", {"params": {"width": "1 mm"}, "features": {}})
+    assert store.take_dirty() == (["A"], set())
+
+def test_bodies_with_other_key_orders_and_gaps():
+    store = snapshot_store.SnapshotStore()
+    store.put("A", {"params": {"width": "1 mm", "height": "2 mm"}, "features": {"CFG_Handle": True}})
+    store.put("B", {"params": {"height": "3 mm"}, "features": {"CFG_Lid": None, "CFG_Handle": False}})
+    store.put("C", {"params": {"width": "4 mm", "depth": None}, "features": {}})
+    assert store.body("A") == {"params": {"width": "1 mm", "height": "2 mm"}, "features": {"CFG_Handle": True}}
+    assert store.body("B") == {"params": {"height": "3 mm"}, "features": {"CFG_Handle": False}}
+    assert store.body("C") == {"params": {"width": "4 mm"}, "features": {}}
@@ -0,0 +1,22 @@
+# test_sweep.py
+
+import json
+
+from bench_config_logic import load_addin_module
+
+sweep = load_addin_module("sweep")
+
+def test_checkpoint_counts_only_successful_csv_rows(tmp_path):
+    path = tmp_path / "results.csv"
+    path.write_text("id,label,status,error\n"
+                    "v1,a,ok,\n"
+                    "v2,b,failed,Could not apply: width\n"
+                    "v3,c,,\n")
+    assert sweep.read_checkpoint(str(path)) == {"v1"}
+
+def test_checkpoint_counts_a_retried_variant_once_it_succeeds(tmp_path):
+    path = tmp_path / "results.jsonl"
+    rows = [{"id": "v1", "status": "failed"}, {"id": "v2", "status": "ok"}, {"id": "v1", "status": "ok"}]
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows) + '{"id": "v3", "sta')
+    assert sweep.read_checkpoint(str(path)) == {"v1", "v2"}
+    assert sweep.read_checkpoint(str(tmp_path / "missing.jsonl")) == set()